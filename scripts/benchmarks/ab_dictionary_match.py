@@ -0,0 +1,76 @@
+import argparse
+import time
+from collections import Counter
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+
+LABELS = ("component_type", "material", "vendor", "standard")
+
+
+def _run(matcher, descriptions, mode, repeat):
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        results = [matcher.match_all(d, mode) for d in descriptions]
+        best = min(best, time.perf_counter() - t)
+    return results, best / len(descriptions) * 1e6
+
+
+# A/B отчёт: режим all (текущий) против longest на unique_descriptions.csv
+def main():
+    parser = argparse.ArgumentParser(description="A/B report for dictionary match modes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--examples", type=int, default=10)
+    args = parser.parse_args()
+
+    from src.data_processing.dictionary_matcher import DictionaryMatcher
+
+    descriptions = load_descriptions().tolist()
+    matcher = DictionaryMatcher()
+
+    res_a, us_a = _run(matcher, descriptions, "all", args.repeat)
+    res_b, us_b = _run(matcher, descriptions, "longest", args.repeat)
+
+    print(f"descriptions: {len(descriptions)}")
+    print(f"latency all:     {us_a:.1f} us/description")
+    print(f"latency longest: {us_b:.1f} us/description")
+    print()
+
+    examples = []
+    for label in LABELS:
+        changed = 0
+        filled_a = filled_b = 0
+        dropped = Counter()
+        added = Counter()
+
+        for d, a, b in zip(descriptions, res_a, res_b):
+            va, vb = a[label].values, b[label].values
+            filled_a += bool(va)
+            filled_b += bool(vb)
+            if va != vb:
+                changed += 1
+                dropped.update(set(va) - set(vb))
+                added.update(set(vb) - set(va))
+                if len(examples) < args.examples:
+                    examples.append((label, d, va, vb))
+
+        print(
+            f"[{label}] changed: {changed} ({changed / len(descriptions):.1%}), "
+            f"filled all={filled_a} longest={filled_b}"
+        )
+        if dropped:
+            print("  most dropped: " + ", ".join(f"{v} x{n}" for v, n in dropped.most_common(args.top)))
+        if added:
+            print("  most added:   " + ", ".join(f"{v} x{n}" for v, n in added.most_common(args.top)))
+
+    if examples:
+        print()
+        print("examples:")
+        for label, d, va, vb in examples:
+            print(f"  [{label}] {d!r}: {va} -> {vb}")
+
+
+if __name__ == "__main__":
+    main()
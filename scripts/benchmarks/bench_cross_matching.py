@@ -0,0 +1,72 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from sqlalchemy import select, func
+
+
+# сравнение по similarity: среди кандидатов с равным расстоянием порядок у индексов не определён
+def _keys(result: dict) -> dict:
+    return {category: [round(item["similarity"], 5) for item in items] for category, items in result.items()}
+
+
+# Поштучный find_similar (как клики по узлам в graph_page) против find_similar_batch
+# на тех же компонентах; работает с текущими БД и векторным бэкендом (VECTOR_BACKEND)
+def main():
+    parser = argparse.ArgumentParser(description="Cross-matching: sequential find_similar vs find_similar_batch")
+    parser.add_argument("--components", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--categories", default=None, help="comma-separated subset of the result categories")
+    parser.add_argument("--same-parent", action="store_true", help="children of one assembly, as in a review session")
+    args = parser.parse_args()
+
+    from src.core.cross_matching import CrossMatchingService
+    from src.db.database import SessionLocal
+    from src.db.models import ComponentDB
+
+    rng = random.Random(args.seed)
+    with SessionLocal() as session:
+        stmt = select(ComponentDB.id).where(ComponentDB.embedding_vector.is_not(None))
+        if args.same_parent:
+            parents = session.execute(
+                select(ComponentDB.parent_id)
+                .where(ComponentDB.parent_id.is_not(None))
+                .group_by(ComponentDB.parent_id)
+                .having(func.count() >= args.components)
+            ).scalars().all()
+            stmt = stmt.where(ComponentDB.parent_id == rng.choice(parents))
+        ids = session.execute(stmt).scalars().all()
+    component_ids = rng.sample(ids, min(args.components, len(ids)))
+
+    categories = args.categories.split(",") if args.categories else None
+    service = CrossMatchingService()
+    # прогрев: индекс и кэш страниц SQLite
+    service.find_similar(component_ids[0], top_k=args.top_k, categories=categories)
+
+    sequential = {}
+    latencies = []
+    for cid in component_ids:
+        t = time.perf_counter()
+        sequential[cid] = service.find_similar(cid, top_k=args.top_k, categories=categories)
+        latencies.append(time.perf_counter() - t)
+    t_seq = sum(latencies)
+
+    t = time.perf_counter()
+    batch = service.find_similar_batch(component_ids, top_k=args.top_k, categories=categories)
+    t_batch = time.perf_counter() - t
+
+    mismatches = sum(_keys(sequential[cid]) != _keys(batch[cid]) for cid in component_ids)
+    n = len(component_ids)
+    print(
+        f"sequential: {t_seq:.2f}s  {n / t_seq:.1f} components/s  "
+        f"p50={np.percentile(latencies, 50) * 1000:.1f}ms p99={np.percentile(latencies, 99) * 1000:.1f}ms"
+    )
+    print(f"batch:      {t_batch:.2f}s  {n / t_batch:.1f} components/s  ({t_seq / t_batch:.1f}x)")
+    print(f"components with different results: {mismatches}/{n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+# Сравнение бэкендов EmbeddingService: косинусная близость к векторам torch,
+# совпадение top-k соседей, задержка одиночного запроса и пропускная способность батча
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backends: parity and latency vs torch")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument(
+        "--onnx-files",
+        default="onnx/model.onnx,onnx/model_quint8_avx2.onnx",
+        help="comma-separated ONNX files in the model repo",
+    )
+    parser.add_argument("--texts", type=int, default=5000, help="texts for parity and throughput")
+    parser.add_argument("--queries", type=int, default=200, help="single-query latency samples")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    from src.ml.embedding_service import load_model
+
+    cache_dir = os.path.expanduser("~/.cache/sentence_transformers")
+
+    descriptions = load_descriptions()
+    rng = np.random.default_rng(0)
+    texts = rng.choice(descriptions, size=min(args.texts, len(descriptions)), replace=False).tolist()
+    queries = texts[:args.queries]
+
+    variants = [("torch", "torch", None)] + [
+        (f"onnx:{f}", "onnx", f) for f in args.onnx_files.split(",") if f
+    ]
+
+    reference = None
+    reference_top = None
+
+    for label, backend, onnx_file in variants:
+        kwargs = {"onnx_file": onnx_file} if onnx_file else {}
+        t = time.perf_counter()
+        model = load_model(args.model, cache_dir, backend, **kwargs)
+        load_seconds = time.perf_counter() - t
+
+        # прогрев: первые вызовы включают инициализацию сессии/аллокаторов
+        model.encode(queries[:8], convert_to_numpy=True)
+
+        latencies = []
+        for q in queries:
+            t = time.perf_counter()
+            model.encode(q, convert_to_numpy=True)
+            latencies.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        embs = model.encode(
+            texts, batch_size=args.batch_size, show_progress_bar=False, convert_to_numpy=True
+        )
+        batch_seconds = time.perf_counter() - t
+
+        embs = _normalize(np.asarray(embs, dtype=np.float32))
+        top = np.argsort(-(embs[:len(queries)] @ embs.T), axis=1)[:, 1:args.top_k + 1]
+
+        line = (
+            f"{label}: load={load_seconds:.1f}s "
+            f"query p50={_percentile(latencies, 50):.2f}ms p95={_percentile(latencies, 95):.2f}ms "
+            f"batch={len(texts) / batch_seconds:,.0f} texts/s"
+        )
+
+        if reference is None:
+            reference, reference_top = embs, top
+        else:
+            cos = np.sum(reference * embs, axis=1)
+            overlap = np.mean([
+                len(set(a) & set(b)) / args.top_k for a, b in zip(reference_top, top)
+            ])
+            line += (
+                f" cos min={cos.min():.5f} mean={cos.mean():.5f} "
+                f"top{args.top_k} overlap={overlap:.3f}"
+            )
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+
+
+# доля реальных токенов в батчах (остальное — паддинг до самого длинного текста)
+def _padding_efficiency(lengths: np.ndarray, batches) -> float:
+    real = sum(int(b.sum()) for b in batches)
+    padded = sum(int(b.max()) * len(b) for b in batches)
+    return real / padded if padded else 1.0
+
+
+# Пропускная способность encode_batch_array: фиксированный batch_size=256
+# (прежнее поведение) против сортировки по длине в токенах и бюджета токенов
+def main():
+    parser = argparse.ArgumentParser(description="encode_batch: fixed batches vs length bucketing")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--budgets", default="4096,8192,16384")
+    parser.add_argument("--max-batch", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    from src.ml.embedding_service import EmbeddingService, length_batches
+
+    service = EmbeddingService(args.model)
+    model = service.model
+
+    rng = np.random.default_rng(0)
+    texts = rng.permutation(load_descriptions()).tolist()
+    lengths = service._token_lengths(texts)
+
+    print(
+        f"{len(texts)} texts, tokens min={lengths.min()} p50={int(np.median(lengths))} "
+        f"max={lengths.max()}, torch threads={torch.get_num_threads()}"
+    )
+
+    # прогрев
+    service.encode_batch_array(texts[:512])
+
+    def best_of(fn):
+        best = float("inf")
+        result = None
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - t)
+        return best, result
+
+    def fixed():
+        with torch.inference_mode():
+            return model.encode(texts, batch_size=256, show_progress_bar=False, convert_to_numpy=True)
+
+    # SentenceTransformer сам сортирует тексты по длине в символах
+    char_order = np.argsort([-len(t) for t in texts], kind="stable")
+    fixed_batches = [lengths[char_order[i:i + 256]] for i in range(0, len(texts), 256)]
+
+    seconds, reference = best_of(fixed)
+    print(
+        f"fixed batch_size=256: {len(texts) / seconds:,.0f} texts/s "
+        f"padding efficiency={_padding_efficiency(lengths, fixed_batches):.2f}"
+    )
+
+    token_order = np.argsort(lengths, kind="stable")
+    sorted_lengths = lengths[token_order]
+
+    for budget in (int(b) for b in args.budgets.split(",")):
+        spans = length_batches(sorted_lengths, budget, args.max_batch)
+        batches = [sorted_lengths[s:e] for s, e in spans]
+
+        seconds, result = best_of(
+            lambda: service.encode_batch_array(texts, token_budget=budget, max_batch=args.max_batch)
+        )
+        diff = float(np.abs(result - reference).max())
+        print(
+            f"token budget={budget}: {len(texts) / seconds:,.0f} texts/s "
+            f"padding efficiency={_padding_efficiency(lengths, batches):.2f} "
+            f"batches={len(spans)} max |diff|={diff:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import logging
+import resource
+import subprocess
+import sys
+import time
+
+from scripts.benchmarks.synthetic_bom import make_bom
+
+
+# Один прогон HierarchyProcessor в отдельном процессе (чистый peak RSS)
+def run_once(n_rows: int) -> None:
+    from src.data_processing.hierarchy import HierarchyProcessor
+
+    logging.disable(logging.INFO)
+
+    df = make_bom(n_rows)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    processor = HierarchyProcessor()
+    t = time.time()
+    processor.process(df)
+    elapsed = time.time() - t
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    for step, seconds in processor.stats.get("timings", {}).items():
+        print(f"  {step}: {seconds:.3f}s")
+    print(f"{elapsed:.2f},{peak - base:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HierarchyProcessor wall time and peak memory growth")
+    parser.add_argument("--sizes", default="100000,700000,2000000")
+    parser.add_argument("--run", type=int)
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(args.run)
+        return
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        out = subprocess.run(
+            [sys.executable, "-m", "scripts.benchmarks.bench_hierarchy", "--run", str(n)],
+            capture_output=True, text=True,
+        )
+        lines = out.stdout.rstrip().splitlines()
+        if not lines:
+            print(f"rows={n} failed: {out.stderr.strip()[-300:]}")
+            continue
+        seconds, peak = lines[-1].split(",")
+        print(f"rows={n} time={seconds}s peak_growth={peak}MB")
+        for line in lines[:-1]:
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
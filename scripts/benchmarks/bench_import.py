@@ -0,0 +1,90 @@
+import argparse
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from scripts.benchmarks.synthetic_bom import make_bom
+
+
+# Синтетический processed_bom.parquet: иерархия + признаки из описаний
+def write_processed_parquet(n_rows: int, path: str) -> None:
+    from src.data_processing.hierarchy import HierarchyProcessor
+
+    df = HierarchyProcessor().process(make_bom(n_rows))
+    df = df.drop_duplicates("unique_id").reset_index(drop=True)
+    words = df["description"].astype(str).str.split()
+
+    df["clean_name"] = df["description"].astype(str).str[:120]
+    df["component_type"] = words.str[0]
+    df["material"] = words.str[1].fillna("")
+    df["size"] = words.str[-1]
+    df["vendor"] = ""
+    df["standard"] = ""
+    df.to_parquet(path, index=False)
+
+
+# Один импорт в отдельном процессе (чистый peak RSS)
+def run_once(parquet_path: str, db_path: str, mode: str) -> None:
+    from sqlalchemy import create_engine
+    from src.db.init_db import import_from_parquet
+
+    logging.disable(logging.INFO)
+
+    db_engine = create_engine(f"sqlite:///{db_path}")
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    t = time.time()
+    rows = import_from_parquet(parquet_path, bulk=(mode == "bulk"), db_engine=db_engine)
+    elapsed = time.time() - t
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{rows},{elapsed:.2f},{peak:.1f},{peak - base:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import_from_parquet: ORM vs bulk loader")
+    parser.add_argument("--rows", type=int, default=700_000)
+    parser.add_argument("--modes", default="orm,bulk")
+    parser.add_argument("--run", nargs=3, metavar=("PARQUET", "DB", "MODE"))
+    parser.add_argument("--prepare", metavar="PARQUET")
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(*args.run)
+        return
+
+    if args.prepare:
+        write_processed_parquet(args.rows, args.prepare)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # генерация тоже в отдельном процессе: ru_maxrss наследуется дочерними процессами
+        parquet_path = os.path.join(tmp, "processed_bom.parquet")
+        subprocess.run(
+            [sys.executable, "-m", "scripts.benchmarks.bench_import", "--rows", str(args.rows), "--prepare", parquet_path],
+            check=True,
+        )
+
+        for mode in args.modes.split(","):
+            db_path = os.path.join(tmp, f"{mode}.sqlite3")
+            out = subprocess.run(
+                [sys.executable, "-m", "scripts.benchmarks.bench_import", "--run", parquet_path, db_path, mode],
+                capture_output=True, text=True,
+            )
+            lines = out.stdout.strip().splitlines()
+            if not lines:
+                print(f"mode={mode} failed: {out.stderr.strip()[-300:]}")
+                continue
+            rows, seconds, peak, growth = lines[-1].split(",")
+            print(
+                f"mode={mode} rows={rows} time={seconds}s "
+                f"{int(rows) / float(seconds):,.0f} rows/sec peak_rss={peak}MB growth={growth}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import logging
+import time
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+
+
+# Пропускная способность parse_batch_parallel в зависимости от числа воркеров
+def main():
+    parser = argparse.ArgumentParser(description="Description parsing throughput vs worker count")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+
+    from src.data_processing.feature_extractor import FeatureExtractor
+
+    logging.disable(logging.INFO)
+
+    pool = load_descriptions().tolist()
+    descriptions = (pool * (args.rows // len(pool) + 1))[: args.rows]
+
+    baseline = None
+    reference = None
+
+    for workers in [int(w) for w in args.workers.split(",")]:
+        extractor = FeatureExtractor()
+
+        # прогрев пула, чтобы не учитывать запуск процессов
+        extractor.parse_batch_parallel(descriptions[: 50_000], workers=workers)
+
+        t = time.time()
+        columns = extractor.parse_batch_parallel(descriptions, workers=workers)
+        elapsed = time.time() - t
+
+        rate = len(descriptions) / elapsed
+        baseline = baseline or rate
+        reference = reference or columns
+
+        print(
+            f"workers={workers} {rate:,.0f} rows/sec speedup={rate / baseline:.2f}x "
+            f"identical={columns == reference}"
+        )
+
+
+if __name__ == "__main__":
+    main()
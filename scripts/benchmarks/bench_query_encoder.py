@@ -0,0 +1,95 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+# Нагрузочный тест кодирования запросов /search/hybrid: параллельные клиенты,
+# запросы с повторами по закону Ципфа (как у пользователей UI)
+def run(encode, clients: int, requests: int, queries: np.ndarray, seed: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def client(i: int):
+        rng = np.random.default_rng(seed + i)
+        local = []
+        for _ in range(requests):
+            q = queries[min(rng.zipf(1.3) - 1, len(queries) - 1)]
+            t = time.perf_counter()
+            encode(q)
+            local.append(time.perf_counter() - t)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t
+
+    return {
+        "p50": _percentile(latencies, 50),
+        "p99": _percentile(latencies, 99),
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query encoding under concurrent load: direct vs cache+batching")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--queries", type=int, default=2000, help="distinct query pool")
+    parser.add_argument("--wait-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    from src.ml.embedding_service import EmbeddingService
+    from src.ml.query_encoder import QueryEncoder
+
+    embedder = EmbeddingService.instance()
+    rng = np.random.default_rng(0)
+    descriptions = load_descriptions()
+    queries = rng.choice(descriptions, size=min(args.queries, len(descriptions)), replace=False)
+
+    # прогрев модели
+    embedder.encode_batch(list(queries[:32]))
+
+    direct = run(embedder.encode, args.clients, args.requests, queries, seed=1)
+    print(
+        f"direct:  p50={direct['p50']:.1f}ms p99={direct['p99']:.1f}ms "
+        f"{direct['rps']:,.0f} req/s"
+    )
+
+    kwargs = {"wait_ms": args.wait_ms} if args.wait_ms is not None else {}
+    encoder = QueryEncoder(embedder, **kwargs)
+    batched = run(encoder.encode, args.clients, args.requests, queries, seed=1)
+    m = encoder.metrics()
+    print(
+        f"encoder: p50={batched['p50']:.1f}ms p99={batched['p99']:.1f}ms "
+        f"{batched['rps']:,.0f} req/s hit_rate={m['hit_rate']} "
+        f"avg_batch={m['avg_batch_size']} max_batch={m['max_batch_size']} coalesced={m['coalesced']}"
+    )
+
+    # без повторов запросов: выигрыш только от батчинга
+    encoder = QueryEncoder(embedder, cache_size=0, **kwargs)
+    unique = run(encoder.encode, args.clients, args.requests, queries, seed=1)
+    m = encoder.metrics()
+    print(
+        f"batching only: p50={unique['p50']:.1f}ms p99={unique['p99']:.1f}ms "
+        f"{unique['rps']:,.0f} req/s avg_batch={m['avg_batch_size']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import time
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+
+
+# Задержка RegexMatcher.match_all на одно описание: все группы против
+# только тех, что нужны FeatureExtractor
+def main():
+    parser = argparse.ArgumentParser(description="RegexMatcher.match_all per-description latency")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from src.data_processing.feature_extractor import REGEX_GROUPS
+    from src.data_processing.regex_matcher import RegexMatcher
+
+    descriptions = load_descriptions().tolist()
+    matcher = RegexMatcher()
+
+    for label, groups in (("all groups", None), ("feature extractor", REGEX_GROUPS)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            for d in descriptions:
+                matcher.match_all(d, groups)
+            best = min(best, time.perf_counter() - t)
+
+        print(
+            f"{label}: {best / len(descriptions) * 1e6:.1f} us/description "
+            f"({len(descriptions)} descriptions, best of {args.repeat})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+# Чтения из нескольких потоков во время импорта parquet в той же БД
+def run_profile(parquet_path: str, db_path: str, profile: str, readers: int, mode: str) -> None:
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import sessionmaker
+    from src.db.database import create_sqlite_engine
+    from src.db.init_db import import_from_parquet
+    from src.db.models import ComponentDB
+
+    logging.disable(logging.INFO)
+
+    db_engine = create_sqlite_engine(db_path, profile=profile, readers=readers + 2)
+    import_from_parquet(parquet_path, db_engine=db_engine)
+
+    Session = sessionmaker(bind=db_engine)
+    with Session() as session:
+        ids = session.execute(select(ComponentDB.unique_id)).scalars().all()
+
+    latencies = []
+    errors = []
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        local, local_errors = [], []
+        while not stop.is_set():
+            t = time.perf_counter()
+            try:
+                with Session() as session:
+                    uid = rng.choice(ids)
+                    obj = session.execute(
+                        select(ComponentDB).where(ComponentDB.unique_id == uid)
+                    ).scalar_one_or_none()
+                    if obj is not None and obj.parent_id:
+                        session.execute(
+                            select(ComponentDB.id).where(ComponentDB.parent_id == obj.parent_id).limit(50)
+                        ).all()
+            except Exception as e:
+                local_errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+                continue
+            local.append(time.perf_counter() - t)
+        with lock:
+            latencies.extend(local)
+            errors.extend(local_errors)
+
+    # длинное чтение (как выгрузка графа/эмбеддингов): в rollback journal держит SHARED lock
+    scans = []
+
+    def scanner():
+        while not stop.is_set():
+            t = time.perf_counter()
+            try:
+                with Session() as session:
+                    session.execute(select(ComponentDB.id, ComponentDB.path, ComponentDB.clean_name)).all()
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+                continue
+            scans.append(time.perf_counter() - t)
+
+    # мелкие записи (как батчи rebuild_embeddings) — второй писатель
+    writes = []
+
+    def writer():
+        rng = random.Random(-1)
+        while not stop.is_set():
+            t = time.perf_counter()
+            try:
+                with Session() as session:
+                    session.execute(
+                        update(ComponentDB)
+                        .where(ComponentDB.unique_id.in_(rng.sample(ids, 100)))
+                        .values(usage_count=ComponentDB.usage_count + 1)
+                    )
+                    session.commit()
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+                continue
+            writes.append(time.perf_counter() - t)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=scanner))
+    threads.append(threading.Thread(target=writer))
+    for th in threads:
+        th.start()
+
+    time.sleep(1.0)
+    t = time.time()
+    import_error = None
+    try:
+        import_from_parquet(parquet_path, db_engine=db_engine, mode=mode)
+    except Exception as e:
+        import_error = str(e).splitlines()[0]
+    import_seconds = time.time() - t
+    time.sleep(1.0)
+
+    stop.set()
+    for th in threads:
+        th.join()
+
+    print(
+        f"profile={profile} import_mode={mode} import={import_seconds:.2f}s "
+        f"reads={len(latencies)} p50={_percentile(latencies, 50):.1f}ms "
+        f"p99={_percentile(latencies, 99):.1f}ms max={max(latencies, default=0) * 1000:.0f}ms "
+        f"scans={len(scans)} scan_max={max(scans, default=0):.2f}s "
+        f"writes={len(writes)} write_max={max(writes, default=0):.2f}s "
+        f"errors={len(errors)}" + (f" import_error={import_error}" if import_error else "")
+    )
+    if errors:
+        print(f"  first error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read latency during import for SQLite profiles")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--profiles", default="default,performance")
+    parser.add_argument("--mode", default="replace", choices=["replace", "incremental"])
+    parser.add_argument("--run", nargs=4, metavar=("PARQUET", "DB", "PROFILE", "MODE"))
+    args = parser.parse_args()
+
+    if args.run:
+        parquet_path, db_path, profile, mode = args.run
+        run_profile(parquet_path, db_path, profile, args.readers, mode)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_path = os.path.join(tmp, "processed_bom.parquet")
+        subprocess.run(
+            [sys.executable, "-m", "scripts.benchmarks.bench_import", "--rows", str(args.rows), "--prepare", parquet_path],
+            check=True,
+        )
+
+        for profile in args.profiles.split(","):
+            # каждый профиль в своём процессе и со своей БД
+            subprocess.run(
+                [
+                    sys.executable, "-m", "scripts.benchmarks.bench_sqlite_concurrency",
+                    "--readers", str(args.readers),
+                    "--run", parquet_path, os.path.join(tmp, f"{profile}.sqlite3"), profile, args.mode,
+                ],
+                check=False,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from scripts.benchmarks.synthetic_bom import write_bom_csv
+
+
+# Запуск одного режима в отдельном процессе, чтобы peak RSS не смешивался
+def run_mode(mode: str, csv_path: str, out_path: str, chunk_size: int) -> None:
+    import pandas as pd
+    from src.pipeline.processor import SimpleBOMProcessor, CSV_DTYPES
+
+    processor = SimpleBOMProcessor()
+    t = time.time()
+
+    if mode == "stream":
+        processor.process_stream(csv_path, out_path, chunk_size=chunk_size)
+    else:
+        processor.process_pipeline(pd.read_csv(csv_path, dtype=CSV_DTYPES)).to_parquet(out_path, index=False)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode},{time.time() - t:.2f},{peak:.1f}")
+
+    for name, s in processor.get_stats().get("stream", {}).get("stages", {}).items():
+        print(f"  {name}: {s['rows_per_sec']} rows/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS: batch vs streaming pipeline")
+    parser.add_argument("--sizes", default="100000,700000,2000000")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--modes", default="batch,stream")
+    parser.add_argument("--run", nargs=3, metavar=("MODE", "CSV", "OUT"))
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(*args.run, chunk_size=args.chunk_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [int(x) for x in args.sizes.split(",")]:
+            csv_path = write_bom_csv(os.path.join(tmp, f"bom_{n}.csv"), n)
+            for mode in args.modes.split(","):
+                out = subprocess.run(
+                    [sys.executable, "-m", "scripts.benchmarks.bench_streaming",
+                     "--chunk-size", str(args.chunk_size),
+                     "--run", mode, csv_path, os.path.join(tmp, f"out_{mode}.parquet")],
+                    capture_output=True, text=True,
+                )
+                lines = out.stdout.strip().splitlines()
+                if not lines:
+                    print(f"rows={n} mode={mode} failed: {out.stderr.strip()[-300:]}")
+                    continue
+                _, seconds, peak = lines[0].split(",")
+                print(f"rows={n} mode={mode} time={seconds}s peak_rss={peak}MB")
+                for line in lines[1:]:
+                    print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+# кластеризованные векторы: похожие описания компонентов дают плотные группы
+def vector_chunks(size: int, dim: int, clusters: int, seed: int, spread: float = 1.0, chunk: int = 50000):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        x = centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim), dtype=np.float32)
+        yield start, x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+# точные top-k по косинусу прямым перебором — эталон для recall
+def ground_truth(size, dim, clusters, seed, spread, queries, k):
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+    for start, x in vector_chunks(size, dim, clusters, seed, spread):
+        scores = np.concatenate([best_scores, queries @ x.T], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(x)), (len(queries), len(x)))], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+    return [set(f"v{r}" for r in row) for row in best_rows]
+
+
+def measure(query, queries, truth, k):
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        ids = query(q)
+        latencies.append(time.perf_counter() - t)
+        recalls.append(len(expected & set(ids[:k])) / k)
+    return {"recall": float(np.mean(recalls)), "p50": _percentile(latencies, 50), "p99": _percentile(latencies, 99)}
+
+
+def report(size, name, m):
+    print(f"{size:>9,}  {name:<16} recall@10={m['recall']:.3f}  p50={m['p50']:7.1f}ms  p99={m['p99']:7.1f}ms")
+
+
+# Сравнение векторных бэкендов: mmap (точный перебор и IVF с разным nprobe) и Chroma (HNSW)
+def main():
+    parser = argparse.ArgumentParser(description="Vector backends: recall@10 and latency, mmap exact/IVF vs Chroma")
+    parser.add_argument("--sizes", default="100000,700000,2000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=10000)
+    parser.add_argument("--spread", type=float, default=1.0, help="noise around cluster centers")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--nprobe", default="8,32,128")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF clusters (default 4*sqrt(n))")
+    parser.add_argument("--chroma-max-size", type=int, default=100000, help="skip Chroma above this size")
+    parser.add_argument("--dir", default=None, help="work directory (default: temp)")
+    args = parser.parse_args()
+
+    from src.core.vector_index import VectorIndexRepository
+
+    k = 10
+    seed = 0
+    workdir = args.dir or tempfile.mkdtemp(prefix="bench_vector_index_")
+    rng = np.random.default_rng(1)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        # запросы — зашумлённые точки из той же выборки
+        _, sample = next(vector_chunks(min(size, 50000), args.dim, args.clusters, seed, args.spread))
+        queries = sample[rng.choice(len(sample), args.queries, replace=False)]
+        queries = queries + 0.5 * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(args.dim)
+        truth = ground_truth(size, args.dim, args.clusters, seed, args.spread, queries, k)
+
+        path = os.path.join(workdir, f"mmap_{size}")
+        shutil.rmtree(path, ignore_errors=True)
+        index = VectorIndexRepository(path, nprobe=0)
+        t = time.perf_counter()
+        for start, x in vector_chunks(size, args.dim, args.clusters, seed, args.spread):
+            ids = [f"v{i}" for i in range(start, start + len(x))]
+            index.upsert_batch(ids, x, [{"group": f"g{i % 16}"} for i in range(start, start + len(x))])
+        print(f"{size:>9,}  mmap insert      {time.perf_counter() - t:.1f}s")
+
+        report(size, "mmap exact", measure(lambda q: index.query(q, k)["ids"][0], queries, truth, k))
+
+        ivf = index.build_ivf(nlist=args.nlist)
+        print(f"{size:>9,}  ivf build        nlist={ivf['nlist']} {ivf['seconds']}s")
+        for nprobe in (int(p) for p in args.nprobe.split(",")):
+            m = measure(lambda q: index.query(q, k, nprobe=nprobe)["ids"][0], queries, truth, k)
+            report(size, f"mmap ivf/{nprobe}", m)
+
+        index.db.close()
+        shutil.rmtree(path, ignore_errors=True)
+
+        if size > args.chroma_max_size:
+            continue
+        try:
+            import chromadb
+        except ImportError:
+            print(f"{size:>9,}  chroma           skipped (chromadb not installed)")
+            continue
+
+        path = os.path.join(workdir, f"chroma_{size}")
+        client = chromadb.PersistentClient(path=path)
+        collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+        t = time.perf_counter()
+        for start, x in vector_chunks(size, args.dim, args.clusters, seed, args.spread):
+            # лимит батча Chroma меньше куска генератора (тот же поток случайных чисел)
+            for i in range(0, len(x), 5000):
+                ids = [f"v{j}" for j in range(start + i, start + min(i + 5000, len(x)))]
+                collection.add(ids=ids, embeddings=x[i:i + 5000].tolist())
+        print(f"{size:>9,}  chroma insert    {time.perf_counter() - t:.1f}s")
+
+        m = measure(lambda q: collection.query(query_embeddings=[q.tolist()], n_results=k)["ids"][0], queries, truth, k)
+        report(size, "chroma hnsw", m)
+        del collection, client
+        shutil.rmtree(path, ignore_errors=True)
+
+    if not args.dir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.config import DESCRIPTIONS_PATH
+
+
+# Загрузка реальных описаний для синтетических BOM
+def load_descriptions() -> np.ndarray:
+    if not os.path.exists(DESCRIPTIONS_PATH):
+        return np.array(["HEX BOLT M8X20 A2-70", "BEARING HOUSING ASSY", "GASKET RF 2 SCH40"])
+    df = pd.read_csv(DESCRIPTIONS_PATH, index_col=0)
+    return df.iloc[:, 0].dropna().astype(str).to_numpy()
+
+
+# Генерация синтетического BOM заданного размера
+def make_bom(n_rows: int, depth: int = 4, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    descriptions = load_descriptions()
+
+    # пул компонентов меньше числа строк: компоненты повторяются между сборками
+    n_components = max(10, n_rows // 20)
+    n_assemblies = max(1, n_rows // 2000)
+
+    materials = np.array([f"MAT{i:06d}" for i in range(n_assemblies)])
+    subassemblies = np.array([f"S{i:07d}" for i in range(max(1, n_components // 10))])
+    components = np.array([f"C{i:07d}" for i in range(n_components)])
+
+    mat = materials[rng.integers(0, n_assemblies, n_rows)]
+    levels = rng.integers(1, depth + 1, n_rows)
+
+    segments = [mat]
+    for _ in range(depth - 1):
+        segments.append(subassemblies[rng.integers(0, len(subassemblies), n_rows)])
+
+    # последний сегмент: чаще лист, иногда подсборка
+    last = np.where(
+        rng.random(n_rows) < 0.7,
+        components[rng.integers(0, n_components, n_rows)],
+        subassemblies[rng.integers(0, len(subassemblies), n_rows)],
+    )
+
+    paths = np.empty(n_rows, dtype=object)
+    for i in range(n_rows):
+        paths[i] = ".".join([s[i] for s in segments[: levels[i]]] + [last[i]])
+
+    df = pd.DataFrame({
+        "material_id": mat,
+        "component_id": [p.rsplit(".", 1)[-1] for p in paths],
+        "description": descriptions[rng.integers(0, len(descriptions), n_rows)],
+        "qty": rng.integers(1, 50, n_rows).astype(float),
+        "path": paths,
+    })
+
+    # корневые строки сборок
+    roots = pd.DataFrame({
+        "material_id": materials,
+        "component_id": materials,
+        "description": [f"Assembly {m}" for m in materials],
+        "qty": 1.0,
+        "path": materials,
+    })
+
+    return pd.concat([roots, df], ignore_index=True).head(n_rows)
+
+
+# Запись синтетического BOM в CSV
+def write_bom_csv(path: str, n_rows: int, seed: int = 42) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    make_bom(n_rows, seed=seed).to_csv(path, index=False)
+    return path
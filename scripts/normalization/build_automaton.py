@@ -0,0 +1,28 @@
+import time
+
+from src.config import DICT_AUTOMATON_CACHE_PATH
+from src.data_processing.dictionary_matcher import build_automaton, load_or_build_automaton
+
+
+# Сборка автомата Aho–Corasick по очищенным словарям и сохранение в кэш
+def main():
+    t = time.time()
+    build_automaton()
+    build_time = time.time() - t
+
+    automaton, lists = load_or_build_automaton()
+
+    t = time.time()
+    load_or_build_automaton()
+    load_time = time.time() - t
+
+    print(
+        f"Automaton built: {len(automaton)} words "
+        f"({', '.join(f'{k}: {len(v)}' for k, v in lists.items())})"
+    )
+    print(f"Build: {build_time * 1000:.1f} ms, load from cache: {load_time * 1000:.1f} ms")
+    print(f"Saved to {DICT_AUTOMATON_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 # src/api/main.py
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from src.data_processing.feature_extractor import shutdown_pool
 from src.db.init_db import init_db
 
 # Роутеры API
@@ -26,8 +29,17 @@ logging.basicConfig(
 # Инициализация базы данных
 init_db()
 
+
+# При остановке приложения закрываем пул процессов парсинга
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_pool()
+
+
 # Создание FastAPI приложения
 app = FastAPI(
+    lifespan=lifespan,
     title="BOM Intelligence API",
     description="Backend for hierarchical BOM management, vector search, analytics, and processing pipeline",
     version="2.0.0",
@@ -1,22 +1,52 @@
 # src/api/routes/cross_matching.py
 
+from typing import List, Literal, Optional
+
 from fastapi import APIRouter, Query
-from src.core.cross_matching import CrossMatchingService
+from pydantic import BaseModel, Field
+
+from src.core.cross_matching import CrossMatchingService, CATEGORIES
 
 router = APIRouter(prefix="/cross-matching", tags=["cross-matching"])
 
 service = CrossMatchingService()
 
+# компонентов в одном пакетном запросе
+MAX_BATCH_SIZE = 200
+
+
+# допустимые значения categories (неизвестные отклоняются валидацией, 422)
+Category = Literal[CATEGORIES]
+
+
+class CrossMatchingBatchRequest(BaseModel):
+    component_ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    top_k: int = Field(10, ge=1, le=100)
+    same_level_only: bool = False
+    categories: Optional[List[Category]] = None
+
+
+@router.post("/batch")
+def similar_components_batch(payload: CrossMatchingBatchRequest):
+    results = service.find_similar_batch(
+        component_ids=payload.component_ids,
+        top_k=payload.top_k,
+        same_level_only=payload.same_level_only,
+        categories=payload.categories,
+    )
+    return {"results": {str(cid): r for cid, r in results.items()}}
+
 
 @router.get("/{component_id}")
 def similar_components(
     component_id: int,
     top_k: int = Query(10, ge=1, le=100),
     same_level_only: bool = False,
+    categories: Optional[List[Category]] = Query(None),
 ):
     return service.find_similar(
         component_id=component_id,
         top_k=top_k,
         same_level_only=same_level_only,
+        categories=categories,
     )
-
@@ -1,6 +1,8 @@
 # src/api/routes/imports.py
 
-from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
 from src.db.init_db import import_from_parquet
@@ -10,15 +12,20 @@ router = APIRouter(prefix="/import", tags=["import"])
 
 class ImportResponse(BaseModel):
     imported_rows: int
+    # время, rows/sec и RSS этого импорта
+    stats: Dict[str, Any] = {}
 
 
 @router.post("/parquet", response_model=ImportResponse)
-def import_parquet():
+def import_parquet(
+    mode: Optional[str] = Query(None, pattern="^(replace|incremental)$"),
+):
+    stats: Dict[str, Any] = {}
     try:
-        count = import_from_parquet()
+        count = import_from_parquet(mode=mode, stats=stats)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="processed_bom.parquet not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
-    return ImportResponse(imported_rows=count)
+    return ImportResponse(imported_rows=count, stats=stats)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, BackgroundTasks
 
 from src.ml.embedding_service import EmbeddingService
 from src.core.graph_service import GraphService
+from src.core.backfill_chroma_metadata import backfill_chroma_metadata
 
 router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
@@ -13,6 +14,12 @@ def rebuild_embeddings(background: BackgroundTasks):
     return {"status": "started"}
 
 
+# дозапись атрибутов фильтров в метаданные Chroma без пересчёта векторов
+@router.post("/backfill_chroma_metadata")
+def backfill_metadata(background: BackgroundTasks):
+    background.add_task(backfill_chroma_metadata)
+    return {"status": "started"}
+
 
 @router.post("/rebuild_graph")
 def rebuild_graph():
@@ -3,14 +3,14 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 
 from src.core.hybrid_search import HybridSearchService
-from src.ml.embedding_service import EmbeddingService
+from src.ml.query_encoder import QueryEncoder
 from src.core.component_service import ComponentService
 from src.core.models import ComponentRead
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 search_service = HybridSearchService()
-embedder = EmbeddingService.instance()
+query_encoder = QueryEncoder.instance()
 component_service = ComponentService()
 
 
@@ -47,7 +47,7 @@ class HybridSearchRequest(BaseModel):
 
 @router.post("/hybrid")
 def hybrid_search(payload: HybridSearchRequest):
-    embedding = embedder.encode(payload.query)
+    embedding = query_encoder.encode(payload.query)
 
     filters: Dict[str, Any] = {}
 
@@ -69,4 +69,7 @@ def hybrid_search(payload: HybridSearchRequest):
     return df.to_dict(orient="records")
 
 
-
+# метрики кодирования запросов: hit_rate кэша и размеры батчей
+@router.get("/metrics")
+def search_metrics():
+    return query_encoder.metrics()
@@ -20,6 +20,85 @@ CHROMA_DIR = os.environ.get("CHROMA_DIR", os.path.join(DATA_DIR, "chroma"))
 RAW_DATA_DIR = os.environ.get("RAW_DATA_DIR", os.path.join(DATA_DIR, "raw"))
 PROCESSED_DATA_DIR = os.environ.get("PROCESSED_DATA_DIR", os.path.join(DATA_DIR, "processed"))
 
+# SQLite: путь к БД, профиль pragma (performance | default) и пул соединений
+DB_PATH = os.environ.get("DB_PATH", os.path.join(DATA_DIR, "bom.sqlite3"))
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "performance")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# page cache на весь пул: делится поровну между DB_POOL_READERS + 1 соединениями
+SQLITE_CACHE_BUDGET_KB = int(os.environ.get("SQLITE_CACHE_BUDGET_KB", "262144"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+DB_POOL_READERS = int(os.environ.get("DB_POOL_READERS", "8"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+# Потоковая обработка CSV чанками (ограничивает пиковую память на больших BOM)
+STREAM_PROCESSING = os.environ.get("STREAM_PROCESSING", "0") == "1"
+PROCESS_CHUNK_SIZE = int(os.environ.get("PROCESS_CHUNK_SIZE", "100000"))
+
+# Парсинг описаний в пуле процессов (0 — по числу ядер, 1 — без пула)
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "1"))
+PARSE_PARALLEL_MIN_ROWS = int(os.environ.get("PARSE_PARALLEL_MIN_ROWS", "20000"))
+
+# Персистентный кэш разобранных описаний (ключ — описание + версия словарей)
+PARSE_CACHE_ENABLED = os.environ.get("PARSE_CACHE_ENABLED", "0") == "1"
+PARSE_CACHE_PATH = os.environ.get("PARSE_CACHE_PATH", os.path.join(DATA_DIR, "cache", "parse_cache.sqlite3"))
+
+# Собранный автомат Aho–Corasick словарей (ключ — хэш содержимого *_CLEAN)
+DICT_AUTOMATON_CACHE_ENABLED = os.environ.get("DICT_AUTOMATON_CACHE_ENABLED", "1") == "1"
+DICT_AUTOMATON_CACHE_PATH = os.environ.get(
+    "DICT_AUTOMATON_CACHE_PATH", os.path.join(DATA_DIR, "cache", "dictionary_automaton.pkl")
+)
+
+# Режим словарного сопоставления: all (все пересекающиеся вхождения) | longest (самое длинное по границам слов)
+DICT_MATCH_MODE = os.environ.get("DICT_MATCH_MODE", "all")
+
+# Импорт parquet -> SQLite: bulk-загрузка батчами pyarrow (0 — старый путь через ORM)
+IMPORT_BULK = os.environ.get("IMPORT_BULK", "1") == "1"
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "50000"))
+# Режим импорта: replace (полная перезагрузка) | incremental (дифф по unique_id)
+IMPORT_MODE = os.environ.get("IMPORT_MODE", "replace")
+
+# Хранение эмбеддингов в SQLite: BLOB float32 | float16 (старые JSON-строки читаются, см. migrate_embeddings)
+EMBEDDING_STORAGE_DTYPE = os.environ.get("EMBEDDING_STORAGE_DTYPE", "float32")
+
+# Бэкенд модели эмбеддингов: torch (SentenceTransformer на PyTorch) | onnx (onnxruntime, CPU)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# Файл ONNX в репозитории модели; квантованный int8, например onnx/model_quint8_avx2.onnx
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+
+# Батчи encode_batch: тексты сортируются по длине в токенах, размер батча — по бюджету
+# токенов (батч x максимальная длина в нём), но не больше EMBEDDING_MAX_BATCH текстов
+EMBEDDING_TOKEN_BUDGET = int(os.environ.get("EMBEDDING_TOKEN_BUDGET", "4096"))
+EMBEDDING_MAX_BATCH = int(os.environ.get("EMBEDDING_MAX_BATCH", "512"))
+
+# Кэш эмбеддингов по (модель, нормализованный текст) в таблице embedding_cache
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "1") == "1"
+
+# Кодирование запросов /search/hybrid: LRU-кэш векторов и микробатчинг одновременных запросов
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "4096"))
+QUERY_BATCH_WAIT_MS = float(os.environ.get("QUERY_BATCH_WAIT_MS", "2"))
+QUERY_BATCH_MAX = int(os.environ.get("QUERY_BATCH_MAX", "64"))
+
+# Гибридный поиск: начальный пул кандидатов Chroma = max(HYBRID_MIN_CANDIDATES, top_k x HYBRID_CANDIDATE_FACTOR),
+# удваивается, пока после фильтров и дедупликации меньше top_k компонентов (не больше HYBRID_MAX_CANDIDATES)
+HYBRID_MIN_CANDIDATES = int(os.environ.get("HYBRID_MIN_CANDIDATES", "100"))
+HYBRID_CANDIDATE_FACTOR = int(os.environ.get("HYBRID_CANDIDATE_FACTOR", "4"))
+HYBRID_MAX_CANDIDATES = int(os.environ.get("HYBRID_MAX_CANDIDATES", "5000"))
+
+# Cross-matching: начальный пул кандидатов = max(CROSS_MATCHING_MIN_CANDIDATES, лимит категории x
+# CROSS_MATCHING_CANDIDATE_FACTOR), растёт вчетверо, пока запрошенные категории не заполнены
+CROSS_MATCHING_MIN_CANDIDATES = int(os.environ.get("CROSS_MATCHING_MIN_CANDIDATES", "100"))
+CROSS_MATCHING_CANDIDATE_FACTOR = int(os.environ.get("CROSS_MATCHING_CANDIDATE_FACTOR", "4"))
+CROSS_MATCHING_MAX_CANDIDATES = int(os.environ.get("CROSS_MATCHING_MAX_CANDIDATES", "5000"))
+
+# Хранилище векторов: chroma (ChromaDB) | mmap (memory-mapped матрица float32 в процессе)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", os.path.join(DATA_DIR, "vector_index"))
+# IVF (после build_ivf): сколько ближайших кластеров просматривать, 0 — всегда точный поиск
+VECTOR_INDEX_NPROBE = int(os.environ.get("VECTOR_INDEX_NPROBE", "32"))
+
+# Хэш пути в unique_id: sha1 (совместимый) | fast64 | fast128 (см. README, смена меняет все unique_id)
+UNIQUE_ID_HASHER = os.environ.get("UNIQUE_ID_HASHER", "sha1")
+
 
 # Пути к raw‑данным
 COMPONENT_RAW = os.environ.get("COMPONENT_RAW", os.path.join(DICT_DIR, "component_types.yaml"))
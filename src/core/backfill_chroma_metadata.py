@@ -0,0 +1,92 @@
+import argparse
+import logging
+import time
+from typing import Dict, Any
+
+from sqlalchemy import select
+
+from src.core.vector_repository import get_vector_repository, component_metadata, METADATA_SCHEMA_VERSION
+from src.db.database import SessionLocal
+from src.db.models import ComponentDB
+
+logger = logging.getLogger(__name__)
+
+# колонки components, из которых строятся метаданные
+METADATA_COLUMNS = (
+    ComponentDB.id,
+    ComponentDB.unique_id,
+    ComponentDB.abs_level,
+    ComponentDB.is_assembly,
+    ComponentDB.is_subassembly,
+    ComponentDB.is_leaf,
+    ComponentDB.material_id,
+    ComponentDB.component_id,
+    ComponentDB.path,
+    ComponentDB.vendor,
+    ComponentDB.material,
+    ComponentDB.component_type,
+    ComponentDB.standard,
+)
+
+
+# Перезапись метаданных Chroma по текущей схеме без пересчёта векторов:
+# keyset-чтение components и update только метаданных батчами.
+# updated_at в Chroma не меняется, поэтому rebuild_embeddings не сочтёт записи устаревшими
+def backfill_chroma_metadata(batch_size: int = 2000) -> Dict[str, Any]:
+    chroma = get_vector_repository()
+    version_before = chroma.metadata_version()
+
+    scanned = 0
+    last_id = 0
+    t = time.time()
+
+    with SessionLocal() as session:
+        while True:
+            rows = session.execute(
+                select(*METADATA_COLUMNS)
+                .where(ComponentDB.id > last_id)
+                .order_by(ComponentDB.id)
+                .limit(batch_size)
+            ).all()
+            session.rollback()
+
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            chroma.update_metadatas(
+                ids=[r.unique_id for r in rows],
+                metadatas=[component_metadata(r) for r in rows],
+            )
+
+            scanned += len(rows)
+            logger.info(f"[backfill_chroma_metadata] {scanned} rows patched")
+
+    chroma.set_metadata_version(METADATA_SCHEMA_VERSION)
+
+    stats = {
+        "scanned": scanned,
+        "schema_version_before": version_before,
+        "schema_version": METADATA_SCHEMA_VERSION,
+        "seconds": round(time.time() - t, 3),
+    }
+    logger.info(f"[backfill_chroma_metadata] Done: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite Chroma metadata to the current schema without re-encoding")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    stats = backfill_chroma_metadata(batch_size=args.batch_size)
+    print(
+        f"Patched metadata of {stats['scanned']} components in {stats['seconds']}s "
+        f"(schema {stats['schema_version_before']} -> {stats['schema_version']})"
+    )
+
+
+if __name__ == "__main__":
+    main()
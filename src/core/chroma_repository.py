@@ -1,5 +1,33 @@
-from typing import List, Dict, Any, Optional
+import json
+import os
+from typing import List, Dict, Any, Optional, Sequence, Union
 import chromadb
+import numpy as np
+
+from src.core.vector_repository import METADATA_SCHEMA_VERSION
+
+# chromadb >= 0.6 принимает numpy-массивы, более ранние — только списки float
+_NUMPY_EMBEDDINGS = tuple(int(p) for p in chromadb.__version__.split(".")[:2]) >= (0, 6)
+
+
+CHROMA_PATH = "./data/chroma"
+# маркер версии схемы метаданных коллекции (см. vector_repository.METADATA_SCHEMA_VERSION)
+METADATA_SCHEMA_FILE = "metadata_schema.json"
+
+
+# векторы из SQLite приходят как np.ndarray (BLOB), Chroma ждёт списки float
+def _as_list(vector: Sequence[float]) -> List[float]:
+    if isinstance(vector, np.ndarray):
+        return vector.astype(np.float32, copy=False).tolist()
+    return vector
+
+
+# матрица (n, dim) уходит в Chroma как есть или одним tolist() для старых версий
+def _as_embeddings(embeddings: Union[np.ndarray, List[Sequence[float]]]):
+    if isinstance(embeddings, np.ndarray):
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        return matrix if _NUMPY_EMBEDDINGS else matrix.tolist()
+    return [_as_list(e) for e in embeddings]
 
 
 # Репозиторий для работы с ChromaDB
@@ -8,13 +36,14 @@ class ChromaRepository:
 
     def __init__(self):
         # дисковое хранилище без RAM кэшей
-        self.client = chromadb.PersistentClient(path="./data/chroma")
+        self.client = chromadb.PersistentClient(path=CHROMA_PATH)
 
         # коллекция с HNSW и косинусной метрикой
         self.collection = self.client.get_or_create_collection(
             name="bom_components",
             metadata={"hnsw:space": "cosine"},
         )
+        self._schema_marker: Optional[tuple] = None
 
     # синглтон доступ к экземпляру
     @classmethod
@@ -32,7 +61,7 @@ class ChromaRepository:
     ) -> None:
         self.collection.upsert(
             ids=ids,
-            embeddings=embeddings,
+            embeddings=[_as_list(e) for e in embeddings],
             metadatas=metadatas,
         )
 
@@ -47,9 +76,32 @@ class ChromaRepository:
     ) -> Dict[str, Any]:
         # быстрый HNSW поиск по вектору
         result = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=[_as_list(query_embedding)],
+            n_results=n_results,
+            where=where,
+        )
+
+        return {
+            "ids": result.get("ids", []),
+            "distances": result.get("distances", []),
+            "metadatas": result.get("metadatas", []),
+            "embeddings": result.get("embeddings", []),
+        }
+
+    # несколько векторов одним запросом: списки ответов по запросам;
+    # без include_metadatas Chroma не читает метаданные кандидатов
+    def query_batch(
+        self,
+        query_embeddings: Union[np.ndarray, List[Sequence[float]]],
+        n_results: int = 20,
+        where: Optional[Dict[str, Any]] = None,
+        include_metadatas: bool = True,
+    ) -> Dict[str, Any]:
+        result = self.collection.query(
+            query_embeddings=_as_embeddings(query_embeddings),
             n_results=n_results,
             where=where,
+            include=["metadatas", "distances"] if include_metadatas else ["distances"],
         )
 
         return {
@@ -59,11 +111,11 @@ class ChromaRepository:
             "embeddings": result.get("embeddings", []),
         }
 
-    # массовые операции для полного пересоздания
+    # массовые операции для полного пересоздания; embeddings — матрица float32 или список векторов
     def upsert_batch(
         self,
         ids: List[str],
-        embeddings: List[List[float]],
+        embeddings: Union[np.ndarray, List[List[float]]],
         metadatas: List[Dict[str, Any]],
     ) -> None:
         if not ids:
@@ -71,7 +123,7 @@ class ChromaRepository:
 
         self.collection.upsert(
             ids=ids,
-            embeddings=embeddings,
+            embeddings=_as_embeddings(embeddings),
             metadatas=metadatas,
         )
 
@@ -80,6 +132,33 @@ class ChromaRepository:
             return
         self.collection.delete(ids=ids)
 
+    # обновление только метаданных (векторы не трогаются); ключи сливаются
+    # с существующими, отсутствующие в коллекции id пропускаются
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        if not ids:
+            return
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    # версия схемы метаданных коллекции: из файла-маркера, который пишет backfill;
+    # без маркера непустая коллекция считается собранной по схеме 1
+    def metadata_version(self) -> int:
+        path = os.path.join(CHROMA_PATH, METADATA_SCHEMA_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return METADATA_SCHEMA_VERSION if self.collection.count() == 0 else 1
+
+        # маркер перечитывается, только если его переписал другой процесс
+        if self._schema_marker is None or self._schema_marker[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                self._schema_marker = (mtime, int(json.load(f).get("version", 1)))
+        return self._schema_marker[1]
+
+    def set_metadata_version(self, version: int = METADATA_SCHEMA_VERSION) -> None:
+        os.makedirs(CHROMA_PATH, exist_ok=True)
+        with open(os.path.join(CHROMA_PATH, METADATA_SCHEMA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": version}, f)
+
     # утилиты для чтения ID и метаданных
     def get_all_ids(self) -> List[str]:
         # чтение ID батчами для избежания RAM пиков
@@ -140,3 +219,4 @@ class ChromaRepository:
             name="bom_components",
             metadata={"hnsw:space": "cosine"},
         )
+        self.set_metadata_version()
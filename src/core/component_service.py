@@ -5,7 +5,7 @@ from sqlalchemy import select, func
 
 from src.db.database import SessionLocal
 from src.db.models import ComponentDB
-from src.core.chroma_repository import ChromaRepository
+from src.core.vector_repository import get_vector_repository, component_metadata
 from src.ml.embedding_service import EmbeddingService
 from src.core.models import ComponentCreate, ComponentUpdate, ComponentRead
 
@@ -14,7 +14,7 @@ from src.core.models import ComponentCreate, ComponentUpdate, ComponentRead
 class ComponentService:
 
     def __init__(self):
-        self.chroma = ChromaRepository.instance()
+        self.chroma = get_vector_repository()
         self.embedder = EmbeddingService.instance()
 
     # получение сессии БД
@@ -50,27 +50,18 @@ class ComponentService:
 
     # работа с эмбеддингами и Chroma
     def _ensure_embedding(self, obj: ComponentDB) -> None:
-        if not obj.embedding_vector:
+        if obj.embedding_vector is None:
             text = obj.clean_name or ""
-            obj.embedding_vector = self.embedder.encode(text)
+            obj.embedding_vector = self.embedder.encode_cached_array([text])[0]
 
     def _upsert_chroma(self, obj: ComponentDB) -> None:
-        if not obj.embedding_vector:
+        if obj.embedding_vector is None:
             return
 
         self.chroma.upsert(
             ids=[str(obj.unique_id)],
             embeddings=[obj.embedding_vector],
-            metadatas=[
-                {
-                    "component_id": obj.component_id,
-                    "material_id": obj.material_id,
-                    "abs_level": obj.abs_level,
-                    "is_assembly": obj.is_assembly,
-                    "is_subassembly": obj.is_subassembly,
-                    "is_leaf": obj.is_leaf,
-                }
-            ],
+            metadatas=[component_metadata(obj, obj.updated_at.isoformat() if obj.updated_at else None)],
         )
 
     def _delete_from_chroma(self, unique_id: str) -> None:
@@ -268,12 +259,12 @@ class ComponentService:
     # поиск похожих компонентов по эмбеддингам
     def get_similar_components(self, component_id: int, limit: int = 10):
         with self._get_session() as session:
-            obj = session.get(ComponentDB, component_id)
-            if not obj or not obj.embedding_vector:
+            query_emb = session.execute(
+                select(ComponentDB.embedding_vector).where(ComponentDB.id == component_id)
+            ).scalar_one_or_none()
+            if query_emb is None:
                 return []
 
-            query_emb = obj.embedding_vector
-
             result = self.chroma.query(
                 query_embedding=query_emb,
                 n_results=limit + 1,
@@ -283,15 +274,27 @@ class ComponentService:
             ids = result["ids"][0]
             distances = result["distances"][0]
 
-            stmt = select(ComponentDB).where(ComponentDB.unique_id.in_(ids))
-            rows = session.execute(stmt).scalars().all()
+            # unique_id -> ранг в ответе индекса
+            rank = {uid: i for i, uid in enumerate(ids)}
+
+            stmt = select(
+                ComponentDB.id,
+                ComponentDB.unique_id,
+                ComponentDB.component_id,
+                ComponentDB.clean_name,
+                ComponentDB.vendor,
+                ComponentDB.material,
+                ComponentDB.size,
+                ComponentDB.standard,
+            ).where(ComponentDB.unique_id.in_(ids))
+            rows = sorted(session.execute(stmt).all(), key=lambda r: rank[r.unique_id])
 
             out = []
             for r in rows:
                 if r.id == component_id:
                     continue
 
-                dist = distances[ids.index(r.unique_id)]
+                dist = distances[rank[r.unique_id]]
                 out.append({
                     "id": r.id,
                     "component_id": r.component_id,
@@ -309,8 +312,13 @@ class ComponentService:
 
     def list_embeddings(self) -> List[Dict[str, Any]]:
         with self._get_session() as session:
-            stmt = select(ComponentDB).where(ComponentDB.embedding_vector.isnot(None))
-            rows = session.execute(stmt).scalars().all()
+            stmt = select(
+                ComponentDB.id,
+                ComponentDB.unique_id,
+                ComponentDB.clean_name,
+                ComponentDB.embedding_vector,
+            ).where(ComponentDB.embedding_vector.isnot(None))
+            rows = session.execute(stmt).all()
 
             out = []
             for r in rows:
@@ -318,7 +326,7 @@ class ComponentService:
                     "id": r.id,
                     "unique_id": r.unique_id,
                     "clean_name": r.clean_name,
-                    "vector": r.embedding_vector,
+                    "vector": r.embedding_vector.tolist(),
                 })
 
             return out
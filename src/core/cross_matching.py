@@ -1,135 +1,319 @@
-from typing import Dict, List, Any
+import json
+import logging
+import time
+from typing import Dict, List, Any, Iterable, Optional, Sequence
 
-from sqlalchemy import select
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
 
-from src.core.chroma_repository import ChromaRepository
+from src.config import (
+    CROSS_MATCHING_MIN_CANDIDATES,
+    CROSS_MATCHING_CANDIDATE_FACTOR,
+    CROSS_MATCHING_MAX_CANDIDATES,
+)
+from src.core.vector_repository import get_vector_repository
 from src.db.database import SessionLocal
 from src.db.models import ComponentDB
 from src.ml.embedding_service import EmbeddingService
 
+logger = logging.getLogger(__name__)
+
+# категории ответа
+CATEGORIES = ("same_assembly", "other_assemblies", "analogs")
+
+# колонки кандидатов в ответе (без embedding_vector)
+CANDIDATE_COLUMNS = (
+    "id",
+    "unique_id",
+    "component_id",
+    "clean_name",
+    "vendor",
+    "material",
+    "size",
+    "standard",
+    "abs_level",
+    "path",
+)
+
+# колонки, которые читаются для всех кандидатов пула; остальные CANDIDATE_COLUMNS —
+# только для попавших в ответ
+MATCH_COLUMNS = ("id", "unique_id", "component_id", "clean_name", "abs_level", "path")
+DETAIL_COLUMNS = tuple(c for c in CANDIDATE_COLUMNS if c not in MATCH_COLUMNS)
+
+# поля исходного компонента для поиска и категоризации
+SOURCE_COLUMNS = ("id", "component_id", "clean_name", "abs_level", "path", "embedding_vector")
+
+# поля, по которым кандидат сравнивается с исходным компонентом
+MATCH_FIELDS = ("component_id", "clean_name", "abs_level", "path")
+
+
+def _empty_result() -> Dict[str, List[Dict[str, Any]]]:
+    return {
+        "same_assembly": [],
+        "other_assemblies": [],
+        "analogs": []
+    }
+
+
+# сколько элементов нужно в каждой категории (0 — категория не запрошена)
+def _category_limits(top_k: int, categories: Optional[Sequence[str]]) -> Dict[str, int]:
+    categories = CATEGORIES if categories is None else categories
+    unknown = set(categories) - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"Unknown categories: {sorted(unknown)}")
+
+    limits = {
+        "same_assembly": top_k,
+        "other_assemblies": top_k,
+        # Гарантируем минимум десять аналогов
+        "analogs": max(10, top_k),
+    }
+    return {c: limits[c] if c in categories else 0 for c in CATEGORIES}
+
+
+# Строки кандидатов (колонки MATCH_COLUMNS) по unique_id и коды их полей сравнения: категории считаются
+# масками numpy по позициям ответа векторного поиска, без обхода строк в Python
+class _CandidateTable:
+
+    def __init__(self, rows: Sequence[tuple]):
+        self.rows = rows
+        columns = dict(zip(MATCH_COLUMNS, zip(*rows))) if rows else {c: () for c in MATCH_COLUMNS}
+        # unique_id -> позиция строки: ранг кандидата переводится в строку без поиска по списку
+        self.index = pd.Index(columns["unique_id"], dtype=object)
+        self.ids = np.array(columns["id"], dtype=np.int64)
+        self.codes: Dict[str, np.ndarray] = {}
+        self.uniques: Dict[str, pd.Index] = {}
+        for name in MATCH_FIELDS:
+            # None — обычное значение: у исходного и кандидата оно совпадает, как в ==
+            codes, uniques = pd.factorize(pd.Series(columns[name], dtype=object), use_na_sentinel=False)
+            self.codes[name] = codes
+            self.uniques[name] = pd.Index(uniques, dtype=object)
+
+    # код значения поля исходного компонента (-1 — такого нет ни у одного кандидата).
+    # factorize хранит None как nan, а get_indexer([None]) его не находит — пустое значение ищется отдельно
+    def code(self, name: str, value: Any) -> int:
+        uniques = self.uniques[name]
+        if value is None:
+            na = np.flatnonzero(uniques.isna())
+            return int(na[0]) if len(na) else -1
+        return int(uniques.get_indexer([value])[0])
+
 
 class CrossMatchingService:
 
     def __init__(self):
-        self.chroma = ChromaRepository.instance()
+        self.chroma = get_vector_repository()
         self.embedder = EmbeddingService.instance()
 
     def _get_session(self):
         return SessionLocal()
 
-    def _get_component(self, component_id: int):
-        with self._get_session() as session:
-            return session.get(ComponentDB, component_id)
-
     def find_similar(
             self,
             component_id: int,
             top_k: int = 10,
             same_level_only: bool = False,
+            categories: Optional[Sequence[str]] = None,
     ) -> Dict[str, List[Dict[str, Any]]]:
+        return self.find_similar_batch([component_id], top_k, same_level_only, categories)[component_id]
+
+    # Поиск для нескольких компонентов: один запрос исходных строк, один векторный
+    # запрос на все векторы и одна выборка кандидатов из SQLite на раунд.
+    # Пул кандидатов = max(CROSS_MATCHING_MIN_CANDIDATES, лимит x CROSS_MATCHING_CANDIDATE_FACTOR),
+    # растёт вчетверо (до CROSS_MATCHING_MAX_CANDIDATES) только для компонентов с незаполненными категориями
+    def find_similar_batch(
+            self,
+            component_ids: Iterable[int],
+            top_k: int = 10,
+            same_level_only: bool = False,
+            categories: Optional[Sequence[str]] = None,
+    ) -> Dict[int, Dict[str, List[Dict[str, Any]]]]:
+
+        t_start = time.perf_counter()
+        limits = _category_limits(top_k, categories)
+        component_ids = list(dict.fromkeys(component_ids))
+        results = {cid: _empty_result() for cid in component_ids}
+        if not component_ids or not any(limits.values()):
+            return results
+
+        with self._get_session() as session:
+            stmt = select(*(getattr(ComponentDB, c) for c in SOURCE_COLUMNS)).where(
+                ComponentDB.id.in_(component_ids)
+            )
+            sources = [r for r in session.execute(stmt).all() if r.embedding_vector is not None]
 
-        obj = self._get_component(component_id)
-        if not obj or not obj.embedding_vector:
-            return {
-                "same_assembly": [],
-                "other_assemblies": [],
-                "analogs": []
-            }
-
-        query_emb = obj.embedding_vector
-
-        # Получаем большой пул кандидатов
-        result = self.chroma.query(
-            query_embedding=query_emb,
-            n_results=5000,
-            where=None,
+        if not sources:
+            return results
+
+        available = self._duplicate_counts(sources, same_level_only)
+
+        pool = min(
+            max(CROSS_MATCHING_MIN_CANDIDATES, max(limits.values()) * CROSS_MATCHING_CANDIDATE_FACTOR),
+            CROSS_MATCHING_MAX_CANDIDATES,
         )
+        rows: Dict[str, tuple] = {}
+        selected: Dict[int, Dict[str, list]] = {}
+        pending = sources
+        rounds = 0
+
+        while True:
+            rounds += 1
+            result = self.chroma.query_batch(
+                query_embeddings=[r.embedding_vector for r in pending],
+                n_results=pool,
+                include_metadatas=False,
+            )
+
+            # из SQLite догружаются только кандидаты, которых не было в прошлых раундах
+            candidates = {uid for ids in result["ids"] for uid in ids}
+            rows.update(self._load_match_rows(candidates - rows.keys()))
+            table = _CandidateTable([rows[uid] for uid in candidates if uid in rows])
+
+            next_pending = []
+            for obj, ids, distances in zip(pending, result["ids"], result["distances"]):
+                found = self._categorize(obj, ids, distances, table, limits, same_level_only)
+                selected[obj.id] = found
+
+                # индекс отдал всё, что есть, или категории заполнены
+                if len(ids) >= pool and not self._complete(found, limits, available[obj.id]):
+                    next_pending.append(obj)
+
+            if not next_pending or pool >= CROSS_MATCHING_MAX_CANDIDATES:
+                break
+            pending = next_pending
+            pool = min(pool * 4, CROSS_MATCHING_MAX_CANDIDATES)
 
-        ids = result["ids"][0]
-        distances = result["distances"][0]
+        # Остальные колонки — только для строк ответа
+        details = self._load_details(
+            {row[0] for found in selected.values() for pairs in found.values() for row, _ in pairs}
+        )
+
+        for cid, found in selected.items():
+            # словарь кандидата общий для всех его категорий
+            items: Dict[int, Dict[str, Any]] = {}
+            for category, pairs in found.items():
+                out = []
+                for row, distance in pairs:
+                    if row[0] not in items:
+                        values = {**dict(zip(MATCH_COLUMNS, row)), **details.get(row[0], {})}
+                        item = {c: values.get(c) for c in CANDIDATE_COLUMNS}
+                        item["similarity"] = 1 / (1 + distance)
+                        items[row[0]] = item
+                    out.append(items[row[0]])
+                results[cid][category] = out
+
+        logger.info(
+            "[cross_matching] components=%d top_k=%d rounds=%d pool=%d candidates_loaded=%d total=%.1fms",
+            len(sources), top_k, rounds, pool, len(rows), (time.perf_counter() - t_start) * 1000,
+        )
+        return results
+
+    # Дубликаты исходных компонентов в индексе (тот же component_id, есть вектор):
+    # {id: (в той же сборке, в других сборках)}. Когда все найдены, пул не растёт
+    def _duplicate_counts(self, sources: Sequence[Any], same_level_only: bool) -> Dict[int, tuple]:
+        with self._get_session() as session:
+            stmt = (
+                select(ComponentDB.component_id, ComponentDB.path, ComponentDB.abs_level, func.count())
+                .where(
+                    ComponentDB.component_id.in_({s.component_id for s in sources}),
+                    ComponentDB.embedding_vector.is_not(None),
+                )
+                .group_by(ComponentDB.component_id, ComponentDB.path, ComponentDB.abs_level)
+            )
+            groups: Dict[Any, list] = {}
+            for component_id, path, abs_level, n in session.execute(stmt).all():
+                groups.setdefault(component_id, []).append((path, abs_level, n))
 
+        counts = {}
+        for s in sources:
+            same = other = 0
+            for path, abs_level, n in groups.get(s.component_id, []):
+                if same_level_only and abs_level != s.abs_level:
+                    continue
+                if path == s.path:
+                    same += n
+                else:
+                    other += n
+            # сам исходный компонент не в счёт
+            counts[s.id] = (max(same - 1, 0), other)
+        return counts
+
+    @staticmethod
+    def _complete(found: Dict[str, list], limits: Dict[str, int], available: tuple) -> bool:
+        same, other = available
+        return (
+            len(found["same_assembly"]) >= min(limits["same_assembly"], same)
+            and len(found["other_assemblies"]) >= min(limits["other_assemblies"], other)
+            and len(found["analogs"]) >= limits["analogs"]
+        )
+
+    # колонки сравнения для кандидатов: список unique_id уходит одним параметром JSON,
+    # без лимита числа параметров SQLite
+    def _load_match_rows(self, unique_ids: Iterable[str]) -> Dict[str, tuple]:
+        unique_ids = sorted(unique_ids)
+        if not unique_ids:
+            return {}
+
+        with self._get_session() as session:
+            wanted = func.json_each(json.dumps(unique_ids)).table_valued("value")
+            stmt = select(*(getattr(ComponentDB, c) for c in MATCH_COLUMNS)).where(
+                ComponentDB.unique_id.in_(select(wanted.c.value))
+            )
+            return {r.unique_id: tuple(r) for r in session.execute(stmt).all()}
+
+    def _load_details(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        ids = sorted(ids)
         if not ids:
-            return {
-                "same_assembly": [],
-                "other_assemblies": [],
-                "analogs": []
-            }
+            return {}
 
-        # Загружаем ORM объекты
         with self._get_session() as session:
-            stmt = select(ComponentDB).where(ComponentDB.unique_id.in_(ids))
-            rows = session.execute(stmt).scalars().all()
-
-        # Собираем результаты
-        items = []
-        for r in rows:
-            if r.id == component_id:
-                continue
-
-            dist = distances[ids.index(r.unique_id)]
-            similarity = 1 / (1 + dist)
-
-            items.append({
-                "id": r.id,
-                "unique_id": r.unique_id,
-                "component_id": r.component_id,
-                "clean_name": r.clean_name,
-                "vendor": r.vendor,
-                "material": r.material,
-                "size": r.size,
-                "standard": r.standard,
-                "abs_level": r.abs_level,
-                "path": r.path,
-                "similarity": similarity,
-            })
-
-        # Сортировка по similarity
-        items.sort(key=lambda x: x["similarity"], reverse=True)
-
-        # Категоризация
-        same_assembly = []
-        other_assemblies = []
-
-        for item in items:
-            # Фильтр по уровню
-            if same_level_only and item["abs_level"] != obj.abs_level:
-                continue
-
-            # Дубликаты в той же сборке
-            if item["component_id"] == obj.component_id and item["path"] == obj.path:
-                same_assembly.append(item)
-                continue
-
-            # Дубликаты в других сборках
-            if item["component_id"] == obj.component_id and item["path"] != obj.path:
-                other_assemblies.append(item)
-                continue
-
-        # Формируем список аналогов
-        analogs_raw = [
-            item for item in items
-            if item["clean_name"] != obj.clean_name
-        ]
-
-        # Убираем дубликаты по component_id
-        unique_ids = set()
-        analogs_unique = []
-
-        for item in analogs_raw:
-            cid = item["component_id"]
-            if cid not in unique_ids:
-                unique_ids.add(cid)
-                analogs_unique.append(item)
+            wanted = func.json_each(json.dumps(ids)).table_valued("value")
+            stmt = select(ComponentDB.id, *(getattr(ComponentDB, c) for c in DETAIL_COLUMNS)).where(
+                ComponentDB.id.in_(select(wanted.c.value))
+            )
+            return {r[0]: dict(zip(DETAIL_COLUMNS, r[1:])) for r in session.execute(stmt).all()}
 
-        # Гарантируем минимум десять аналогов
-        analogs = analogs_unique[:max(10, top_k)]
+    # Категоризация кандидатов одного компонента; ids и distances — ответ векторного
+    # поиска, table — строки кандидатов. Результат — пары (строка, расстояние) по категориям
+    @staticmethod
+    def _categorize(
+            obj,
+            ids: List[str],
+            distances: List[float],
+            table: _CandidateTable,
+            limits: Dict[str, int],
+            same_level_only: bool,
+    ) -> Dict[str, list]:
+
+        # Позиции кандидатов в таблице по близости (1 / (1 + dist) убывает с ростом dist)
+        pos = table.index.get_indexer(ids)
+        dist = np.asarray(distances, dtype=np.float64)
+        order = np.argsort(dist, kind="stable")
+        pos, dist = pos[order], dist[order]
+
+        keep = pos >= 0
+        pos, dist = pos[keep], dist[keep]
+        keep = table.ids[pos] != obj.id
+        pos, dist = pos[keep], dist[keep]
+
+        # Дубликаты в той же сборке / в других сборках (с фильтром по уровню)
+        duplicate = table.codes["component_id"][pos] == table.code("component_id", obj.component_id)
+        if same_level_only:
+            duplicate &= table.codes["abs_level"][pos] == table.code("abs_level", obj.abs_level)
+        same_path = table.codes["path"][pos] == table.code("path", obj.path)
+
+        selected = {
+            "same_assembly": np.flatnonzero(duplicate & same_path)[:limits["same_assembly"]],
+            "other_assemblies": np.flatnonzero(duplicate & ~same_path)[:limits["other_assemblies"]],
+        }
 
-        # Ограничения
-        same_assembly = same_assembly[:top_k]
-        other_assemblies = other_assemblies[:top_k]
+        # Аналоги: другое наименование, первое вхождение каждого component_id
+        analogs = np.flatnonzero(table.codes["clean_name"][pos] != table.code("clean_name", obj.clean_name))
+        _, first = np.unique(table.codes["component_id"][pos[analogs]], return_index=True)
+        selected["analogs"] = analogs[np.sort(first)][:limits["analogs"]]
 
         return {
-            "same_assembly": same_assembly,
-            "other_assemblies": other_assemblies,
-            "analogs": analogs
+            category: [(table.rows[pos[j]], float(dist[j])) for j in found.tolist()]
+            for category, found in selected.items()
         }
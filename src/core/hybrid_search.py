@@ -1,12 +1,52 @@
+import logging
+import time
+
 import pandas as pd
 from typing import List, Dict, Any, Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, or_
 from sqlalchemy.orm import Session
 
+from src.config import HYBRID_MIN_CANDIDATES, HYBRID_CANDIDATE_FACTOR, HYBRID_MAX_CANDIDATES
 from src.db.database import SessionLocal
 from src.db.models import ComponentDB
-from src.core.chroma_repository import ChromaRepository
+from src.core.vector_repository import get_vector_repository
+
+logger = logging.getLogger(__name__)
+
+# фильтры, которые выполняются внутри индекса Chroma, по версии схемы метаданных
+# (в схеме 1 material_id — это разобранный unique_id, vendor отсутствует)
+CHROMA_FILTER_KEYS = {
+    1: ("record_types",),
+    2: ("record_types", "material_id", "vendor"),
+}
+
+# колонки результата поиска
+RESULT_COLUMNS = (
+    "id",
+    "unique_id",
+    "component_id",
+    "material_id",
+    "abs_level",
+    "clean_name",
+    "vendor",
+    "material",
+    "size",
+    "component_type",
+    "standard",
+    "path",
+    "qty",
+    "is_assembly",
+    "is_subassembly",
+    "is_leaf",
+)
+
+# тип записи -> булева колонка
+RECORD_TYPE_FLAGS = {
+    "ASSEMBLY": "is_assembly",
+    "SUBASSEMBLY": "is_subassembly",
+    "LEAF": "is_leaf",
+}
 
 
 # Гибридный поиск по эмбеддингам и фильтрам SQLite
@@ -14,176 +54,173 @@ class HybridSearchService:
 
     def __init__(self):
         # Инициализация репозитория Chroma
-        self.chroma = ChromaRepository.instance()
+        self.chroma = get_vector_repository()
 
     # Получение сессии БД
     def _get_session(self) -> Session:
         return SessionLocal()
 
-    # Быстрая загрузка компонентов по списку unique_id
-    def _load_components_by_ids(self, ids: List[str]) -> pd.DataFrame:
+    # where для Chroma: только фильтры, поля которых есть в метаданных коллекции
+    def _chroma_where(self, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not filters:
+            return None
+
+        keys = CHROMA_FILTER_KEYS.get(self.chroma.metadata_version(), CHROMA_FILTER_KEYS[2])
+
+        and_filters = []
+        or_filters = []
+
+        # Тип записи
+        if "record_types" in filters and "record_types" in keys:
+            for record_type in filters["record_types"]:
+                flag = RECORD_TYPE_FLAGS.get(record_type)
+                if flag:
+                    or_filters.append({flag: True})
+
+        # Атрибуты
+        for key in ("material_id", "vendor"):
+            if key in filters and key in keys:
+                and_filters.append({key: filters[key]})
+
+        # Комбинация условий
+        if or_filters and and_filters:
+            return {"$and": [{"$or": or_filters} if len(or_filters) > 1 else or_filters[0], *and_filters]}
+        if or_filters:
+            return {"$or": or_filters} if len(or_filters) > 1 else or_filters[0]
+        if and_filters:
+            return {"$and": and_filters} if len(and_filters) > 1 else and_filters[0]
+        return None
+
+    # условия SQLite для всех фильтров: дополняют Chroma и страхуют от устаревших метаданных
+    @staticmethod
+    def _sql_conditions(filters: Optional[Dict[str, Any]]) -> list:
+        if not filters:
+            return []
+
+        conditions = []
+
+        if "record_types" in filters:
+            flags = [
+                getattr(ComponentDB, RECORD_TYPE_FLAGS[t]).is_(True)
+                for t in filters["record_types"]
+                if t in RECORD_TYPE_FLAGS
+            ]
+            conditions.append(or_(*flags) if flags else ComponentDB.id.is_(None))
+
+        if "material_id" in filters:
+            conditions.append(ComponentDB.material_id == filters["material_id"])
+
+        if "vendor" in filters:
+            conditions.append(ComponentDB.vendor == filters["vendor"])
+
+        return conditions
+
+    # Быстрая загрузка компонентов по списку unique_id (батчами под лимит параметров SQLite)
+    def _load_components_by_ids(
+        self, ids: List[str], filters: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
         if not ids:
-            return pd.DataFrame()
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+        columns = [getattr(ComponentDB, c) for c in RESULT_COLUMNS]
+        conditions = self._sql_conditions(filters)
+        rows = []
+        batch_size = 500
 
         with self._get_session() as session:
-            stmt = (
-                select(
-                    ComponentDB.id,
-                    ComponentDB.unique_id,
-                    ComponentDB.component_id,
-                    ComponentDB.material_id,
-                    ComponentDB.abs_level,
-                    ComponentDB.clean_name,
-                    ComponentDB.vendor,
-                    ComponentDB.material,
-                    ComponentDB.size,
-                    ComponentDB.component_type,
-                    ComponentDB.standard,
-                    ComponentDB.path,
-                    ComponentDB.qty,
-                    ComponentDB.is_assembly,
-                    ComponentDB.is_subassembly,
-                    ComponentDB.is_leaf,
+            for i in range(0, len(ids), batch_size):
+                stmt = select(*columns).where(
+                    ComponentDB.unique_id.in_(ids[i:i + batch_size]), *conditions
                 )
-                .where(ComponentDB.unique_id.in_(ids))
-            )
+                rows.extend(session.execute(stmt).all())
 
-            rows = session.execute(stmt).all()
-
-        if not rows:
-            return pd.DataFrame()
-
-        return pd.DataFrame(
-            rows,
-            columns=[
-                "id",
-                "unique_id",
-                "component_id",
-                "material_id",
-                "abs_level",
-                "clean_name",
-                "vendor",
-                "material",
-                "size",
-                "component_type",
-                "standard",
-                "path",
-                "qty",
-                "is_assembly",
-                "is_subassembly",
-                "is_leaf",
-            ],
-        )
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
 
-    # Основной метод гибридного поиска
+    # Основной метод гибридного поиска: пул кандидатов Chroma растёт, пока после
+    # фильтров и дедупликации по component_id не наберётся n_results компонентов
     def search(
         self,
         query_embedding: List[float],
         n_results: int = 20,
         filters: Optional[Dict[str, Any]] = None,
+        stats: Optional[dict] = None,
     ) -> pd.DataFrame:
 
-        chroma_where: Dict[str, Any] = {}
-
-        # Построение корректного where для Chroma
-        if filters:
-            and_filters = []
-            or_filters = []
-
-            # Тип записи
-            if "record_types" in filters:
-                types = filters["record_types"]
-
-                if "ASSEMBLY" in types:
-                    or_filters.append({"is_assembly": True})
-                if "SUBASSEMBLY" in types:
-                    or_filters.append({"is_subassembly": True})
-                if "LEAF" in types:
-                    or_filters.append({"is_leaf": True})
-
-            # Материал
-            if "material_id" in filters:
-                and_filters.append({"material_id": filters["material_id"]})
-
-            # Vendor
-            if "vendor" in filters:
-                and_filters.append({"vendor": filters["vendor"]})
-
-            # Комбинация условий
-            if or_filters and and_filters:
-                chroma_where = {"$and": [{"$or": or_filters}, *and_filters]}
-            elif or_filters:
-                chroma_where = {"$or": or_filters} if len(or_filters) > 1 else or_filters[0]
-            elif and_filters:
-                chroma_where = {"$and": and_filters} if len(and_filters) > 1 else and_filters[0]
-
-        # Векторный поиск в Chroma с большим пулом кандидатов
-        result = self.chroma.query(
-            query_embedding=query_embedding,
-            n_results=200,
-            where=chroma_where or None,
-        )
-
-        ids = result["ids"][0] if result["ids"] else []
-        distances = result["distances"][0] if result["distances"] else []
-
-        if not ids:
-            return pd.DataFrame()
-
-        # Загрузка данных из SQLite
-        df = self._load_components_by_ids(ids)
-        if df.empty:
-            return df
-
-        # Привязка расстояний
-        score_map = {id_: dist for id_, dist in zip(ids, distances)}
-        df["score"] = df["unique_id"].map(score_map)
-
-        # Фильтрация pandas
-        if filters:
-
-            # Тип записи
-            if "record_types" in filters:
-                types = filters["record_types"]
-                mask = False
-
-                if "ASSEMBLY" in types:
-                    mask |= df["is_assembly"]
-                if "SUBASSEMBLY" in types:
-                    mask |= df["is_subassembly"]
-                if "LEAF" in types:
-                    mask |= df["is_leaf"]
-
-                df = df[mask]
-
-            # Материал
-            if "material_id" in filters:
-                df = df[df["material_id"] == filters["material_id"]]
-
-            # Vendor
-            if "vendor" in filters:
-                df = df[df["vendor"] == filters["vendor"]]
-
-        # Сортировка по близости
-        df = df.sort_values("score")
+        t_start = time.perf_counter()
+        where = self._chroma_where(filters)
+
+        pool = min(max(HYBRID_MIN_CANDIDATES, n_results * HYBRID_CANDIDATE_FACTOR), HYBRID_MAX_CANDIDATES)
+        distances: Dict[str, float] = {}
+        frames: List[pd.DataFrame] = []
+        components: set = set()
+        timings = {"chroma": 0.0, "sqlite": 0.0, "dedup": 0.0}
+        rounds = 0
+
+        while True:
+            rounds += 1
+
+            # Векторный поиск в Chroma
+            t = time.perf_counter()
+            result = self.chroma.query(
+                query_embedding=query_embedding,
+                n_results=pool,
+                where=where,
+            )
+            timings["chroma"] += time.perf_counter() - t
 
-        # Сбор 10 ближайших уникальных component_id
-        unique_rows = []
-        seen = set()
+            ids = result["ids"][0] if result["ids"] else []
+            dists = result["distances"][0] if result["distances"] else []
 
-        for _, row in df.iterrows():
-            cid = row["component_id"]
+            # из SQLite — только кандидаты, не загруженные в прошлых раундах
+            new_ids = [i for i in ids if i not in distances]
+            distances.update(zip(ids, dists))
 
-            if cid in seen:
-                continue
+            t = time.perf_counter()
+            frame = self._load_components_by_ids(new_ids, filters)
+            timings["sqlite"] += time.perf_counter() - t
 
-            seen.add(cid)
-            unique_rows.append(row)
+            if not frame.empty:
+                frames.append(frame)
+                components.update(frame["component_id"].unique())
 
-            if len(unique_rows) == 10:
+            # хватает компонентов, индекс отдал всё подходящее (ответ короче пула —
+            # mmap с IVF в этом случае сам переходит на точный перебор) или пул упёрся в предел
+            if len(components) >= n_results or len(ids) < pool or pool >= HYBRID_MAX_CANDIDATES:
                 break
-
-        if not unique_rows:
-            return pd.DataFrame()
-
-        return pd.DataFrame(unique_rows)
+            pool = min(pool * 2, HYBRID_MAX_CANDIDATES)
+
+        # Сортировка по близости и первые вхождения component_id
+        t = time.perf_counter()
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            df["score"] = df["unique_id"].map(distances)
+            df = (
+                df.sort_values("score", kind="stable")
+                .drop_duplicates("component_id")
+                .head(n_results)
+                .reset_index(drop=True)
+            )
+        else:
+            df = pd.DataFrame()
+        timings["dedup"] += time.perf_counter() - t
+
+        query_stats = {
+            "top_k": n_results,
+            "rounds": rounds,
+            "candidate_pool": pool,
+            "candidates_loaded": sum(len(f) for f in frames),
+            "results": len(df),
+            **{f"{k}_ms": round(v * 1000, 2) for k, v in timings.items()},
+            "total_ms": round((time.perf_counter() - t_start) * 1000, 2),
+        }
+        if stats is not None:
+            stats.update(query_stats)
+
+        logger.info(
+            "[hybrid] top_k=%d rounds=%d pool=%d loaded=%d results=%d "
+            "chroma=%.1fms sqlite=%.1fms dedup=%.1fms total=%.1fms",
+            n_results, rounds, pool, query_stats["candidates_loaded"], len(df),
+            query_stats["chroma_ms"], query_stats["sqlite_ms"], query_stats["dedup_ms"],
+            query_stats["total_ms"],
+        )
+        return df
@@ -6,7 +6,8 @@ import os
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor
 
-from src.pipeline.processor import SimpleBOMProcessor
+from src.config import STREAM_PROCESSING, PROCESS_CHUNK_SIZE
+from src.pipeline.processor import SimpleBOMProcessor, CSV_DTYPES
 from src.core.task_manager import TaskManager
 from src.db.init_db import import_from_parquet
 
@@ -33,32 +34,46 @@ def run_processing(task_id: str, file_path: str) -> None:
     logger.info("run_processing STARTED for task %s, file %s", task_id, file_path)
 
     try:
-        # чтение CSV
-        TaskManager.update(task_id, status="running", progress=5, message="Reading CSV file...")
-        df = pd.read_csv(file_path)
-
-        # запуск пайплайна
-        TaskManager.update(task_id, progress=20, message="Running processing pipeline...")
-        processor = SimpleBOMProcessor()
-        processed_df = processor.process_pipeline(df)
-        stats = processor.get_stats()
-
-        logger.info("Task %s: processed %d rows", task_id, len(processed_df))
-
-        # сохранение parquet
-        TaskManager.update(task_id, progress=60, message="Saving processed parquet...")
-
         output_dir = "data/processed"
         output_path = os.path.join(output_dir, "processed_bom.parquet")
 
         os.makedirs(output_dir, exist_ok=True)
-        processed_df.to_parquet(output_path, index=False)
+
+        processor = SimpleBOMProcessor()
+
+        if STREAM_PROCESSING:
+            # потоковая обработка чанками с записью parquet по частям
+            TaskManager.update(
+                task_id, status="running", progress=5, message="Running streaming pipeline..."
+            )
+            processed_rows = processor.process_stream(
+                file_path, output_path, chunk_size=PROCESS_CHUNK_SIZE
+            )
+            stats = processor.get_stats()
+
+            logger.info("Task %s: processed %d rows (streaming)", task_id, processed_rows)
+        else:
+            # чтение CSV
+            TaskManager.update(task_id, status="running", progress=5, message="Reading CSV file...")
+            df = pd.read_csv(file_path, dtype=CSV_DTYPES)
+
+            # запуск пайплайна
+            TaskManager.update(task_id, progress=20, message="Running processing pipeline...")
+            processed_df = processor.process_pipeline(df)
+            stats = processor.get_stats()
+
+            logger.info("Task %s: processed %d rows", task_id, len(processed_df))
+
+            # сохранение parquet
+            TaskManager.update(task_id, progress=60, message="Saving processed parquet...")
+            processed_df.to_parquet(output_path, index=False)
 
         logger.info("Task %s: parquet saved to %s", task_id, output_path)
 
         # импорт parquet в БД
         TaskManager.update(task_id, progress=80, message="Importing into database...")
-        imported_rows = import_from_parquet()
+        import_stats = {}
+        imported_rows = import_from_parquet(stats=import_stats)
 
         summary_msg = (
             f"Processing completed successfully "
@@ -66,11 +81,13 @@ def run_processing(task_id: str, file_path: str) -> None:
         )
 
         # завершение
+        # скорость стадий и память обработки и импорта видны в статусе задачи
         TaskManager.update(
             task_id,
             status="done",
             progress=100,
             message=summary_msg,
+            stats={"stream": stats.get("stream"), "import": import_stats},
         )
 
         logger.info("Task %s completed successfully — %s", task_id, summary_msg)
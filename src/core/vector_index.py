@@ -0,0 +1,606 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+import numpy as np
+
+from src.config import VECTOR_INDEX_DIR, VECTOR_INDEX_NPROBE
+from src.core.vector_repository import METADATA_SCHEMA_VERSION
+
+logger = logging.getLogger(__name__)
+
+# поля метаданных, по которым не фильтруют (уникальные на строку) — для них нет колонок кодов
+UNFILTERED_FIELDS = ("unique_id", "path", "updated_at", "schema_version")
+
+# строк за один проход матрицы при точном поиске и назначении кластеров
+SCAN_CHUNK = 65536
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+# номер ближайшего центроида для каждой строки; куски ограничивают матрицу
+# score (строки x nlist) примерно 64 МБ
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.int32)
+    chunk = max(1, (1 << 24) // len(centroids))
+    for start in range(0, len(vectors), chunk):
+        out[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return out
+
+
+# лучшие k по убыванию score
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+# Векторный индекс в процессе: нормированные векторы float32 в memory-mapped файле,
+# строки (unique_id, метаданные, кластер IVF) — в SQLite рядом. Поиск по косинусу —
+# точный (BLAS по всей матрице) или приближённый по кластерам IVF после build_ivf().
+# Интерфейс и формат ответа query совпадают с ChromaRepository (distance = 1 - cos).
+class VectorIndexRepository:
+    _instance: Optional["VectorIndexRepository"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str = VECTOR_INDEX_DIR, nprobe: int = VECTOR_INDEX_NPROBE):
+        self.path = path
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._open()
+
+    @classmethod
+    def instance(cls) -> "VectorIndexRepository":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    # загрузка состояния: матрица отображается в память, фильтры и кластеры
+    # восстанавливаются из таблицы строк
+    def _open(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(self.path, "rows.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "row INTEGER PRIMARY KEY, unique_id TEXT NOT NULL UNIQUE, "
+            "metadata TEXT NOT NULL, list INTEGER NOT NULL DEFAULT -1)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+        kv = dict(self.db.execute("SELECT key, value FROM kv"))
+        self.dim: Optional[int] = int(kv["dim"]) if "dim" in kv else None
+        self._metadata_version = int(kv["metadata_version"]) if "metadata_version" in kv else None
+
+        centroids_path = os.path.join(self.path, "ivf_centroids.npy")
+        self.centroids: Optional[np.ndarray] = (
+            np.load(centroids_path) if os.path.exists(centroids_path) else None
+        )
+
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._count = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._uids = np.empty(0, dtype=object)
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._codebooks: Dict[str, Dict[Any, int]] = {}
+
+        high = self.db.execute("SELECT MAX(row) FROM rows").fetchone()[0]
+        if self.dim is not None:
+            self._ensure_capacity(0 if high is None else high + 1)
+
+        # все строки одним запросом, массивы состояния — одним присваиванием
+        stored = self.db.execute("SELECT row, unique_id, metadata, list FROM rows").fetchall()
+        if stored:
+            rows, uids, metadatas, lists = zip(*stored)
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            self._alive[rows] = True
+            self._uids[rows] = np.array(uids, dtype=object)
+            self._lists[rows] = np.fromiter(lists, dtype=np.int32, count=len(lists))
+            self._set_columns(rows, [json.loads(m) for m in metadatas])
+
+        self._count = 0 if high is None else high + 1
+        self._free = [int(r) for r in np.flatnonzero(~self._alive[:self._count])]
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    # рост файла матрицы и массивов состояния (удвоением)
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= self._capacity and self._vectors is not None:
+            return
+
+        capacity = max(needed, self._capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+
+        path = self._vectors_path()
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+        grow = capacity - self._capacity
+        self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+        self._uids = np.concatenate([self._uids, np.empty(grow, dtype=object)])
+        self._lists = np.concatenate([self._lists, np.full(grow, -1, dtype=np.int32)])
+        for name, codes in self._columns.items():
+            self._columns[name] = np.concatenate([codes, np.full(grow, -1, dtype=np.int32)])
+        self._capacity = capacity
+
+    # коды значений фильтруемых полей по строкам (-1 — поля нет)
+    def _set_columns(self, rows: np.ndarray, metadatas: List[Dict[str, Any]]) -> None:
+        for name, codes in self._columns.items():
+            codes[rows] = -1
+
+        for row, meta in zip(rows, metadatas):
+            for name, value in (meta or {}).items():
+                if name in UNFILTERED_FIELDS:
+                    continue
+                column = self._columns.get(name)
+                if column is None:
+                    column = self._columns[name] = np.full(self._capacity, -1, dtype=np.int32)
+                    self._codebooks[name] = {}
+                book = self._codebooks[name]
+                code = book.get(value)
+                if code is None:
+                    code = book[value] = len(book)
+                column[row] = code
+
+    def _rows_for(self, ids: Sequence[str]) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            out.update(self.db.execute(
+                f"SELECT unique_id, row FROM rows WHERE unique_id IN ({','.join('?' * len(batch))})",
+                batch,
+            ))
+        return out
+
+    def _assign_lists(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return _nearest(vectors, self.centroids)
+
+    # базовые операции
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: Union[np.ndarray, List[Sequence[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        if not ids:
+            return
+
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in ids]
+
+        # повтор id в одном вызове — побеждает последний
+        last = {uid: i for i, uid in enumerate(ids)}
+        if len(last) != len(ids):
+            keep = sorted(last.values())
+            ids = [ids[i] for i in keep]
+            vectors = vectors[keep]
+            metadatas = [metadatas[i] for i in keep]
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.db.execute("INSERT OR REPLACE INTO kv VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} != index dimension {self.dim}")
+
+            existing = self._rows_for(ids)
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, uid in enumerate(ids):
+                row = existing.get(uid)
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row = self._count
+                        self._count += 1
+                rows[i] = row
+
+            self._ensure_capacity(self._count)
+            self._vectors[rows] = vectors
+            lists = self._assign_lists(vectors)
+
+            self.db.executemany(
+                "INSERT INTO rows (row, unique_id, metadata, list) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(row) DO UPDATE SET unique_id = excluded.unique_id, "
+                "metadata = excluded.metadata, list = excluded.list",
+                [
+                    (int(r), uid, json.dumps(m or {}), int(l))
+                    for r, uid, m, l in zip(rows, ids, metadatas, lists)
+                ],
+            )
+            self.db.commit()
+            self._vectors.flush()
+
+            self._alive[rows] = True
+            self._uids[rows] = ids
+            self._lists[rows] = lists
+            self._set_columns(rows, metadatas)
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+
+        with self._lock:
+            rows = np.fromiter(self._rows_for(ids).values(), dtype=np.int64)
+            if not len(rows):
+                return
+
+            self.db.executemany("DELETE FROM rows WHERE row = ?", [(int(r),) for r in rows])
+            self.db.commit()
+
+            self._alive[rows] = False
+            self._uids[rows] = None
+            self._lists[rows] = -1
+            for codes in self._columns.values():
+                codes[rows] = -1
+            self._free.extend(int(r) for r in rows)
+
+    # маска строк по where в синтаксисе Chroma: поле/$eq/$ne/$in/$nin, $and, $or
+    def _where_mask(self, where: Dict[str, Any], n: int) -> np.ndarray:
+        if "$and" in where:
+            mask = np.ones(n, dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._where_mask(clause, n)
+            return mask
+
+        if "$or" in where:
+            mask = np.zeros(n, dtype=bool)
+            for clause in where["$or"]:
+                mask |= self._where_mask(clause, n)
+            return mask
+
+        mask = np.ones(n, dtype=bool)
+        for name, condition in where.items():
+            if name in UNFILTERED_FIELDS:
+                raise ValueError(f"Field '{name}' is not filterable in the vector index")
+
+            op, value = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+            codes = self._columns.get(name)
+            book = self._codebooks.get(name, {})
+            if codes is None:
+                codes = np.full(n, -1, dtype=np.int32)
+            codes = codes[:n]
+
+            if op in ("$eq", "$ne"):
+                code = book.get(value)
+                hit = codes == code if code is not None else np.zeros(n, dtype=bool)
+                mask &= hit if op == "$eq" else ~hit
+            elif op in ("$in", "$nin"):
+                wanted = [book[v] for v in value if v in book]
+                hit = np.isin(codes, wanted)
+                mask &= hit if op == "$in" else ~hit
+            else:
+                raise ValueError(f"Unsupported where operator: {op}")
+        return mask
+
+    # кандидаты и их score: IVF — строки из nprobe ближайших кластеров,
+    # иначе все строки (матрица проходится кусками, чтобы не копировать её целиком)
+    def _scores(self, q: np.ndarray, mask: np.ndarray, k: int, nprobe: int):
+        n = len(mask)
+
+        if self.centroids is not None and nprobe > 0:
+            probes = _top_k(self.centroids @ q, min(nprobe, len(self.centroids)))
+            # индекс -1 (строка без кластера) попадает в последний элемент — False
+            lut = np.zeros(len(self.centroids) + 1, dtype=bool)
+            lut[probes] = True
+            rows = np.flatnonzero(mask & lut[self._lists[:n]])
+            return rows, self._vectors[rows] @ q
+
+        rows = np.flatnonzero(mask)
+        if len(rows) < n // 2:
+            return rows, self._vectors[rows] @ q
+
+        best_rows, best_scores = [], []
+        for start in range(0, n, SCAN_CHUNK):
+            end = min(start + SCAN_CHUNK, n)
+            scores = self._vectors[start:end] @ q
+            scores[~mask[start:end]] = -np.inf
+            top = _top_k(scores, k)
+            best_rows.append(top + start)
+            best_scores.append(scores[top])
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+        keep = np.isfinite(scores)
+        return rows[keep], scores[keep]
+
+    # точный перебор для нескольких запросов сразу: один GEMM на кусок матрицы
+    def _scores_exact_batch(self, queries: np.ndarray, mask: np.ndarray, k: int):
+        n = len(mask)
+        best_rows, best_scores = [], []
+        for start in range(0, n, SCAN_CHUNK):
+            end = min(start + SCAN_CHUNK, n)
+            scores = self._vectors[start:end] @ queries.T
+            scores[~mask[start:end]] = -np.inf
+            if k < end - start:
+                top = np.argpartition(-scores, k - 1, axis=0)[:k]
+                scores = np.take_along_axis(scores, top, axis=0)
+            else:
+                top = np.broadcast_to(np.arange(end - start)[:, None], scores.shape)
+            best_rows.append(top + start)
+            best_scores.append(scores)
+        rows = np.concatenate(best_rows).T
+        scores = np.concatenate(best_scores).T
+        out = []
+        for r, sc in zip(rows, scores):
+            keep = np.isfinite(sc)
+            out.append((r[keep], sc[keep]))
+        return out
+
+    def query(
+        self,
+        query_embedding: Sequence[float],
+        n_results: int = 20,
+        where: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        return self.query_batch([query_embedding], n_results, where, nprobe)
+
+    # несколько запросов за вызов (как query_embeddings в Chroma): списки ответов по запросам
+    def query_batch(
+        self,
+        query_embeddings: Union[np.ndarray, List[Sequence[float]]],
+        n_results: int = 20,
+        where: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        include_metadatas: bool = True,
+    ) -> Dict[str, Any]:
+        nprobe = self.nprobe if nprobe is None else nprobe
+
+        with self._lock:
+            n = self._count
+            if self.dim is None or n == 0 or not len(query_embeddings):
+                return {
+                    "ids": [[] for _ in query_embeddings],
+                    "distances": [[] for _ in query_embeddings],
+                    "metadatas": [[] for _ in query_embeddings],
+                    "embeddings": [],
+                }
+
+            queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), self.dim))
+
+            mask = self._alive[:n].copy()
+            if where:
+                mask &= self._where_mask(where, n)
+
+            if len(queries) > 1 and (self.centroids is None or nprobe <= 0) and mask.sum() >= n // 2:
+                candidates = self._scores_exact_batch(queries, mask, n_results)
+            else:
+                candidates = [self._scores(q, mask, n_results, nprobe) for q in queries]
+                # в nprobe кластерах подходящих строк меньше n_results, а в индексе
+                # их больше — точный перебор: короткий ответ всегда значит, что
+                # других кандидатов нет (на это опирается рост пула у вызывающих)
+                if self.centroids is not None and nprobe > 0:
+                    total = int(mask.sum())
+                    candidates = [
+                        self._scores(q, mask, n_results, 0)
+                        if len(rows) < n_results and len(rows) < total else (rows, scores)
+                        for q, (rows, scores) in zip(queries, candidates)
+                    ]
+
+            results = []
+            for rows, scores in candidates:
+                top = _top_k(scores, n_results)
+                results.append((rows[top], scores[top]))
+
+            ids = [self._uids[rows].tolist() for rows, _ in results]
+            metadatas = None
+            if include_metadatas:
+                found = dict(self._select_rows(np.unique(np.concatenate([rows for rows, _ in results]))))
+                metadatas = [[json.loads(found[int(r)]) for r in rows] for rows, _ in results]
+
+        return {
+            "ids": ids,
+            "distances": [(1.0 - scores).astype(float).tolist() for _, scores in results],
+            "metadatas": metadatas,
+            "embeddings": [],
+        }
+
+    # пары (row, JSON метаданных) для строк индекса
+    def _select_rows(self, rows: np.ndarray) -> list:
+        out = []
+        rows = [int(r) for r in rows]
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            out.extend(self.db.execute(
+                f"SELECT row, metadata FROM rows WHERE row IN ({','.join('?' * len(batch))})",
+                batch,
+            ))
+        return out
+
+    # массовые операции (тот же интерфейс, что у ChromaRepository)
+    def upsert_batch(
+        self,
+        ids: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        self.upsert(ids, embeddings, metadatas)
+
+    def delete_batch(self, ids: List[str]) -> None:
+        self.delete(ids)
+
+    # обновление только метаданных: ключи сливаются с существующими
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        if not ids:
+            return
+
+        with self._lock:
+            current = {
+                uid: (row, json.loads(metadata))
+                for uid, row, metadata in self._select_by_ids(ids)
+            }
+            rows, merged = [], []
+            for uid, meta in zip(ids, metadatas):
+                if uid not in current:
+                    continue
+                row, old = current[uid]
+                old.update(meta or {})
+                rows.append(row)
+                merged.append(old)
+
+            self.db.executemany(
+                "UPDATE rows SET metadata = ? WHERE row = ?",
+                [(json.dumps(m), r) for r, m in zip(rows, merged)],
+            )
+            self.db.commit()
+            self._set_columns(np.asarray(rows, dtype=np.int64), merged)
+
+    def _select_by_ids(self, ids: Sequence[str]) -> list:
+        out = []
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            out.extend(self.db.execute(
+                f"SELECT unique_id, row, metadata FROM rows WHERE unique_id IN ({','.join('?' * len(batch))})",
+                batch,
+            ))
+        return out
+
+    # утилиты для чтения ID и метаданных
+    def get_all_ids(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self.db.execute("SELECT unique_id FROM rows ORDER BY row")]
+
+    def get_metadatas(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        with self._lock:
+            return {uid: json.loads(metadata) for uid, _, metadata in self._select_by_ids(ids)}
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._alive[:self._count].sum())
+
+    def metadata_version(self) -> int:
+        if self._metadata_version is not None:
+            return self._metadata_version
+        return METADATA_SCHEMA_VERSION if self.count() == 0 else 1
+
+    def set_metadata_version(self, version: int = METADATA_SCHEMA_VERSION) -> None:
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO kv VALUES ('metadata_version', ?)", (str(version),))
+            self.db.commit()
+            self._metadata_version = version
+
+    # полное пересоздание индекса
+    def reset_collection(self) -> None:
+        with self._lock:
+            self.db.close()
+            self._vectors = None
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._open()
+            self.set_metadata_version()
+
+    # IVF: сферический k-means по выборке строк, затем каждая строка относится
+    # к ближайшему центроиду; новые строки назначаются при upsert
+    def build_ivf(
+        self,
+        nlist: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: Optional[int] = None,
+        seed: int = 0,
+    ) -> Dict[str, Any]:
+        t = time.time()
+        with self._lock:
+            n = self._count
+            alive = np.flatnonzero(self._alive[:n])
+            if not len(alive):
+                raise ValueError("Vector index is empty")
+
+            nlist = nlist or max(1, int(4 * np.sqrt(len(alive))))
+            nlist = min(nlist, len(alive))
+            rng = np.random.default_rng(seed)
+
+            sample_size = min(len(alive), sample_size or nlist * 64)
+            sample = np.asarray(self._vectors[np.sort(rng.choice(alive, sample_size, replace=False))])
+            centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+            for _ in range(iterations):
+                assign = _nearest(sample, centroids)
+                order = np.argsort(assign, kind="stable")
+                counts = np.bincount(assign, minlength=nlist)
+                starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+                sums = np.zeros_like(centroids)
+                present = counts > 0
+                sums[present] = np.add.reduceat(sample[order], starts[present], axis=0)
+
+                # пустой кластер получает случайную точку выборки
+                empty = np.flatnonzero(~present)
+                if len(empty):
+                    sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+                centroids = _normalize(sums)
+
+            self.centroids = centroids.astype(np.float32)
+            lists = np.full(n, -1, dtype=np.int32)
+            for start in range(0, n, SCAN_CHUNK):
+                end = min(start + SCAN_CHUNK, n)
+                lists[start:end] = _nearest(self._vectors[start:end], self.centroids)
+            lists[~self._alive[:n]] = -1
+
+            np.save(os.path.join(self.path, "ivf_centroids.npy"), self.centroids)
+            self.db.executemany(
+                "UPDATE rows SET list = ? WHERE row = ?",
+                [(int(lists[r]), int(r)) for r in alive],
+            )
+            self.db.commit()
+            self._lists[:n] = lists
+
+        stats = {"rows": int(len(alive)), "nlist": int(nlist), "seconds": round(time.time() - t, 3)}
+        logger.info(f"[vector_index] IVF built: {stats}")
+        return stats
+
+    def drop_ivf(self) -> None:
+        with self._lock:
+            self.centroids = None
+            path = os.path.join(self.path, "ivf_centroids.npy")
+            if os.path.exists(path):
+                os.remove(path)
+            self.db.execute("UPDATE rows SET list = -1")
+            self.db.commit()
+            self._lists[:] = -1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the in-process vector index")
+    parser.add_argument("--build-ivf", action="store_true", help="train IVF centroids and assign rows")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF clusters (default 4*sqrt(n))")
+    parser.add_argument("--drop-ivf", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    index = VectorIndexRepository()
+    if args.drop_ivf:
+        index.drop_ivf()
+    if args.build_ivf:
+        print(index.build_ivf(nlist=args.nlist))
+    print(f"{index.count()} vectors, dim={index.dim}, ivf={'on' if index.centroids is not None else 'off'}")
+
+
+if __name__ == "__main__":
+    main()
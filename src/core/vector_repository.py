@@ -0,0 +1,45 @@
+from typing import Any, Dict, Optional
+
+from src.config import VECTOR_BACKEND
+
+VECTOR_BACKENDS = ("chroma", "mmap")
+
+# версия схемы метаданных: 1 — флаги и поля из разбора unique_id,
+# 2 — все атрибуты фильтров из колонок components
+METADATA_SCHEMA_VERSION = 2
+
+# атрибуты компонента, которые пишутся в метаданные (схема 2)
+METADATA_ATTRIBUTES = ("material_id", "component_id", "path", "vendor", "material", "component_type", "standard")
+
+
+# метаданные вектора для строки components (ORM-объект или Row с нужными полями);
+# пустые значения — "", чтобы фильтр where работал одинаково для всех записей
+def component_metadata(row: Any, updated_at: Optional[str] = None) -> Dict[str, Any]:
+    meta: Dict[str, Any] = {
+        "schema_version": METADATA_SCHEMA_VERSION,
+        "unique_id": str(row.unique_id),
+        "abs_level": int(row.abs_level or 0),
+        "is_assembly": bool(row.is_assembly),
+        "is_subassembly": bool(row.is_subassembly),
+        "is_leaf": bool(row.is_leaf),
+    }
+    for name in METADATA_ATTRIBUTES:
+        value = getattr(row, name)
+        meta[name] = "" if value is None else str(value)
+    if updated_at is not None:
+        meta["updated_at"] = updated_at
+    return meta
+
+
+# репозиторий векторов по VECTOR_BACKEND: chroma (ChromaRepository) | mmap (VectorIndexRepository);
+# у обоих одинаковый интерфейс upsert/query/delete/метаданные
+def get_vector_repository():
+    if VECTOR_BACKEND not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+
+    if VECTOR_BACKEND == "mmap":
+        from src.core.vector_index import VectorIndexRepository
+        return VectorIndexRepository.instance()
+
+    from src.core.chroma_repository import ChromaRepository
+    return ChromaRepository.instance()
@@ -1,17 +1,34 @@
 import os
 import re
+import hashlib
+import logging
+import pickle
+import tempfile
+import threading
 import yaml
 import ahocorasick
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 from src.config import (
     COMPONENT_CLEAN,
     MATERIAL_CLEAN,
     VENDOR_CLEAN,
     STANDARD_CLEAN,
+    DICT_AUTOMATON_CACHE_ENABLED,
+    DICT_AUTOMATON_CACHE_PATH,
+    DICT_MATCH_MODE,
 )
 
+logger = logging.getLogger(__name__)
+
+# режимы сопоставления: all — все вхождения как есть, longest — только целые слова,
+# из пересекающихся остаётся самое длинное
+MATCH_MODES = ("all", "longest")
+
+# формат файла кэша автомата: увеличивать при изменении build_automaton
+AUTOMATON_FORMAT = "1"
+
 
 @dataclass
 class MatchResult:
@@ -28,39 +45,156 @@ def _load_yaml_list(path: str, key: str) -> List[str]:
     return [str(v).strip().upper() for v in data.get(key, [])]
 
 
+# хэш содержимого очищенных словарей (версия словарей для кэшей)
+def dictionary_version() -> str:
+    h = hashlib.sha1()
+    for path in (COMPONENT_CLEAN, MATERIAL_CLEAN, VENDOR_CLEAN, STANDARD_CLEAN):
+        h.update(path.encode("utf-8"))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def build_automaton() -> Tuple[ahocorasick.Automaton, Dict[str, List[str]]]:
+    lists = {
+        "component_type": _load_yaml_list(COMPONENT_CLEAN, "component_types"),
+        "material": _load_yaml_list(MATERIAL_CLEAN, "materials"),
+        "vendor": _load_yaml_list(VENDOR_CLEAN, "vendors"),
+        "standard": _load_yaml_list(STANDARD_CLEAN, "standards"),
+    }
+
+    automaton = ahocorasick.Automaton()
+    for label, tokens in lists.items():
+        for token in tokens:
+            automaton.add_word(token, (label, token))
+    automaton.make_automaton()
+
+    return automaton, lists
+
+
+# загрузка автомата из кэша, при несовпадении версии — сборка и сохранение
+def load_or_build_automaton(
+    path: str = DICT_AUTOMATON_CACHE_PATH, use_cache: bool = DICT_AUTOMATON_CACHE_ENABLED
+) -> Tuple[ahocorasick.Automaton, Dict[str, List[str]]]:
+    if not use_cache:
+        return build_automaton()
+
+    version = f"{AUTOMATON_FORMAT}:{dictionary_version()}"
+
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("version") == version:
+                return cached["automaton"], cached["lists"]
+            logger.info("[DictionaryMatcher] Automaton cache is stale, rebuilding")
+        except Exception as e:
+            logger.warning(f"[DictionaryMatcher] Failed to load automaton cache {path}: {e}")
+
+    automaton, lists = build_automaton()
+
+    # запись через временный файл, чтобы параллельные процессы не читали половину
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(
+                {"version": version, "automaton": automaton, "lists": lists},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"[DictionaryMatcher] Automaton cache saved: {path}")
+    except OSError as e:
+        logger.warning(f"[DictionaryMatcher] Failed to save automaton cache {path}: {e}")
+
+    return automaton, lists
+
+
+# общий на процесс экземпляр; пересобирается, если изменились файлы словарей
+_shared_matcher: Optional["DictionaryMatcher"] = None
+_shared_signature: Optional[tuple] = None
+_shared_lock = threading.Lock()
+
+
+def _files_signature() -> tuple:
+    signature = []
+    for path in (COMPONENT_CLEAN, MATERIAL_CLEAN, VENDOR_CLEAN, STANDARD_CLEAN):
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def get_shared_matcher() -> "DictionaryMatcher":
+    global _shared_matcher, _shared_signature
+    signature = _files_signature()
+    with _shared_lock:
+        if _shared_matcher is None or _shared_signature != signature:
+            _shared_matcher = DictionaryMatcher()
+            _shared_signature = signature
+        return _shared_matcher
+
+
 class DictionaryMatcher:
     """
     Dictionary-based matching for component_type, material, vendor, standard
     с использованием Aho–Corasick (один проход по строке).
     """
 
-    def __init__(self):
-        self.component_types = _load_yaml_list(COMPONENT_CLEAN, "component_types")
-        self.materials = _load_yaml_list(MATERIAL_CLEAN, "materials")
-        self.vendors = _load_yaml_list(VENDOR_CLEAN, "vendors")
-        self.standards = _load_yaml_list(STANDARD_CLEAN, "standards")
-
-        self.automaton = ahocorasick.Automaton()
+    def __init__(self, mode: str = DICT_MATCH_MODE):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown dictionary match mode: {mode}")
+        self.mode = mode
 
-        for token in self.component_types:
-            self.automaton.add_word(token, ("component_type", token))
+        self.automaton, lists = load_or_build_automaton()
 
-        for token in self.materials:
-            self.automaton.add_word(token, ("material", token))
-
-        for token in self.vendors:
-            self.automaton.add_word(token, ("vendor", token))
-
-        for token in self.standards:
-            self.automaton.add_word(token, ("standard", token))
-
-        self.automaton.make_automaton()
+        self.component_types = lists["component_type"]
+        self.materials = lists["material"]
+        self.vendors = lists["vendor"]
+        self.standards = lists["standard"]
 
     @staticmethod
     def _normalize_text(text: str) -> str:
         return re.sub(r"\s+", " ", str(text).strip()).upper()
 
-    def match_all(self, text: str) -> Dict[str, MatchResult]:
+    # вхождения слова целиком: на краях токена не должно быть продолжения слова
+    @staticmethod
+    def _is_bounded(text: str, start: int, end: int) -> bool:
+        if text[start].isalnum() and start > 0 and text[start - 1].isalnum():
+            return False
+        if text[end].isalnum() and end + 1 < len(text) and text[end + 1].isalnum():
+            return False
+        return True
+
+    # один проход автомата: (label, token) в порядке появления в строке
+    def _hits(self, norm: str, mode: str) -> List[Tuple[str, str]]:
+        if mode == "all":
+            return [hit for _, hit in self.automaton.iter(norm)]
+
+        # выбранные вхождения (start, end, hit); концы идут по неубыванию,
+        # поэтому пересечения возможны только с хвостом списка
+        selected: List[Tuple[int, int, Tuple[str, str]]] = []
+        for end, hit in self.automaton.iter(norm):
+            start = end - len(hit[1]) + 1
+            if not self._is_bounded(norm, start, end):
+                continue
+
+            j = len(selected)
+            while j > 0 and selected[j - 1][1] >= start:
+                j -= 1
+
+            length = end - start
+            if all(length > e - s for s, e, _ in selected[j:]):
+                del selected[j:]
+                selected.append((start, end, hit))
+
+        return [hit for _, _, hit in selected]
+
+    def match_all(self, text: str, mode: Optional[str] = None) -> Dict[str, MatchResult]:
         norm = self._normalize_text(text)
 
         results: Dict[str, MatchResult] = {
@@ -70,13 +204,15 @@ class DictionaryMatcher:
             "standard": MatchResult([], {}, []),
         }
 
-        for _, (label, token) in self.automaton.iter(norm):
+        for label, token in self._hits(norm, mode or self.mode):
             r = results[label]
-            val = token.upper()
-            if val not in r.values:
-                r.values.append(val)
-            r.confidences[val] = max(r.confidences.get(val, 0.0), 0.95)
-            if "dict" not in r.sources:
+            # confidences служит множеством уже найденных значений
+            if token not in r.confidences:
+                r.values.append(token)
+                r.confidences[token] = 0.95
+
+        for r in results.values():
+            if r.values:
                 r.sources.append("dict")
 
         return results
@@ -1,9 +1,20 @@
+import atexit
+import hashlib
 import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
-from .dictionary_matcher import DictionaryMatcher, MatchResult
-from .regex_matcher import RegexMatcher, RegexMatchResult
+import numpy as np
+import pandas as pd
+
+from src.config import PARSE_WORKERS, PARSE_PARALLEL_MIN_ROWS, PARSE_CACHE_ENABLED
+from .dictionary_matcher import MatchResult, dictionary_version, get_shared_matcher
+from .parse_cache import ParseCache
+from .regex_matcher import RegexMatcher, RegexMatchResult, MASTER_REGEX, STANDARD_REGEX
 
 logger = logging.getLogger(__name__)
 
@@ -27,12 +38,88 @@ class ParsedComponent:
     confidence_scores: Dict[str, float] = field(default_factory=dict)
 
 
+# колонки, которые парсинг возвращает в конвейер
+PARSED_COLUMNS = (
+    "clean_name",
+    "component_type",
+    "material",
+    "size",
+    "vendor",
+    "standard",
+    "is_assembly",
+    "is_subassembly",
+    "is_leaf",
+)
+
+
+# булевы колонки результата
+FLAG_COLUMNS = ("is_assembly", "is_subassembly", "is_leaf")
+
+# версия логики парсинга: увеличивать при изменении parse_single
+PARSER_VERSION = "1"
+
+# группы регулярных признаков, которые использует парсер
+REGEX_GROUPS = ("size", "strict_standard")
+
+
+# общий пул процессов парсинга (создаётся лениво, закрывается shutdown_pool или при выходе)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# экземпляр FeatureExtractor внутри воркера
+_worker_extractor: Optional["FeatureExtractor"] = None
+
+
+def _init_worker() -> None:
+    global _worker_extractor
+    _worker_extractor = FeatureExtractor()
+
+
+# парсинг одного шарда в воркере: наружу уходят колонки и счётчики, а не dataclass-ы
+def _parse_shard(descriptions: List[str]) -> Tuple[Dict[str, list], Dict[str, int]]:
+    extractor = _worker_extractor
+    for k in extractor.stats:
+        extractor.stats[k] = 0
+
+    return extractor.parse_columns(descriptions), dict(extractor.stats)
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            # прежний пул закрывается целиком, чтобы его воркеры не остались висеть
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            _pool_workers = workers
+        return _pool
+
+
+# остановка пула: из lifespan API и при выходе интерпретатора
+def shutdown_pool() -> None:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+            _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
+
+
 class FeatureExtractor:
     """Извлечение признаков из описаний с помощью Aho–Corasick словарей и master‑regex."""
 
     def __init__(self):
         logger.info("FeatureExtractor initialized")
-        self.dict_matcher = DictionaryMatcher()
+        self.dict_matcher = get_shared_matcher()
         self.regex_matcher = RegexMatcher()
         self.stats = {
             "total": 0,
@@ -48,26 +135,43 @@ class FeatureExtractor:
         return " ".join(str(text).strip().replace(",", ".").split())
 
     def parse_single(self, description: str) -> ParsedComponent:
-        self.stats["total"] += 1
-
         text = self._normalize_description(description)
         logger.debug(f"[parse_single] Start parsing: '{text}'")
 
-        info = ParsedComponent(clean_name=text)
+        info = ParsedComponent()
+        values = self._parse_values(text, info.confidence_scores)
+
+        for name, value in zip(PARSED_COLUMNS, values):
+            setattr(info, name, value)
+
+        # сохраняем исходный текст
+        info.additional_info["raw"] = text
+
+        logger.debug(f"[parse_single] Final parsed component: {info}")
+        return info
+
+    # разбор нормализованного описания в значения PARSED_COLUMNS;
+    # confidences заполняется, только если передан
+    def _parse_values(self, text: str, confidences: Optional[Dict[str, float]] = None) -> list:
+        self.stats["total"] += 1
+
+        clean_name = text
+        component_type = material = size_value = vendor = standard = ""
+        is_assembly = is_subassembly = is_leaf = False
 
         # Определение типа узла
         lower = text.lower()
 
         if any(w in lower for w in ["assembly", "сборка", "unit", "узел"]):
-            info.is_assembly = True
+            is_assembly = True
         elif any(w in lower for w in ["subassembly", "подсборка"]):
-            info.is_subassembly = True
+            is_subassembly = True
         else:
-            info.is_leaf = True
+            is_leaf = True
 
         try:
             dict_res: Dict[str, MatchResult] = self.dict_matcher.match_all(text)
-            regex_res: Dict[str, RegexMatchResult] = self.regex_matcher.match_all(text)
+            regex_res: Dict[str, RegexMatchResult] = self.regex_matcher.match_all(text, REGEX_GROUPS)
 
             logger.debug(f"[parse_single] Dictionary results: {dict_res}")
             logger.debug(f"[parse_single] Regex results: {regex_res}")
@@ -82,24 +186,27 @@ class FeatureExtractor:
 
             # component_type
             if comp.values:
-                info.component_type = " ".join(comp.values)
+                component_type = " ".join(comp.values)
                 self.stats["component_type"] += 1
-                for v, c in comp.confidences.items():
-                    info.confidence_scores[f"component_type:{v}"] = c
+                if confidences is not None:
+                    for v, c in comp.confidences.items():
+                        confidences[f"component_type:{v}"] = c
 
             # material
             if mat.values:
-                info.material = " ".join(mat.values)
+                material = " ".join(mat.values)
                 self.stats["material"] += 1
-                for v, c in mat.confidences.items():
-                    info.confidence_scores[f"material:{v}"] = c
+                if confidences is not None:
+                    for v, c in mat.confidences.items():
+                        confidences[f"material:{v}"] = c
 
             # vendor
             if ven.values:
-                info.vendor = " ".join(ven.values)
+                vendor = " ".join(ven.values)
                 self.stats["vendor"] += 1
-                for v, c in ven.confidences.items():
-                    info.confidence_scores[f"vendor:{v}"] = c
+                if confidences is not None:
+                    for v, c in ven.confidences.items():
+                        confidences[f"vendor:{v}"] = c
 
             # standards
             std_values = list(std.values)
@@ -113,31 +220,68 @@ class FeatureExtractor:
                     std_conf[v] = max(std_conf.get(v, 0.0), c)
 
             if std_values:
-                info.standard = " ".join(std_values)
+                standard = " ".join(std_values)
                 self.stats["standard"] += 1
-                for v, c in std_conf.items():
-                    info.confidence_scores[f"standard:{v}"] = c
+                if confidences is not None:
+                    for v, c in std_conf.items():
+                        confidences[f"standard:{v}"] = c
 
             # size
             if size.values:
-                info.size = " ".join(size.values)
+                size_value = " ".join(size.values)
                 self.stats["size"] += 1
-                for v, c in size.confidences.items():
-                    info.confidence_scores[f"size:{v}"] = c
-
-            # сохраняем исходный текст
-            info.additional_info["raw"] = text
+                if confidences is not None:
+                    for v, c in size.confidences.items():
+                        confidences[f"size:{v}"] = c
 
             # ограничение длины clean_name
-            if len(info.clean_name) > 120:
-                info.clean_name = info.clean_name[:120]
-
-            logger.debug(f"[parse_single] Final parsed component: {info}")
+            if len(clean_name) > 120:
+                clean_name = clean_name[:120]
 
         except Exception as e:
             logger.exception(f"[parse_single] Error parsing '{text}': {e}")
 
-        return info
+        return [
+            clean_name,
+            component_type,
+            material,
+            size_value,
+            vendor,
+            standard,
+            is_assembly,
+            is_subassembly,
+            is_leaf,
+        ]
+
+    # колоночный парсинг: значения пишутся сразу в заранее выделенные списки,
+    # уверенности (по желанию) хранятся разреженно тройками row/key/value
+    def parse_columns(
+        self, descriptions: List[str], with_confidence: bool = False
+    ) -> Dict[str, list]:
+        n = len(descriptions)
+        columns: Dict[str, list] = {c: [None] * n for c in PARSED_COLUMNS}
+        targets = [columns[c] for c in PARSED_COLUMNS]
+
+        conf_rows: List[int] = []
+        conf_keys: List[str] = []
+        conf_values: List[float] = []
+
+        for i, description in enumerate(descriptions):
+            conf: Optional[Dict[str, float]] = {} if with_confidence else None
+            values = self._parse_values(self._normalize_description(description), conf)
+
+            for target, value in zip(targets, values):
+                target[i] = value
+
+            if conf:
+                conf_rows.extend([i] * len(conf))
+                conf_keys.extend(conf.keys())
+                conf_values.extend(conf.values())
+
+        if with_confidence:
+            columns["confidence"] = {"row": conf_rows, "key": conf_keys, "value": conf_values}
+
+        return columns
 
     def parse_batch(self, descriptions: List[str]) -> List[ParsedComponent]:
         logger.info(f"[parse_batch] Start batch parsing: {len(descriptions)} items")
@@ -145,6 +289,98 @@ class FeatureExtractor:
         logger.info(f"[parse_batch] Finished batch parsing")
         return result
 
+    # параллельный парсинг по процессам; результат — словарь колонок PARSED_COLUMNS
+    def parse_batch_parallel(
+        self, descriptions: List[str], workers: Optional[int] = None
+    ) -> Dict[str, list]:
+        workers = workers if workers is not None else PARSE_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+
+        if workers == 1 or len(descriptions) < PARSE_PARALLEL_MIN_ROWS:
+            return self.parse_columns(descriptions)
+
+        logger.info(
+            f"[parse_batch_parallel] Start parsing: {len(descriptions)} items, {workers} workers"
+        )
+
+        # несколько шардов на воркер для равномерной загрузки
+        shard_size = max(1000, -(-len(descriptions) // (workers * 4)))
+        shards = [
+            descriptions[i:i + shard_size]
+            for i in range(0, len(descriptions), shard_size)
+        ]
+
+        columns: Dict[str, list] = {c: [] for c in PARSED_COLUMNS}
+        for shard_columns, shard_stats in _get_pool(workers).map(_parse_shard, shards):
+            for c in PARSED_COLUMNS:
+                columns[c].extend(shard_columns[c])
+            for k, v in shard_stats.items():
+                self.stats[k] = self.stats.get(k, 0) + v
+
+        logger.info(f"[parse_batch_parallel] Finished parsing ({len(shards)} shards)")
+        return columns
+
+    # парсинг с дедупликацией: каждое уникальное нормализованное описание разбирается
+    # один раз (или берётся из персистентного кэша), результат раздаётся по индексу
+    def parse_unique(
+        self, descriptions: List[str], use_cache: Optional[bool] = None
+    ) -> Dict[str, np.ndarray]:
+        use_cache = PARSE_CACHE_ENABLED if use_cache is None else use_cache
+
+        raw_codes, raw_uniques = pd.factorize(np.asarray(descriptions, dtype=object))
+        normalized = [self._normalize_description(d) for d in raw_uniques]
+        norm_codes, norm_uniques = pd.factorize(np.asarray(normalized, dtype=object))
+        codes = norm_codes[raw_codes]
+        texts = [str(t) for t in norm_uniques]
+
+        logger.info(
+            f"[parse_unique] {len(descriptions)} rows, {len(texts)} unique descriptions"
+        )
+
+        cache = ParseCache(self.cache_version(), PARSED_COLUMNS) if use_cache else None
+        cached = cache.get_many(texts) if cache else {}
+        missing = [t for t in texts if t not in cached]
+
+        stats_before = dict(self.stats)
+        parsed = self.parse_batch_parallel(missing)
+        self.stats = stats_before
+
+        if cache:
+            cache.put_many(missing, parsed)
+
+        position = {t: i for i, t in enumerate(missing)}
+        unique_columns: Dict[str, np.ndarray] = {}
+        for j, c in enumerate(PARSED_COLUMNS):
+            values = [
+                parsed[c][position[t]] if t in position else cached[t][j]
+                for t in texts
+            ]
+            dtype = bool if c in FLAG_COLUMNS else object
+            unique_columns[c] = np.asarray(values, dtype=dtype)
+
+        columns = {c: v[codes] for c, v in unique_columns.items()}
+
+        # счётчики по строкам, как при построчном парсинге
+        self.stats["total"] = self.stats.get("total", 0) + len(descriptions)
+        for key in ("component_type", "material", "vendor", "size", "standard"):
+            self.stats[key] = self.stats.get(key, 0) + int((columns[key] != "").sum())
+
+        logger.info(
+            f"[parse_unique] parsed {len(missing)}, from cache {len(texts) - len(missing)}"
+        )
+        return columns
+
+    # версия кэша: словари + регулярные выражения + логика парсера
+    def cache_version(self) -> str:
+        h = hashlib.sha1()
+        h.update(dictionary_version().encode("utf-8"))
+        h.update(self.dict_matcher.mode.encode("utf-8"))
+        h.update(MASTER_REGEX.pattern.encode("utf-8"))
+        h.update(STANDARD_REGEX.pattern.encode("utf-8"))
+        h.update(PARSER_VERSION.encode("utf-8"))
+        return h.hexdigest()
+
     def get_stats(self) -> Dict[str, Any]:
         logger.info(f"[get_stats] Stats: {self.stats}")
         return self.stats
@@ -1,31 +1,144 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from dataclasses import dataclass, field
+from functools import cached_property
 from typing import Dict, Optional
 import logging
 import time
 import hashlib
 
+from src.config import UNIQUE_ID_HASHER
+
 logger = logging.getLogger(__name__)
 
 
+# строковая колонка как arrow-массив: операции выполняются векторно в pyarrow.compute
+def _arrow_strings(values: pd.Series) -> pa.Array:
+    return pa.array(values.fillna("").astype(str).to_numpy(dtype=object), type=pa.string())
+
+
+# хэши путей для unique_id: sha1 совместим с прежними id,
+# fast64/fast128 — некриптографический SipHash из pandas (16/32 hex символа)
+def _sha1_hex(paths: np.ndarray) -> pa.Array:
+    return pa.array(
+        [hashlib.sha1(p.encode("utf-8")).hexdigest() for p in paths], type=pa.string()
+    )
+
+
+def _uint64_hex(values: np.ndarray) -> pa.Array:
+    raw = values.astype(">u8").tobytes().hex().encode("ascii")
+    return pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(16), len(values), [None, pa.py_buffer(raw)]
+    ).cast(pa.string())
+
+
+def _fast64_hex(paths: np.ndarray) -> pa.Array:
+    return _uint64_hex(pd.util.hash_array(paths, hash_key="bom-path-hash-64", categorize=False))
+
+
+def _fast128_hex(paths: np.ndarray) -> pa.Array:
+    high = _uint64_hex(pd.util.hash_array(paths, hash_key="bom-path-hash-hi", categorize=False))
+    low = _uint64_hex(pd.util.hash_array(paths, hash_key="bom-path-hash-lo", categorize=False))
+    return pc.binary_join_element_wise(high, low, "")
+
+
+# пробельные символы как у str.isspace (прежняя нормализация через str.strip):
+# \s в RE2 и utf8_trim_whitespace не покрывают NBSP и другие пробелы Unicode
+PATH_SPACE = r"\t-\r\x1c-\x20\x{85}\p{Z}"
+# пробелы вокруг точек и пустые сегменты; точки и пробелы по краям пути
+PATH_GAP_RE = rf"[{PATH_SPACE}]*(?:\.[{PATH_SPACE}]*)+"
+PATH_EDGES_RE = rf"^[.{PATH_SPACE}]+|[.{PATH_SPACE}]+$"
+
+PATH_HASHERS = {
+    "sha1": _sha1_hex,
+    "fast64": _fast64_hex,
+    "fast128": _fast128_hex,
+}
+
+
+# Глобальное состояние иерархии для потоковой обработки по чанкам
+@dataclass
+class HierarchyStreamState:
+    rows: int = 0
+    paths_fixed: int = 0
+
+    # parent_id -> число детей
+    children_map: Dict[str, int] = field(default_factory=dict)
+    # component_id -> число вхождений
+    usage: Dict[str, int] = field(default_factory=dict)
+    # component_id -> temp_id последнего вхождения
+    comp_to_temp: Dict[str, int] = field(default_factory=dict)
+
+    # накопление компактных данных по путям одного чанка
+    def update(self, df: pd.DataFrame) -> None:
+        for pid, cnt in df["parent_id"].value_counts().items():
+            self.children_map[pid] = self.children_map.get(pid, 0) + int(cnt)
+
+        components = df["component_id"].astype(str)
+        for cid, cnt in components.value_counts().items():
+            self.usage[cid] = self.usage.get(cid, 0) + int(cnt)
+
+        temp_ids = range(self.rows + 1, self.rows + len(df) + 1)
+        self.comp_to_temp.update(zip(df["component_id"], temp_ids))
+
+        self.rows += len(df)
+
+    # представления для второго прохода: строятся один раз после первого,
+    # а не на каждом чанке (состояние после первого прохода не меняется)
+    @cached_property
+    def children_counts(self) -> pd.Series:
+        return pd.Series(self.children_map, dtype=np.int64)
+
+    @cached_property
+    def usage_counts(self) -> pd.Series:
+        return pd.Series(self.usage, dtype=np.int64)
+
+    @cached_property
+    def max_usage(self) -> int:
+        return max(self.usage.values(), default=0)
+
+    @cached_property
+    def temp_lookup(self) -> pd.Series:
+        return _temp_lookup(pd.Series(self.comp_to_temp, dtype=np.int64))
+
+    @cached_property
+    def valid_ids(self) -> np.ndarray:
+        return np.fromiter(self.comp_to_temp.values(), dtype=np.int64, count=len(self.comp_to_temp))
+
+
+# component_id -> temp_id только со строковыми ключами: сегменты пути — строки
+def _temp_lookup(lookup: pd.Series) -> pd.Series:
+    if pd.api.types.infer_dtype(lookup.index, skipna=False) != "string":
+        lookup = lookup[[isinstance(k, str) for k in lookup.index]]
+    return lookup
+
+
 # Обработчик иерархии BOM
 class HierarchyProcessor:
 
-    def __init__(self):
-        logger.info("HierarchyProcessor initialized")
+    def __init__(self, hasher: str = UNIQUE_ID_HASHER):
+        if hasher not in PATH_HASHERS:
+            raise ValueError(f"Unknown unique_id hasher: {hasher}")
+
+        logger.info("HierarchyProcessor initialized (unique_id hasher: %s)", hasher)
+        self.hasher = hasher
         self.stats: Dict = {}
 
     # основной конвейер обработки
-    def process(self, df: pd.DataFrame) -> pd.DataFrame:
+    # шаги меняют только свои колонки; inplace=True избавляет и от входной копии
+    def process(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
         total_start = time.time()
         logger.info("Hierarchy: starting processing (%d rows)", len(df))
 
-        df_h = df.copy()
+        df_h = df if inplace else df.copy()
+        self.stats["timings"] = {}
 
         # исправление путей
         t = time.time()
         df_h = self._fix_paths(df_h)
-        logger.info("Hierarchy: _fix_paths completed in %.3f sec", time.time() - t)
+        self._log_step("_fix_paths", t)
 
         # вычисление уровня иерархии
         t = time.time()
@@ -36,37 +149,37 @@ class HierarchyProcessor:
             .str.strip()
             .str.count(r"\.")
         )
-        logger.info("Hierarchy: abs_level computed in %.3f sec", time.time() - t)
+        self._log_step("abs_level", t)
 
         # извлечение parent_id
         t = time.time()
         df_h["parent_id"] = self._extract_parent_ids(df_h["path"])
-        logger.info("Hierarchy: _extract_parent_ids completed in %.3f sec", time.time() - t)
+        self._log_step("_extract_parent_ids", t)
 
         # определение типа узлов
         t = time.time()
         df_h = self._determine_node_types(df_h)
-        logger.info("Hierarchy: _determine_node_types completed in %.3f sec", time.time() - t)
+        self._log_step("_determine_node_types", t)
 
         # генерация уникальных идентификаторов
         t = time.time()
-        df_h["unique_id"] = self._create_unique_ids(df_h)
-        logger.info("Hierarchy: _create_unique_ids completed in %.3f sec", time.time() - t)
+        df_h["unique_id"] = self._create_unique_ids(df_h, self.hasher)
+        self._log_step("_create_unique_ids", t)
 
         # статистика использования
         t = time.time()
         df_h = self._calculate_usage_stats(df_h)
-        logger.info("Hierarchy: _calculate_usage_stats completed in %.3f sec", time.time() - t)
+        self._log_step("_calculate_usage_stats", t)
 
         # построение числовой иерархии
         t = time.time()
         df_h = self._convert_to_numeric_hierarchy(df_h)
-        logger.info("Hierarchy: _convert_to_numeric_hierarchy completed in %.3f sec", time.time() - t)
+        self._log_step("_convert_to_numeric_hierarchy", t)
 
         # нормализация parent_id
         t = time.time()
         df_h = self._normalize_parent_ids(df_h)
-        logger.info("Hierarchy: _normalize_parent_ids completed in %.3f sec", time.time() - t)
+        self._log_step("_normalize_parent_ids", t)
 
         logger.info(
             "Hierarchy: processing completed in %.3f sec (%d rows)",
@@ -76,55 +189,87 @@ class HierarchyProcessor:
 
         return df_h
 
-    # исправление путей
-    def _fix_paths(self, df: pd.DataFrame) -> pd.DataFrame:
-        start = time.time()
-        logger.info("Hierarchy: fixing paths")
+    # логирование и учёт времени шага
+    def _log_step(self, name: str, start: float) -> None:
+        elapsed = time.time() - start
+        self.stats.setdefault("timings", {})[name] = round(elapsed, 3)
+        logger.info("Hierarchy: %s completed in %.3f sec", name, elapsed)
+
+    # потоковый режим: локальные шаги для одного чанка (на месте)
+    def process_chunk(self, df: pd.DataFrame, state: HierarchyStreamState) -> pd.DataFrame:
+        df_h = self._fix_paths(df)
+        state.paths_fixed += self.stats["paths_fixed"]
+
+        df_h["abs_level"] = (
+            df_h["path"]
+            .fillna("")
+            .astype(str)
+            .str.strip()
+            .str.count(r"\.")
+        )
+        df_h["parent_id"] = self._extract_parent_ids(df_h["path"])
+        df_h["unique_id"] = self._create_unique_ids(df_h, self.hasher)
 
-        df_fixed = df.copy()
+        state.update(df_h)
+        return df_h
 
-        paths = df_fixed["path"].fillna("").astype(str)
-        paths = paths.str.strip(" .")
+    # потоковый режим: глобальные шаги по накопленному состоянию (на месте)
+    def finalize_chunk(self, df: pd.DataFrame, state: HierarchyStreamState, start_id: int) -> pd.DataFrame:
+        df_h = self._determine_node_types(df, children_map=state.children_counts)
+        df_h = self._calculate_usage_stats(df_h, usage=state.usage_counts, max_usage=state.max_usage)
+        df_h = self._convert_to_numeric_hierarchy(df_h, lookup=state.temp_lookup, start_id=start_id)
+        df_h = self._normalize_parent_ids(df_h, valid_ids=state.valid_ids)
 
-        for _ in range(3):
-            paths = paths.str.replace(r"\.\.", ".", regex=True)
+        self.stats["paths_fixed"] = state.paths_fixed
+        return df_h
 
-        def normalize_path(p: str) -> str:
-            parts = [part.strip() for part in p.split(".") if part.strip()]
-            return ".".join(parts)
+    # исправление путей
+    def _fix_paths(self, df: pd.DataFrame) -> pd.DataFrame:
+        start = time.time()
+        logger.info("Hierarchy: fixing paths")
 
-        paths = paths.apply(normalize_path)
-        df_fixed["path"] = paths
+        # пробелы вокруг точек и пустые сегменты схлопываются в одну точку,
+        # по краям отбрасываются точки и пробелы
+        fixed = pc.replace_substring_regex(_arrow_strings(df["path"]), PATH_GAP_RE, ".")
+        fixed = pc.replace_substring_regex(fixed, PATH_EDGES_RE, "")
+        paths = pd.Series(fixed.to_numpy(zero_copy_only=False), index=df.index)
 
-        changes = (df["path"].astype(str) != df_fixed["path"]).sum()
+        changes = (df["path"].astype(str) != paths).sum()
         self.stats["paths_fixed"] = int(changes)
 
+        df["path"] = paths
+
         logger.info(
             "Hierarchy: path fixing completed (%d changed) in %.3f sec",
             changes,
             time.time() - start,
         )
-        return df_fixed
+        return df
 
     # извлечение parent_id
     @staticmethod
     def _extract_parent_ids(paths: pd.Series) -> pd.Series:
-        paths = paths.fillna("").astype(str)
-        has_parent = paths.str.contains(r"\.")
-        parent = pd.Series([None] * len(paths), index=paths.index, dtype="object")
+        parts = pc.split_pattern(_arrow_strings(paths), ".")
+        lengths = pc.list_value_length(parts).to_numpy()
+        offsets = parts.offsets.to_numpy()
+
+        parent = np.full(len(paths), None, dtype=object)
+        has_parent = lengths >= 2
 
-        split = paths[has_parent].str.rsplit(".", n=1).str[0]
-        parent_ids = split.str.split(".").str[-1]
+        # предпоследний сегмент пути
+        flat = pc.list_flatten(parts)
+        parent[has_parent] = flat.take(offsets[1:][has_parent] - 2).to_numpy(zero_copy_only=False)
 
-        parent.loc[has_parent] = parent_ids
-        return parent
+        return pd.Series(parent, index=paths.index, dtype="object")
 
     # определение типа узлов
-    def _determine_node_types(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _determine_node_types(
+        self, df: pd.DataFrame, children_map: Optional[pd.Series] = None
+    ) -> pd.DataFrame:
         start = time.time()
         logger.info("Hierarchy: determining node types")
 
-        df_t = df.copy()
+        df_t = df
 
         for col in ["is_assembly", "is_subassembly", "is_leaf"]:
             if col not in df_t.columns:
@@ -132,7 +277,8 @@ class HierarchyProcessor:
 
         df_t["is_assembly"] = df_t["abs_level"] == 0
 
-        children_map = df_t["parent_id"].value_counts().to_dict()
+        if children_map is None:
+            children_map = df_t["parent_id"].value_counts()
         df_t["has_children"] = df_t["component_id"].astype(str).map(children_map).fillna(0) > 0
 
         df_t["is_leaf"] = ~df_t["has_children"]
@@ -153,32 +299,48 @@ class HierarchyProcessor:
             default="UNKNOWN",
         )
 
+        self.stats["record_type_distribution"] = {
+            k: int(v) for k, v in df_t["record_type"].value_counts().items()
+        }
+
         logger.info(
             "Hierarchy: node types determined in %.3f sec", time.time() - start
         )
         return df_t
 
     # генерация уникальных идентификаторов
+    # хэшируются только уникальные пути, строки собираются поколоночно
     @staticmethod
-    def _create_unique_ids(df: pd.DataFrame) -> pd.Series:
-        def make_uid(row):
-            path_bytes = str(row["path"]).encode("utf-8")
-            path_hash = hashlib.sha1(path_bytes).hexdigest()
-            return f"{row['material_id']}_{row['component_id']}_{path_hash}"
-
-        return df.apply(make_uid, axis=1)
+    def _create_unique_ids(df: pd.DataFrame, hasher: str = "sha1") -> pd.Series:
+        codes, uniques = pd.factorize(df["path"].astype(str).to_numpy(dtype=object))
+        path_hash = PATH_HASHERS[hasher](np.asarray(uniques, dtype=object)).take(codes)
+
+        uid = pc.binary_join_element_wise(
+            pa.array(df["material_id"].astype(str).to_numpy(dtype=object), type=pa.string()),
+            pa.array(df["component_id"].astype(str).to_numpy(dtype=object), type=pa.string()),
+            path_hash,
+            "_",
+        )
+        return pd.Series(uid.to_numpy(zero_copy_only=False), index=df.index)
 
     # статистика использования
-    def _calculate_usage_stats(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _calculate_usage_stats(
+        self,
+        df: pd.DataFrame,
+        usage: Optional[pd.Series] = None,
+        max_usage: Optional[int] = None,
+    ) -> pd.DataFrame:
         start = time.time()
         logger.info("Hierarchy: calculating usage statistics")
 
-        df_u = df.copy()
+        df_u = df
 
-        usage = df_u["component_id"].astype(str).value_counts()
-        df_u["usage_count"] = df_u["component_id"].astype(str).map(usage)
+        if usage is None:
+            usage = df_u["component_id"].astype(str).value_counts()
+        if max_usage is None:
+            max_usage = usage.max() if len(usage) else 0
 
-        max_usage = df_u["usage_count"].max()
+        df_u["usage_count"] = df_u["component_id"].astype(str).map(usage)
         df_u["usage_norm"] = (
             df_u["usage_count"] / max_usage if max_usage > 0 else 0.0
         )
@@ -199,46 +361,86 @@ class HierarchyProcessor:
         return df_u
 
     # построение числовой иерархии
-    def _convert_to_numeric_hierarchy(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_n = df.copy()
+    def _convert_to_numeric_hierarchy(
+        self,
+        df: pd.DataFrame,
+        lookup: Optional[pd.Series] = None,
+        start_id: int = 1,
+    ) -> pd.DataFrame:
+        df_n = df
 
-        df_n = df_n.reset_index(drop=True)
-        df_n["temp_id"] = df_n.index + 1
+        df_n.reset_index(drop=True, inplace=True)
+        df_n["temp_id"] = df_n.index + start_id
 
-        comp_to_temp = dict(zip(df_n["component_id"], df_n["temp_id"]))
+        # lookup: component_id (строки) -> temp_id; без него — по самому фрейму
+        if lookup is None:
+            lookup = pd.Series(df_n["temp_id"].to_numpy(), index=df_n["component_id"].to_numpy())
+            lookup = _temp_lookup(lookup[~lookup.index.duplicated(keep="last")])
 
-        def convert_path(p):
-            if not p:
-                return None
-            parts = p.split(".")
-            converted = [str(comp_to_temp.get(part)) for part in parts if part in comp_to_temp]
-            return ".".join(converted) if converted else None
+        numeric_path, parent_id = self._numeric_paths(df_n["path"], lookup)
 
-        df_n["numeric_path"] = df_n["path"].apply(convert_path)
+        df_n["parent_id"] = parent_id
+        df_n["path"] = numeric_path
 
-        def extract_parent(npath):
-            if not npath or "." not in npath:
-                return None
-            return int(npath.rsplit(".", 1)[0].split(".")[-1])
+        return df_n
 
-        df_n["parent_id"] = df_n["numeric_path"].apply(extract_parent)
-        df_n["parent_id"] = df_n["parent_id"].apply(
-            lambda x: str(int(x)) if pd.notna(x) else None
-        )
+    # векторизованная замена сегментов пути на temp_id
+    # сегменты разворачиваются один раз и ищутся в индексе component_id,
+    # неизвестные сегменты отбрасываются; ключи lookup — строки (_temp_lookup)
+    @staticmethod
+    def _numeric_paths(paths: pd.Series, lookup: pd.Series):
+        n = len(paths)
 
-        df_n["path"] = df_n["numeric_path"]
-        df_n = df_n.drop(columns=["numeric_path"])
+        arr = _arrow_strings(paths)
+        parts = pc.split_pattern(arr, ".")
+        flat = pc.list_flatten(parts)
+        rows = pc.list_parent_indices(parts).to_numpy()
 
-        return df_n
+        keys = pa.array(lookup.index.to_numpy(dtype=object), type=pa.string())
+        pos_in_keys = pc.index_in(flat, value_set=keys).to_numpy(zero_copy_only=False)
 
-    # нормализация parent_id
-    def _normalize_parent_ids(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_n = df.copy()
+        # пустой путь не конвертируется
+        non_empty = pc.not_equal(arr, "").to_numpy(zero_copy_only=False)
+        known = ~np.isnan(pos_in_keys.astype(float)) & non_empty[rows]
+
+        rows = rows[known]
+        ids = lookup.to_numpy(dtype=np.int64)[pos_in_keys[known].astype(np.int64)]
 
-        valid_ids = set(df_n["temp_id"].astype(str))
+        counts = np.bincount(rows, minlength=n)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
 
-        df_n["parent_id"] = df_n["parent_id"].apply(
-            lambda pid: pid if pid in valid_ids else None
+        numeric_lists = pa.LargeListArray.from_arrays(pa.array(offsets), pa.array(ids).cast(pa.string()))
+        numeric_path = pc.binary_join(numeric_lists, ".").to_numpy(zero_copy_only=False).astype(object)
+        numeric_path[counts == 0] = None
+
+        parent_id = np.full(n, None, dtype=object)
+        has_parent = counts >= 2
+        parent_id[has_parent] = (
+            pa.array(ids[offsets[1:][has_parent] - 2]).cast(pa.string()).to_numpy(zero_copy_only=False)
+        )
+
+        return (
+            pd.Series(numeric_path, index=paths.index, dtype=object),
+            pd.Series(parent_id, index=paths.index, dtype=object),
         )
 
+    # нормализация parent_id
+    def _normalize_parent_ids(
+        self, df: pd.DataFrame, valid_ids: Optional[np.ndarray] = None
+    ) -> pd.DataFrame:
+        df_n = df
+
+        if valid_ids is None:
+            valid_ids = df_n["temp_id"].to_numpy()
+
+        # сравнение строк, как и раньше, но в pyarrow.compute
+        valid = pc.is_in(
+            _arrow_strings(df_n["parent_id"]),
+            value_set=pa.array(valid_ids, type=pa.int64()).cast(pa.string()),
+        ).to_numpy(zero_copy_only=False)
+        df_n["parent_id"] = df_n["parent_id"].where(valid, None)
+
         return df_n
+
+    def get_stats(self) -> Dict:
+        return self.stats
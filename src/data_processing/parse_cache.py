@@ -0,0 +1,69 @@
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, List, Tuple
+
+from src.config import PARSE_CACHE_PATH
+
+
+# Персистентный кэш результатов парсинга описаний
+class ParseCache:
+    """
+    SQLite-кэш: ключ — нормализованное описание и версия словарей/парсера,
+    значение — колонки PARSED_COLUMNS.
+    """
+
+    def __init__(self, version: str, columns: Tuple[str, ...], path: str = PARSE_CACHE_PATH):
+        self.version = version
+        self.columns = columns
+        self.path = path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        cols = ", ".join(columns)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS parsed_descriptions ("
+                f"version TEXT NOT NULL, description TEXT NOT NULL, {cols}, "
+                f"PRIMARY KEY (version, description))"
+            )
+
+    # with conn у sqlite3 только завершает транзакцию, поэтому соединение
+    # используется как closing(self._connect()) и закрывается после каждого вызова
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    # чтение батчами, чтобы не упереться в лимит параметров SQLite
+    def get_many(self, descriptions: List[str]) -> Dict[str, tuple]:
+        out: Dict[str, tuple] = {}
+        batch_size = 500
+        cols = ", ".join(self.columns)
+
+        with closing(self._connect()) as conn, conn:
+            for i in range(0, len(descriptions), batch_size):
+                batch = descriptions[i:i + batch_size]
+                marks = ", ".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT description, {cols} FROM parsed_descriptions "
+                    f"WHERE version = ? AND description IN ({marks})",
+                    [self.version, *batch],
+                )
+                for row in rows:
+                    out[row[0]] = row[1:]
+
+        return out
+
+    def put_many(self, descriptions: List[str], columns: Dict[str, list]) -> None:
+        if not descriptions:
+            return
+
+        cols = ", ".join(self.columns)
+        marks = ", ".join("?" * (len(self.columns) + 2))
+        rows = zip([self.version] * len(descriptions), descriptions, *(columns[c] for c in self.columns))
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO parsed_descriptions (version, description, {cols}) "
+                f"VALUES ({marks})",
+                rows,
+            )
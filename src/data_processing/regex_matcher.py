@@ -1,6 +1,6 @@
 import re
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional
 
 
 # Результат сопоставления по регулярным выражениям
@@ -42,151 +42,112 @@ MASTER_REGEX = re.compile(
 )
 
 
+# Строгие стандарты (проверяются по целому токену)
+STANDARD_PATTERNS = (
+    r"ASTM[A-Z0-9\-]*",
+    r"ASME[A-Z0-9\-]*",
+    r"API[A-Z0-9\-]*",
+    r"ISO[A-Z0-9\-]*",
+    r"DIN[A-Z0-9\-]*",
+    r"EN[A-Z0-9\-]*",
+    r"NPTF?",
+    r"UNC",
+    r"UNF",
+    r"UNRC",
+    r"RTJ",
+    r"RF\d*",
+    r"FF\d*",
+    r"SCH\d+",
+)
+
+# все стандарты одной альтернативой, токен = участок между пробелами
+STANDARD_REGEX = re.compile(
+    r"(?<!\S)(?:" + "|".join(STANDARD_PATTERNS) + r")(?!\S)",
+    re.IGNORECASE,
+)
+
+# группы признаков, которые умеет возвращать match_all
+FEATURE_GROUPS = ("size", "grade", "finish", "thread", "strict_standard")
+
+# именованная группа мастер-паттерна -> (группа признаков, уверенность)
+_MASTER_GROUPS = {
+    "size_triplet": ("size", 1.0),
+    "size_pair": ("size", 0.95),
+    "size_range": ("size", 0.9),
+    "size_suffix": ("size", 0.85),
+    "size_single": ("size", 0.8),
+    "grade": ("grade", 0.9),
+    "finish": ("finish", 0.8),
+    "thread": ("thread", 0.85),
+}
+
+_SOURCES = {
+    "size": "regex_size",
+    "grade": "regex",
+    "finish": "regex",
+    "thread": "regex",
+    "strict_standard": "regex_strict",
+}
+
+
 # Сопоставление признаков с помощью регулярных выражений
 class RegexMatcher:
 
     def __init__(self):
         self.master = MASTER_REGEX
-        self.standard_patterns = [
-            re.compile(p, re.IGNORECASE)
-            for p in [
-                r"^ASTM[A-Z0-9\-]*$",
-                r"^ASME[A-Z0-9\-]*$",
-                r"^API[A-Z0-9\-]*$",
-                r"^ISO[A-Z0-9\-]*$",
-                r"^DIN[A-Z0-9\-]*$",
-                r"^EN[A-Z0-9\-]*$",
-                r"^NPTF?$",
-                r"^UNC$",
-                r"^UNF$",
-                r"^UNRC$",
-                r"^RTJ$",
-                r"^RF\d*$",
-                r"^FF\d*$",
-                r"^SCH\d+$",
-            ]
-        ]
+        self.standard = STANDARD_REGEX
 
     # нормализация текста
     @staticmethod
     def _norm(text: str) -> str:
         return " ".join(str(text).upper().split())
 
-    # единый метод извлечения всех признаков
-    def match_all(self, text: str) -> Dict[str, RegexMatchResult]:
+    # единый метод извлечения признаков за один проход мастер-паттерна;
+    # groups ограничивает набор групп, ненужные результаты не строятся
+    def match_all(
+        self, text: str, groups: Optional[Iterable[str]] = None
+    ) -> Dict[str, RegexMatchResult]:
+        wanted = FEATURE_GROUPS if groups is None else tuple(groups)
         t = self._norm(text)
 
-        size_vals: List[str] = []
-        size_conf: Dict[str, float] = {}
-
-        grade_vals: List[str] = []
-        finish_vals: List[str] = []
-        thread_vals: List[str] = []
-
-        for m in self.master.finditer(t):
-            gd = m.groupdict()
-
-            if gd.get("size_triplet"):
-                v = gd["size_triplet"].upper()
-                size_vals.append(v)
-                size_conf[v] = max(size_conf.get(v, 0.0), 1.0)
-                continue
-
-            if gd.get("size_pair"):
-                v = gd["size_pair"].upper()
-                size_vals.append(v)
-                size_conf[v] = max(size_conf.get(v, 0.0), 0.95)
-                continue
-
-            if gd.get("size_range"):
-                v = gd["size_range"].upper()
-                size_vals.append(v)
-                size_conf[v] = max(size_conf.get(v, 0.0), 0.9)
-                continue
-
-            if gd.get("size_suffix"):
-                v = gd["size_suffix"].upper()
-                size_vals.append(v)
-                size_conf[v] = max(size_conf.get(v, 0.0), 0.85)
-                continue
-
-            if gd.get("size_single"):
-                v = gd["size_single"].upper()
-                size_vals.append(v)
-                size_conf[v] = max(size_conf.get(v, 0.0), 0.8)
-                continue
-
-            if gd.get("grade"):
-                grade_vals.append(gd["grade"].upper())
-                continue
-
-            if gd.get("finish"):
-                finish_vals.append(gd["finish"].upper())
-                continue
-
-            if gd.get("thread"):
-                thread_vals.append(gd["thread"].upper())
-                continue
-
-        size_vals = list(dict.fromkeys(size_vals))
-        grade_vals = list(dict.fromkeys(grade_vals))
-        finish_vals = list(dict.fromkeys(finish_vals))
-        thread_vals = list(dict.fromkeys(thread_vals))
-
-        size_res = RegexMatchResult(
-            size_vals,
-            {v: size_conf.get(v, 0.8) for v in size_vals},
-            ["regex_size"] if size_vals else [],
-        )
-        grade_res = RegexMatchResult(
-            grade_vals,
-            {v: 0.9 for v in grade_vals},
-            ["regex"] if grade_vals else [],
-        )
-        finish_res = RegexMatchResult(
-            finish_vals,
-            {v: 0.8 for v in finish_vals},
-            ["regex"] if finish_vals else [],
-        )
-        thread_res = RegexMatchResult(
-            thread_vals,
-            {v: 0.85 for v in thread_vals},
-            ["regex"] if thread_vals else [],
-        )
-
-        std_vals: List[str] = []
-        for token in t.split():
-            for p in self.standard_patterns:
-                if p.match(token):
-                    std_vals.append(token.upper())
-                    break
-        std_vals = list(dict.fromkeys(std_vals))
-        std_res = RegexMatchResult(
-            std_vals,
-            {v: 0.9 for v in std_vals},
-            ["regex_strict"] if std_vals else [],
-        )
+        # значения -> уверенность; dict сохраняет порядок первого появления
+        found: Dict[str, Dict[str, float]] = {g: {} for g in wanted}
+
+        if any(g != "strict_standard" for g in wanted):
+            for m in self.master.finditer(t):
+                group, conf = _MASTER_GROUPS[m.lastgroup]
+                values = found.get(group)
+                if values is not None:
+                    v = m.group(m.lastgroup)
+                    if values.get(v, 0.0) < conf:
+                        values[v] = conf
+
+        if "strict_standard" in found:
+            values = found["strict_standard"]
+            for m in self.standard.finditer(t):
+                values[m.group()] = 0.9
 
         return {
-            "size": size_res,
-            "grade": grade_res,
-            "finish": finish_res,
-            "thread": thread_res,
-            "strict_standard": std_res,
+            g: RegexMatchResult(
+                list(values),
+                values,
+                [_SOURCES[g]] if values else [],
+            )
+            for g, values in found.items()
         }
 
     # отдельные методы для удобства
     def match_size(self, text: str) -> RegexMatchResult:
-        return self.match_all(text)["size"]
+        return self.match_all(text, ("size",))["size"]
 
     def match_grade(self, text: str) -> RegexMatchResult:
-        return self.match_all(text)["grade"]
+        return self.match_all(text, ("grade",))["grade"]
 
     def match_finish(self, text: str) -> RegexMatchResult:
-        return self.match_all(text)["finish"]
+        return self.match_all(text, ("finish",))["finish"]
 
     def match_thread(self, text: str) -> RegexMatchResult:
-        return self.match_all(text)["thread"]
+        return self.match_all(text, ("thread",))["thread"]
 
     def match_strict_standard(self, text: str) -> RegexMatchResult:
-        return self.match_all(text)["strict_standard"]
+        return self.match_all(text, ("strict_standard",))["strict_standard"]
@@ -1,20 +1,162 @@
 # src/db/database.py
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import logging
 import os
+import threading
+from typing import Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+from src.config import (
+    DB_PATH,
+    SQLITE_PROFILE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_BUDGET_KB,
+    SQLITE_BUSY_TIMEOUT_MS,
+    DB_POOL_READERS,
+    DB_POOL_TIMEOUT,
+)
 
-from src.config import ROOT_DIR
+logger = logging.getLogger(__name__)
 
-DB_PATH = os.path.join(ROOT_DIR, "data", "bom.sqlite3")
 DB_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(
-    DB_URL,
-    echo=False,
-    future=True,
-    connect_args={"check_same_thread": False}
-)
+# профили pragma, применяются к каждому новому соединению
+SQLITE_PROFILES: Dict[str, Dict[str, str]] = {
+    # настройки SQLite по умолчанию (как было до профилей)
+    "default": {},
+    # WAL: читатели не блокируются писателем; NORMAL в WAL не теряет целостность
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": str(SQLITE_MMAP_SIZE),
+        # бюджет на весь пул; create_sqlite_engine делит его на число соединений
+        "cache_size": str(-SQLITE_CACHE_BUDGET_KB),
+        "temp_store": "MEMORY",
+        "busy_timeout": str(SQLITE_BUSY_TIMEOUT_MS),
+    },
+}
+
+
+# операторы, которые берут блокировку записи SQLite (PRAGMA и SELECT — нет)
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER", "BEGIN IMMEDIATE")
+
+# блокировка писателя на файл БД: общая для всех движков процесса на этот файл
+_writer_locks: Dict[str, threading.Lock] = {}
+_writer_locks_guard = threading.Lock()
+
+
+def _writer_lock(path: str) -> threading.Lock:
+    with _writer_locks_guard:
+        return _writer_locks.setdefault(os.path.realpath(path), threading.Lock())
+
+
+# Один писатель на процесс: первый пишущий оператор транзакции берёт блокировку
+# файла, commit / rollback / возврат соединения в пул её отпускают. Остальные
+# писатели ждут здесь по очереди, а не крутятся в busy_timeout на блокировке WAL.
+# Читатели блокировку не берут. Если ждать дольше busy_timeout (например, поток
+# держит запись в одном соединении и пишет через другое), запись идёт без очереди,
+# как раньше, и дальше её ограничивает busy_timeout SQLite. Запись только во временные
+# таблицы очередь не занимает: conn.execution_options(writer_lock=False)
+def _serialize_writes(db_engine: Engine, path: str) -> None:
+    lock = _writer_lock(path)
+    wait = SQLITE_BUSY_TIMEOUT_MS / 1000
+
+    @event.listens_for(db_engine, "before_cursor_execute")
+    def _acquire(conn, cursor, statement, parameters, context, executemany):
+        info = conn.connection.info
+        if info.get("writer_lock") or not conn.get_execution_options().get("writer_lock", True):
+            return
+        if not statement.lstrip().upper().startswith(WRITE_STATEMENTS):
+            return
+        if lock.acquire(timeout=wait):
+            info["writer_lock"] = True
+        else:
+            logger.warning("[db] writer lock not acquired in %.0fs, writing without it", wait)
+
+    def _release(info) -> None:
+        if info.pop("writer_lock", False):
+            lock.release()
+
+    # события commit / rollback приходят до вызова DBAPI: транзакция завершается
+    # здесь же, чтобы следующий писатель не застал её незафиксированной
+    # (повторный commit / rollback диалекта без транзакции ничего не делает)
+    @event.listens_for(db_engine, "commit")
+    def _commit(conn):
+        if conn.connection.info.get("writer_lock"):
+            try:
+                conn.connection.dbapi_connection.commit()
+            finally:
+                _release(conn.connection.info)
+
+    @event.listens_for(db_engine, "rollback")
+    def _rollback(conn):
+        if conn.connection.info.get("writer_lock"):
+            try:
+                conn.connection.dbapi_connection.rollback()
+            finally:
+                _release(conn.connection.info)
+
+    # соединение вернулось в пул с незавершённой записью
+    @event.listens_for(db_engine, "reset")
+    def _reset(dbapi_connection, connection_record, reset_state):
+        if connection_record.info.get("writer_lock"):
+            try:
+                dbapi_connection.rollback()
+            finally:
+                _release(connection_record.info)
+
+    @event.listens_for(db_engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        _release(connection_record.info)
+
+
+# движок SQLite с профилем pragma и пулом: DB_POOL_READERS читателей + один писатель;
+# записи в файл сериализуются блокировкой писателя (serialize_writes)
+def create_sqlite_engine(
+    path: str = DB_PATH,
+    profile: str = SQLITE_PROFILE,
+    readers: int = DB_POOL_READERS,
+    serialize_writes: bool = True,
+) -> Engine:
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    pool_size = readers + 1
+
+    # cache_size — память процесса на каждое соединение: в худшем случае
+    # занято pool_size * cache_size, поэтому соединение получает долю бюджета
+    # (mmap_size — общий page cache ОС, в бюджет не входит)
+    if "cache_size" in pragmas:
+        budget_kb = -int(pragmas["cache_size"])
+        pragmas["cache_size"] = str(-max(1, budget_kb // pool_size))
+
+    db_engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    if serialize_writes:
+        _serialize_writes(db_engine, path)
+
+    return db_engine
+
+
+engine = create_sqlite_engine()
 
 SessionLocal = sessionmaker(
     autocommit=False,
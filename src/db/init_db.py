@@ -1,40 +1,107 @@
+import logging
 import os
-from typing import Optional
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
 
 import pandas as pd
-from sqlalchemy import text
+import pyarrow.parquet as pq
+from sqlalchemy import text, insert
+from sqlalchemy.engine import Connection, Engine
 
-from src.config import ROOT_DIR
-from src.db.database import Base, engine, SessionLocal
+from src.config import ROOT_DIR, IMPORT_BULK, IMPORT_BATCH_SIZE, IMPORT_MODE
+from src.db.database import Base, engine, SessionLocal, DB_PATH
 from src.db.models import ComponentDB
+from src.utils.memory import RssTracker
+
+logger = logging.getLogger(__name__)
+
+# ослабленные pragma на время загрузки (восстанавливаются после)
+BULK_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",
+}
+
+IMPORT_MODES = ("replace", "incremental")
+
+# временные таблицы инкрементального импорта
+TEMP_TABLES = ("components_incoming", "components_removed", "components_ids")
+
+# колонки, вычисляемые по всему файлу: иерархия строится из позиционных temp_id
+# и сдвигается при вставке/удалении строк выше, usage_count — число вхождений
+# компонента; их смена не считается изменением строки
+DERIVED_COLUMNS = ("path", "parent_id", "usage_count")
+
+# временные temp_id иерархии -> id строк components: ключ во временной таблице
+TEMP_ID_COLUMN = "temp_id"
+
+# размер батча удаления векторов из Chroma
+CHROMA_DELETE_BATCH = 1000
 
 
 # Инициализация структуры базы данных
 def init_db() -> None:
-    os.makedirs(os.path.join(ROOT_DIR, "data"), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
     Base.metadata.create_all(bind=engine)
 
 
-# Импорт данных из parquet файла в SQLite через сервисный слой
-def import_from_parquet(parquet_path: Optional[str] = None) -> int:
+def _default_parquet_path() -> str:
+    return os.path.join(ROOT_DIR, "data", "processed", "processed_bom.parquet")
+
+
+# Импорт данных из parquet файла в SQLite через сервисный слой; stats, если
+# передан, дополняется статистикой загрузки (rows/sec, RSS этого импорта)
+def import_from_parquet(
+    parquet_path: Optional[str] = None,
+    bulk: Optional[bool] = None,
+    db_engine: Optional[Engine] = None,
+    mode: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+) -> int:
 
     if parquet_path is None:
-        parquet_path = os.path.join(
-            ROOT_DIR, "data", "processed", "processed_bom.parquet"
-        )
+        parquet_path = _default_parquet_path()
 
     if not os.path.exists(parquet_path):
         raise FileNotFoundError(f"Parquet file not found: {parquet_path}")
 
+    bulk = IMPORT_BULK if bulk is None else bulk
+    mode = mode or IMPORT_MODE
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+
+    if db_engine is None:
+        init_db()
+        db_engine = engine
+    else:
+        Base.metadata.create_all(bind=db_engine)
+    db_engine.dispose()
+
+    if mode == "incremental":
+        result = incremental_import_parquet(parquet_path, db_engine)
+    elif bulk:
+        result = bulk_import_parquet(parquet_path, db_engine)
+    else:
+        result = _orm_import_parquet(parquet_path, db_engine)
+
+    if stats is not None:
+        stats.update(result, mode=mode, bulk=bulk)
+    return result["rows"]
+
+
+# Загрузка через ORM: весь parquet в памяти, bulk_save_objects
+def _orm_import_parquet(parquet_path: str, db_engine: Engine) -> Dict[str, Any]:
+    t = time.time()
+    rss = RssTracker()
+
     df = pd.read_parquet(parquet_path)
 
     valid_columns = set(ComponentDB.__table__.columns.keys())
     df = df[[c for c in df.columns if c in valid_columns]]
 
-    init_db()
-    engine.dispose()
-
-    with SessionLocal() as session:
+    with SessionLocal(bind=db_engine) as session:
         session.execute(text("DELETE FROM components"))
         session.commit()
 
@@ -44,5 +111,317 @@ def import_from_parquet(parquet_path: Optional[str] = None) -> int:
         session.bulk_save_objects(objects)
         session.commit()
 
-        return len(objects)
+    return _load_stats({"rows": len(objects)}, t, rss)
+
+
+# pragma загрузки на время блока, затем прежние значения
+@contextmanager
+def _relaxed_pragmas(conn: Connection):
+    previous = {
+        name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in BULK_PRAGMAS
+    }
+    conn.commit()
+
+    # из WAL не переключаемся: это требует монопольного доступа и остановит
+    # читателей, а WAL с synchronous=OFF и так подходит для загрузки
+    if str(previous["journal_mode"]).lower() == "wal":
+        previous.pop("journal_mode")
+
+    try:
+        for name, value in BULK_PRAGMAS.items():
+            if name in previous:
+                conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+        conn.commit()
+        yield
+    finally:
+        for name, value in previous.items():
+            conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+        conn.commit()
+
+
+def _parquet_columns(parquet: pq.ParquetFile) -> List[str]:
+    table = ComponentDB.__table__
+    return [c for c in parquet.schema_arrow.names if c in table.columns]
+
+
+# executemany батчами parquet; порядок значений — как у параметров sql
+def _copy_batches(
+    conn: Connection,
+    parquet: pq.ParquetFile,
+    sql: str,
+    order: List[str],
+    batch_size: int,
+    rss: Optional[RssTracker] = None,
+) -> int:
+    rows = 0
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=order):
+        if batch.num_rows:
+            conn.exec_driver_sql(
+                sql,
+                list(zip(*(batch.column(c).to_pylist() for c in order))),
+            )
+            rows += batch.num_rows
+            if rss is not None:
+                rss.sample()
+    return rows
+
+
+# время, скорость и RSS одного импорта (от начала этого вызова, а не за жизнь процесса)
+def _load_stats(stats: Dict[str, Any], t: float, rss: RssTracker) -> Dict[str, Any]:
+    elapsed = time.time() - t
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+    stats.update(rss.stats())
+    return stats
+
+
+# Потоковая загрузка parquet -> components: батчи pyarrow, executemany
+# по SQL из Core insert() в одной транзакции; индексы пересоздаются после
+# загрузки, pragma ослаблены на время загрузки
+def bulk_import_parquet(
+    parquet_path: str,
+    db_engine: Engine = engine,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    table = ComponentDB.__table__
+    parquet = pq.ParquetFile(parquet_path)
+    columns = _parquet_columns(parquet)
+
+    # позиционный INSERT по нужным колонкам; строки передаются кортежами
+    stmt = insert(table).compile(dialect=db_engine.dialect, column_keys=columns)
+    sql = str(stmt)
+    order = list(stmt.positiontup)
+
+    t = time.time()
+    rss = RssTracker()
+
+    with db_engine.connect() as conn, _relaxed_pragmas(conn):
+        with conn.begin():
+            # DELETE открывает транзакцию sqlite3, поэтому DROP INDEX
+            # откатится вместе с загрузкой при ошибке
+            conn.execute(table.delete())
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+
+            rows = _copy_batches(conn, parquet, sql, order, batch_size, rss)
+
+            for index in table.indexes:
+                index.create(conn)
+
+    stats = _load_stats({"rows": rows}, t, rss)
+    logger.info(
+        f"[import] {rows} rows in {stats['seconds']}s ({stats['rows_per_sec']:,.0f} rows/sec, "
+        f"peak RSS {stats['rss_peak_mb']} MB, +{stats['rss_growth_mb']} MB)"
+    )
+    return stats
+
+
+# Инкрементальный импорт: parquet грузится во временную таблицу и сравнивается
+# с components по unique_id — новые строки вставляются, изменившиеся
+# обновляются, исчезнувшие удаляются вместе с векторами в Chroma
+def incremental_import_parquet(
+    parquet_path: str,
+    db_engine: Engine = engine,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    parquet = pq.ParquetFile(parquet_path)
+    # id строк назначает БД: иерархия ссылается на temp_id и перепривязывается ниже
+    columns = [c for c in _parquet_columns(parquet) if c != "id"]
+    has_temp_id = TEMP_ID_COLUMN in parquet.schema_arrow.names
+
+    if "unique_id" not in columns:
+        raise ValueError("Incremental import requires a unique_id column")
+
+    with db_engine.connect() as conn:
+        existing = conn.exec_driver_sql("SELECT 1 FROM components LIMIT 1").first()
+        conn.commit()
+
+    # пустая таблица — обычная bulk-загрузка быстрее
+    if existing is None:
+        stats = bulk_import_parquet(parquet_path, db_engine, batch_size)
+        stats.update(inserted=stats["rows"], updated=0, deleted=0, unchanged=0, refreshed=0)
+        return stats
+
+    compare = [c for c in columns if c not in ("id", "unique_id", *DERIVED_COLUMNS)]
+    derived = [c for c in columns if c in DERIVED_COLUMNS]
+    col_list = ", ".join(columns)
+    load_columns = columns + [TEMP_ID_COLUMN] if has_temp_id else columns
+    sql = (
+        f"INSERT INTO components_incoming ({', '.join(load_columns)}) "
+        f"VALUES ({', '.join('?' for _ in load_columns)})"
+    )
+
+    # updated_at (по нему rebuild_embeddings ищет устаревшие векторы) меняется
+    # только при изменении содержимого
+    changed = " OR ".join(f"c.{c} IS NOT i.{c}" for c in compare) or "0"
+    assignments = [f"{c} = i.{c}" for c in compare + derived] + ["updated_at = CURRENT_TIMESTAMP"]
+    if "clean_name" in compare:
+        # текст эмбеддинга изменился — вектор пересчитает rebuild_embeddings
+        assignments.append(
+            "embedding_vector = CASE WHEN c.clean_name IS NOT i.clean_name "
+            "THEN NULL ELSE c.embedding_vector END"
+        )
+    derived_changed = " OR ".join(f"c.{c} IS NOT i.{c}" for c in derived) or "0"
+    refresh = ", ".join(f"{c} = i.{c}" for c in derived)
+
+    t = time.time()
+    rss = RssTracker()
+
+    with db_engine.connect() as conn, _relaxed_pragmas(conn):
+        # временные таблицы не блокируют основную БД: очередь писателя
+        # (database._serialize_writes) нужна только для шага слияния
+        conn.execution_options(writer_lock=False)
+        for name in TEMP_TABLES:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS temp.{name}")
+        conn.exec_driver_sql(
+            f"CREATE TEMP TABLE components_incoming AS "
+            f"SELECT {col_list}, 0 AS {TEMP_ID_COLUMN} FROM components WHERE 0"
+        )
+        conn.commit()
+
+        try:
+            # загрузка во временную таблицу не блокирует основную БД
+            with conn.begin():
+                rows = _copy_batches(conn, parquet, sql, load_columns, batch_size, rss)
+                if not has_temp_id:
+                    # без temp_id иерархия ссылается на позицию строки в файле
+                    conn.exec_driver_sql(f"UPDATE components_incoming SET {TEMP_ID_COLUMN} = rowid")
+                conn.exec_driver_sql(
+                    "CREATE UNIQUE INDEX temp.ix_components_incoming_unique_id "
+                    "ON components_incoming (unique_id)"
+                )
+
+            conn.execution_options(writer_lock=True)
+            with conn.begin():
+                # блокировка записи сразу: переход чтение -> запись при
+                # параллельном писателе падает с SQLITE_BUSY без ожидания
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+                conn.exec_driver_sql(
+                    "CREATE TEMP TABLE components_removed AS "
+                    "SELECT c.id, c.unique_id FROM components AS c WHERE NOT EXISTS ("
+                    "SELECT 1 FROM components_incoming AS i WHERE i.unique_id = c.unique_id)"
+                )
+                removed = [
+                    r[0] for r in conn.exec_driver_sql("SELECT unique_id FROM components_removed")
+                ]
+                conn.exec_driver_sql(
+                    "DELETE FROM components WHERE id IN (SELECT id FROM components_removed)"
+                )
+
+                # parent_id и сегменты path — temp_id из файла; до сравнения
+                # они заменяются на id строк components
+                _remap_hierarchy(conn, derived)
+
+                updated = conn.exec_driver_sql(
+                    f"UPDATE components AS c SET {', '.join(assignments)} "
+                    f"FROM components_incoming AS i "
+                    f"WHERE c.unique_id = i.unique_id AND ({changed})"
+                ).rowcount
+
+                # сдвинутая иерархия и счётчики вхождений — без updated_at
+                refreshed = 0
+                if derived:
+                    refreshed = conn.exec_driver_sql(
+                        f"UPDATE components AS c SET {refresh} "
+                        f"FROM components_incoming AS i "
+                        f"WHERE c.unique_id = i.unique_id AND ({derived_changed})"
+                    ).rowcount
+
+                inserted = conn.exec_driver_sql(
+                    f"INSERT INTO components (id, {col_list}) "
+                    f"SELECT m.id, {', '.join(f'i.{c}' for c in columns)} "
+                    f"FROM components_incoming AS i JOIN components_ids AS m "
+                    f"ON m.temp_id = i.{TEMP_ID_COLUMN} WHERE NOT EXISTS ("
+                    f"SELECT 1 FROM components AS c WHERE c.unique_id = i.unique_id)"
+                ).rowcount
+        finally:
+            conn.execution_options(writer_lock=False)
+            for name in TEMP_TABLES:
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS temp.{name}")
+            conn.commit()
+
+    chroma_deleted = _delete_chroma_vectors(removed)
+
+    stats = _load_stats(
+        {
+            "rows": rows,
+            "inserted": inserted,
+            "updated": updated,
+            "deleted": len(removed),
+            "unchanged": rows - inserted - updated,
+            "refreshed": refreshed,
+            "chroma_deleted": chroma_deleted,
+        },
+        t,
+        rss,
+    )
+    logger.info(
+        f"[import] incremental: {rows} rows, inserted {inserted}, updated {updated}, "
+        f"deleted {len(removed)}, unchanged {stats['unchanged']} (refreshed {refreshed}) in {stats['seconds']}s"
+    )
+    return stats
+
+
+# temp_id -> id строк components: существующие строки по unique_id, новые —
+# следующие за максимальным id по порядку файла; parent_id и сегменты path во
+# временной таблице переписываются через эту карту
+def _remap_hierarchy(conn: Connection, derived: List[str]) -> None:
+    base = conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM components").scalar()
+    # типы колонок объявлены явно: у CREATE TABLE AS temp_id без affinity, и
+    # сравнение с CAST(... AS INTEGER) не использует индекс (полный перебор на строку)
+    conn.exec_driver_sql("CREATE TEMP TABLE components_ids (temp_id INTEGER, id INTEGER)")
+    conn.exec_driver_sql(
+        f"INSERT INTO components_ids (temp_id, id) "
+        f"SELECT i.{TEMP_ID_COLUMN}, COALESCE(c.id, {int(base)} + ROW_NUMBER() OVER ("
+        f"PARTITION BY c.id IS NULL ORDER BY i.{TEMP_ID_COLUMN})) "
+        f"FROM components_incoming AS i LEFT JOIN components AS c ON c.unique_id = i.unique_id"
+    )
+    conn.exec_driver_sql("CREATE UNIQUE INDEX temp.ix_components_ids_temp_id ON components_ids (temp_id)")
+
+    if "parent_id" in derived:
+        conn.exec_driver_sql(
+            "UPDATE components_incoming SET parent_id = ("
+            "SELECT CAST(m.id AS TEXT) FROM components_ids AS m "
+            "WHERE m.temp_id = CAST(components_incoming.parent_id AS INTEGER)) "
+            "WHERE parent_id IS NOT NULL"
+        )
+
+    if "path" not in derived:
+        return
+
+    pairs = conn.exec_driver_sql("SELECT temp_id, id FROM components_ids").all()
+    lookup = {str(temp_id): str(id_) for temp_id, id_ in pairs}
+
+    # сегменты вне карты (строка не попала в файл) отбрасываются, как в _numeric_paths
+    def remap(path):
+        if path is None:
+            return None
+        return ".".join([lookup[s] for s in path.split(".") if s in lookup]) or None
+
+    # функция живёт на соединении пула: снимается, чтобы не держать карту
+    dbapi = conn.connection.dbapi_connection
+    dbapi.create_function("remap_temp_ids", 1, remap, deterministic=True)
+    try:
+        conn.exec_driver_sql("UPDATE components_incoming SET path = remap_temp_ids(path)")
+    finally:
+        dbapi.create_function("remap_temp_ids", 1, None)
+
+
+# удаление векторов исчезнувших компонентов батчами; ошибка Chroma не откатывает импорт
+def _delete_chroma_vectors(unique_ids: List[str]) -> int:
+    if not unique_ids:
+        return 0
+
+    try:
+        from src.core.vector_repository import get_vector_repository
+
+        chroma = get_vector_repository()
+        for i in range(0, len(unique_ids), CHROMA_DELETE_BATCH):
+            chroma.delete_batch(unique_ids[i:i + CHROMA_DELETE_BATCH])
+    except Exception as e:
+        logger.warning(f"[import] Failed to delete {len(unique_ids)} vectors from Chroma: {e}")
+        return 0
 
+    return len(unique_ids)
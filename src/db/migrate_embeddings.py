@@ -0,0 +1,100 @@
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
+
+import numpy as np
+from sqlalchemy.engine import Engine
+
+from src.config import EMBEDDING_STORAGE_DTYPE
+from src.db.database import engine, DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+# Миграция embedding_vector: JSON-строки -> BLOB заданного dtype.
+# Можно также перекодировать BLOB из одного dtype в другой (from_dtype).
+def migrate_embeddings(
+    db_engine: Engine = engine,
+    dtype: str = EMBEDDING_STORAGE_DTYPE,
+    from_dtype: Optional[str] = None,
+    batch_size: int = 5000,
+    vacuum: bool = False,
+) -> Dict[str, Any]:
+    target = np.dtype(dtype)
+    source = np.dtype(from_dtype) if from_dtype else None
+
+    # JSON хранится как TEXT, BLOB другого dtype — только при явном from_dtype
+    condition = "typeof(embedding_vector) = 'text'"
+    if source is not None and source != target:
+        condition += " OR typeof(embedding_vector) = 'blob'"
+
+    migrated = 0
+    last_id = 0
+    t = time.time()
+
+    with db_engine.connect() as conn:
+        while True:
+            rows = conn.exec_driver_sql(
+                f"SELECT id, embedding_vector FROM components "
+                f"WHERE id > ? AND ({condition}) ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+
+            params = []
+            for row_id, value in rows:
+                if isinstance(value, str):
+                    vector = np.asarray(json.loads(value), dtype=target)
+                else:
+                    vector = np.frombuffer(value, dtype=source).astype(target)
+                params.append((vector.tobytes(), row_id))
+
+            conn.exec_driver_sql(
+                "UPDATE components SET embedding_vector = ? WHERE id = ?", params
+            )
+            conn.commit()
+
+            migrated += len(rows)
+            last_id = rows[-1][0]
+            logger.info(f"[migrate_embeddings] {migrated} vectors converted")
+
+        if vacuum:
+            conn.exec_driver_sql("VACUUM")
+            conn.commit()
+
+    stats = {"migrated": migrated, "dtype": target.name, "seconds": round(time.time() - t, 3)}
+    logger.info(f"[migrate_embeddings] Done: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored embeddings to binary BLOBs")
+    parser.add_argument("--dtype", default=EMBEDDING_STORAGE_DTYPE, choices=["float32", "float16"])
+    parser.add_argument("--from-dtype", choices=["float32", "float16"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    size_before = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+    stats = migrate_embeddings(
+        dtype=args.dtype,
+        from_dtype=args.from_dtype,
+        batch_size=args.batch_size,
+        vacuum=not args.no_vacuum,
+    )
+    size_after = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+
+    print(
+        f"Converted {stats['migrated']} embeddings to {stats['dtype']} in {stats['seconds']}s, "
+        f"DB size {size_before / 2**20:.1f} MB -> {size_after / 2**20:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
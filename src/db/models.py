@@ -8,9 +8,10 @@ from sqlalchemy import (
     DateTime,
     func,
 )
-from sqlalchemy.dialects.sqlite import JSON as SQLiteJSON
 
+from src.config import EMBEDDING_STORAGE_DTYPE
 from src.db.database import Base
+from src.db.types import VectorBlob
 
 
 class ComponentDB(Base):
@@ -50,8 +51,23 @@ class ComponentDB(Base):
     component_type = Column(String, index=True, nullable=True)
     standard = Column(String, index=True, nullable=True)
 
-    # Эмбеддинг
-    embedding_vector = Column(SQLiteJSON, nullable=True)
+    # Эмбеддинг (BLOB, см. VectorBlob)
+    embedding_vector = Column(VectorBlob(EMBEDDING_STORAGE_DTYPE), nullable=True)
 
     # Временная метка изменений
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class EmbeddingCacheDB(Base):
+    """
+    Кэш эмбеддингов: ключ — sha1(модель + нормализованный текст).
+    Одинаковые clean_name кодируются один раз.
+    """
+
+    __tablename__ = "embedding_cache"
+
+    key = Column(String(40), primary_key=True)
+    model_name = Column(String, nullable=False)
+    vector = Column(VectorBlob(EMBEDDING_STORAGE_DTYPE), nullable=False)
+
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,43 @@
+import json
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+VECTOR_DTYPES = ("float32", "float16")
+
+
+class VectorBlob(TypeDecorator):
+    """
+    Вектор эмбеддинга как BLOB фиксированного dtype.
+    Чтение — np.frombuffer без копирования (массив только для чтения),
+    старые JSON-строки декодируются как раньше до миграции.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype: str = "float32", *args, **kwargs):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        super().__init__(*args, **kwargs)
+        self.dtype = np.dtype(dtype)
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return np.asarray(value, dtype=self.dtype).tobytes()
+
+    def process_result_value(self, value: Any, dialect) -> Optional[np.ndarray]:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return np.asarray(json.loads(value), dtype=self.dtype)
+        return np.frombuffer(value, dtype=self.dtype)
+
+    # ORM сравнивает старое и новое значение при flush; == на массивах не годится
+    def compare_values(self, x: Any, y: Any) -> bool:
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(np.asarray(x, dtype=self.dtype), np.asarray(y, dtype=self.dtype))
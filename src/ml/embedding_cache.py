@@ -0,0 +1,56 @@
+import hashlib
+from typing import Dict, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from src.db.database import SessionLocal
+from src.db.models import EmbeddingCacheDB
+
+
+# нормализация текста перед кодированием и для ключа кэша
+def normalize_text(text: str) -> str:
+    return " ".join(str(text or "").split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+# Персистентный кэш эмбеддингов в таблице embedding_cache
+class EmbeddingCache:
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    # чтение батчами, чтобы не упереться в лимит параметров SQLite
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Sequence[float]]:
+        out: Dict[str, Sequence[float]] = {}
+        batch_size = 500
+
+        with SessionLocal() as session:
+            for i in range(0, len(keys), batch_size):
+                batch = list(keys[i:i + batch_size])
+                rows = session.execute(
+                    select(EmbeddingCacheDB.key, EmbeddingCacheDB.vector)
+                    .where(EmbeddingCacheDB.key.in_(batch))
+                ).all()
+                for key, vector in rows:
+                    out[key] = vector
+
+        return out
+
+    def put_many(self, keys: List[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not keys:
+            return
+
+        stmt = insert(EmbeddingCacheDB).on_conflict_do_nothing(index_elements=["key"])
+        with SessionLocal() as session:
+            session.execute(
+                stmt,
+                [
+                    {"key": k, "model_name": self.model_name, "vector": v}
+                    for k, v in zip(keys, vectors)
+                ],
+            )
+            session.commit()
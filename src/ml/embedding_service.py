@@ -1,29 +1,93 @@
 import os
+import queue
 import threading
 import time
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
+import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 from sqlalchemy import func
 
+from src.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_TOKEN_BUDGET,
+    EMBEDDING_MAX_BATCH,
+)
+from src.ml.embedding_cache import EmbeddingCache, cache_key, normalize_text
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+
+# загрузка модели под выбранный бэкенд; onnx — тот же SentenceTransformer
+# (токенизатор, pooling, нормализация), но трансформер исполняет onnxruntime
+def load_model(
+    model_name: str, cache_dir: str, backend: str = "torch", onnx_file: str = EMBEDDING_ONNX_FILE
+) -> SentenceTransformer:
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, cache_folder=cache_dir)
+
+    try:
+        return SentenceTransformer(
+            model_name,
+            cache_folder=cache_dir,
+            backend="onnx",
+            model_kwargs={"file_name": onnx_file, "provider": "CPUExecutionProvider"},
+        )
+    except TypeError as e:
+        raise RuntimeError(
+            "EMBEDDING_BACKEND=onnx requires sentence-transformers>=3.2 "
+            "(pip install 'sentence-transformers[onnx]')"
+        ) from e
+
+
+# идентификатор модели для кэша эмбеддингов: векторы разных бэкендов
+# (особенно квантованных) не смешиваются
+def model_id(model_name: str, backend: str = "torch", onnx_file: str = EMBEDDING_ONNX_FILE) -> str:
+    return model_name if backend == "torch" else f"{model_name}|onnx:{onnx_file}"
+
+
+# границы батчей по отсортированным длинам: батч растёт, пока
+# (число текстов x длина самого длинного) укладывается в бюджет токенов
+def length_batches(sorted_lengths: np.ndarray, token_budget: int, max_batch: int) -> List[Tuple[int, int]]:
+    batches: List[Tuple[int, int]] = []
+    n = len(sorted_lengths)
+    start = 0
+    while start < n:
+        end = start + 1
+        while (
+            end < n
+            and end - start < max_batch
+            and (end - start + 1) * sorted_lengths[end] <= token_budget
+        ):
+            end += 1
+        batches.append((start, end))
+        start = end
+    return batches
+
 
 # Сервис генерации эмбеддингов
 class EmbeddingService:
     _instance = None
     _lock = threading.Lock()
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: Optional[str] = None):
         os.environ["TOKENIZERS_PARALLELISM"] = "false"
         os.environ["TRANSFORMERS_CACHE"] = os.path.expanduser("~/.cache/huggingface")
 
         cache_dir = os.path.expanduser("~/.cache/sentence_transformers")
 
         self.model_name = model_name
-        self.model = SentenceTransformer(
-            model_name,
-            cache_folder=cache_dir
-        )
+        self.backend = backend or EMBEDDING_BACKEND
+        self.model_id = model_id(model_name, self.backend)
+        self.model = load_model(model_name, cache_dir, self.backend)
+        self.cache = EmbeddingCache(self.model_id)
 
     @classmethod
     def instance(cls) -> "EmbeddingService":
@@ -33,34 +97,121 @@ class EmbeddingService:
                     cls._instance = cls()
         return cls._instance
 
-    # кодирование одного текста
-    def encode(self, text: str) -> List[float]:
-        if not text:
-            text = ""
+    @property
+    def dim(self) -> int:
+        # sentence-transformers >= 5 переименовал метод
+        get_dim = getattr(self.model, "get_embedding_dimension", None)
+        if get_dim is None:
+            get_dim = self.model.get_sentence_embedding_dimension
+        return get_dim()
+
+    # кодирование одного текста в вектор float32
+    def encode_array(self, text: str) -> np.ndarray:
         with torch.inference_mode():
-            emb = self.model.encode(text, convert_to_numpy=True)
-        return emb.tolist()
+            emb = self.model.encode(text or "", convert_to_numpy=True)
+        return np.asarray(emb, dtype=np.float32)
+
+    def encode(self, text: str) -> List[float]:
+        return self.encode_array(text).tolist()
+
+    # длины текстов в токенах с учётом усечения до max_seq_length
+    def _token_lengths(self, texts: List[str]) -> np.ndarray:
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+
+        ids = tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+        )["input_ids"]
+        return np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(texts))
+
+    # кодирование батча в непрерывную матрицу float32 (n, dim): тексты сортируются
+    # по длине в токенах и режутся на батчи по бюджету токенов, чтобы не считать
+    # паддинг; строки результата возвращаются в исходном порядке
+    def encode_batch_array(
+        self,
+        texts: List[str],
+        token_budget: Optional[int] = None,
+        max_batch: Optional[int] = None,
+    ) -> np.ndarray:
+        token_budget = token_budget or EMBEDDING_TOKEN_BUDGET
+        max_batch = max_batch or EMBEDDING_MAX_BATCH
+
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return out
 
-    # кодирование батча текстов
-    def encode_batch(self, texts: List[str]) -> List[List[float]]:
         texts = [t or "" for t in texts]
+        lengths = self._token_lengths(texts)
+        order = np.argsort(lengths, kind="stable")
+
         with torch.inference_mode():
-            embs = self.model.encode(
-                texts,
-                batch_size=256,
-                show_progress_bar=False,
-                convert_to_numpy=True
-            )
-        return [e.tolist() for e in embs]
+            for start, end in length_batches(lengths[order], token_budget, max_batch):
+                idx = order[start:end]
+                out[idx] = self.model.encode(
+                    [texts[i] for i in idx],
+                    batch_size=end - start,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+        return out
 
-    # пересборка всех эмбеддингов в БД
-    def rebuild_embeddings(self, batch_size: int = 2000) -> dict:
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        return self.encode_batch_array(texts).tolist()
+
+    # кодирование с дедупликацией по нормализованному тексту и кэшем embedding_cache:
+    # каждый уникальный текст кодируется один раз, строки матрицы раздаются по индексу
+    def encode_cached_array(self, texts: List[str], stats: Optional[dict] = None) -> np.ndarray:
+        positions: dict = {}
+        codes = [positions.setdefault(normalize_text(t), len(positions)) for t in texts]
+        unique = list(positions)
+
+        matrix = np.empty((len(unique), self.dim), dtype=np.float32)
+        missing = list(range(len(unique)))
+
+        if EMBEDDING_CACHE_ENABLED and unique:
+            keys = [cache_key(self.model_id, t) for t in unique]
+            cached = self.cache.get_many(keys)
+            missing = []
+            for j, key in enumerate(keys):
+                vector = cached.get(key)
+                if vector is None:
+                    missing.append(j)
+                else:
+                    matrix[j] = vector
+
+        if missing:
+            encoded = self.encode_batch_array([unique[j] for j in missing])
+            matrix[missing] = encoded
+            if EMBEDDING_CACHE_ENABLED:
+                self.cache.put_many([keys[j] for j in missing], encoded)
+
+        if stats is not None:
+            stats["texts"] = stats.get("texts", 0) + len(texts)
+            stats["unique_texts"] = stats.get("unique_texts", 0) + len(unique)
+            stats["cache_hits"] = stats.get("cache_hits", 0) + len(unique) - len(missing)
+            stats["encoded"] = stats.get("encoded", 0) + len(missing)
+
+        if len(unique) == len(texts):
+            return matrix
+        return matrix[np.asarray(codes, dtype=np.intp)]
+
+    def encode_cached(self, texts: List[str], stats: Optional[dict] = None) -> List[List[float]]:
+        return self.encode_cached_array(texts, stats).tolist()
+
+    # пересборка всех эмбеддингов в БД: keyset-чтение по id -> кодирование ->
+    # запись в SQLite и Chroma; стадии работают параллельно через ограниченные очереди
+    def rebuild_embeddings(self, batch_size: int = 2000, queue_size: int = 2) -> dict:
+        from sqlalchemy import select, update, bindparam
         from src.db.database import SessionLocal
         from src.db.models import ComponentDB
-        from src.core.chroma_repository import ChromaRepository
+        from src.core.vector_repository import get_vector_repository, component_metadata
         from src.core.graph_service import GraphService
 
-        chroma = ChromaRepository.instance()
+        chroma = get_vector_repository()
 
         chroma_ids = chroma.get_all_ids()
         chroma_empty = len(chroma_ids) == 0
@@ -71,119 +222,184 @@ class EmbeddingService:
             for uid, meta in chroma_meta.items()
         }
 
-        session = SessionLocal()
-
-        total = session.query(func.count(ComponentDB.id)).scalar()
-        skipped = 0
-        recomputed = 0
-
-        offset = 0
+        with SessionLocal() as session:
+            total = session.query(func.count(ComponentDB.id)).scalar()
+
+        # только колонки для решения о пересчёте и для метаданных Chroma
+        columns = (
+            ComponentDB.id,
+            ComponentDB.unique_id,
+            ComponentDB.clean_name,
+            ComponentDB.abs_level,
+            ComponentDB.is_assembly,
+            ComponentDB.is_subassembly,
+            ComponentDB.is_leaf,
+            ComponentDB.material_id,
+            ComponentDB.component_id,
+            ComponentDB.path,
+            ComponentDB.vendor,
+            ComponentDB.material,
+            ComponentDB.component_type,
+            ComponentDB.standard,
+            ComponentDB.updated_at,
+            ComponentDB.embedding_vector.is_(None).label("missing"),
+        )
 
-        while True:
-            t0 = time.time()
-            batch_rows = (
-                session.query(ComponentDB)
-                .order_by(ComponentDB.id)
-                .offset(offset)
-                .limit(batch_size)
-                .all()
+        def is_stale(r) -> bool:
+            if chroma_empty or r.missing or r.unique_id not in chroma_updated:
+                return True
+            chroma_ts = chroma_updated.get(r.unique_id)
+            sqlite_ts = r.updated_at.isoformat() if r.updated_at else None
+            return bool(sqlite_ts and chroma_ts and sqlite_ts > chroma_ts)
+
+        done = object()
+        read_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        errors: list = []
+        counters = {"skipped": 0, "recomputed": 0}
+        cache_stats = {"texts": 0, "unique_texts": 0, "cache_hits": 0, "encoded": 0}
+
+        # стадия 1: чтение батчами по id > last_id
+        def reader() -> None:
+            try:
+                last_id = 0
+                with SessionLocal() as read_session:
+                    while not errors:
+                        t0 = time.time()
+                        rows = read_session.execute(
+                            select(*columns)
+                            .where(ComponentDB.id > last_id)
+                            .order_by(ComponentDB.id)
+                            .limit(batch_size)
+                        ).all()
+                        read_session.rollback()
+                        t_load = time.time() - t0
+
+                        print(f"[EMB] Loaded batch in {t_load:.3f}s ({len(rows)} rows)")
+
+                        if not rows:
+                            break
+                        last_id = rows[-1].id
+
+                        stale = [r for r in rows if is_stale(r)]
+                        counters["skipped"] += len(rows) - len(stale)
+                        if stale:
+                            read_queue.put(stale)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                read_queue.put(done)
+
+        # стадия 3: запись векторов в SQLite и Chroma
+        def writer() -> None:
+            stmt = (
+                update(ComponentDB.__table__)
+                .where(ComponentDB.__table__.c.id == bindparam("row_id"))
+                .values(
+                    embedding_vector=bindparam("vector"),
+                    updated_at=bindparam("ts"),
+                )
             )
-            t_load = time.time() - t0
-
-            print(f"[EMB] Loaded batch in {t_load:.3f}s ({len(batch_rows)} rows)")
-
-            if not batch_rows:
-                break
-
-            offset += batch_size
-
-            to_recompute = []
-            for r in batch_rows:
-                uid = r.unique_id
-
-                if chroma_empty:
-                    to_recompute.append(r)
-                    continue
-
-                if r.embedding_vector is None:
-                    to_recompute.append(r)
-                    continue
-
-                if uid not in chroma_updated:
-                    to_recompute.append(r)
+            while True:
+                item = write_queue.get()
+                if item is done:
+                    break
+                if errors:
                     continue
-
-                chroma_ts = chroma_updated.get(uid)
-                sqlite_ts = r.updated_at.isoformat() if r.updated_at else None
-
-                if sqlite_ts and chroma_ts and sqlite_ts > chroma_ts:
-                    to_recompute.append(r)
+                try:
+                    rows, embeddings = item
+                    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+                    t2 = time.time()
+                    with SessionLocal() as write_session:
+                        write_session.execute(
+                            stmt,
+                            [
+                                {"row_id": r.id, "vector": emb, "ts": now}
+                                for r, emb in zip(rows, embeddings)
+                            ],
+                        )
+                        write_session.commit()
+                    t_commit = time.time() - t2
+
+                    print(f"[EMB] SQLite commit took {t_commit:.3f}s")
+
+                    updated_at = now.isoformat()
+                    metadatas = [component_metadata(r, updated_at) for r in rows]
+
+                    t3 = time.time()
+                    chroma.upsert_batch(
+                        ids=[r.unique_id for r in rows],
+                        embeddings=embeddings,
+                        metadatas=metadatas
+                    )
+                    t_chroma = time.time() - t3
+
+                    print(f"[EMB] Chroma upsert_batch({len(rows)}) took {t_chroma:.3f}s")
+
+                    counters["recomputed"] += len(rows)
+                except Exception as e:
+                    errors.append(e)
+
+        reader_thread = threading.Thread(target=reader, name="emb-reader", daemon=True)
+        writer_thread = threading.Thread(target=writer, name="emb-writer", daemon=True)
+        reader_thread.start()
+        writer_thread.start()
+
+        # стадия 2: кодирование в вызывающем потоке
+        try:
+            while True:
+                rows = read_queue.get()
+                if rows is done:
+                    break
+                if errors:
                     continue
 
-                skipped += 1
-
-            if not to_recompute:
-                continue
-
-            texts = [(r.clean_name or "") for r in to_recompute]
-            unique_ids = [r.unique_id for r in to_recompute]
-
-            t1 = time.time()
-            embeddings = self.encode_batch(texts)
-            t_encode = time.time() - t1
-
-            print(f"[EMB] encode_batch({len(texts)}) took {t_encode:.3f}s")
-
-            now = func.now()
-
-            t2 = time.time()
-            for r, emb in zip(to_recompute, embeddings):
-                r.embedding_vector = emb
-                r.updated_at = now
-            session.commit()
-            t_commit = time.time() - t2
-
-            print(f"[EMB] SQLite commit took {t_commit:.3f}s")
-
-            metadatas = []
-            for r in to_recompute:
-                parts = r.unique_id.split(":", 2)
-                material_id = parts[0] if len(parts) > 0 else None
-                component_id = parts[1] if len(parts) > 1 else None
-                path = parts[2] if len(parts) > 2 else None
-
-                metadatas.append({
-                    "unique_id": r.unique_id,
-                    "material_id": material_id,
-                    "component_id": component_id,
-                    "path": path,
-                    "abs_level": r.abs_level,
-                    "is_assembly": r.is_assembly,
-                    "is_subassembly": r.is_subassembly,
-                    "is_leaf": r.is_leaf,
-                    "updated_at": r.updated_at.isoformat() if r.updated_at else None,
-                })
-
-            t3 = time.time()
-            chroma.upsert_batch(
-                ids=unique_ids,
-                embeddings=embeddings,
-                metadatas=metadatas
-            )
-            t_chroma = time.time() - t3
-
-            print(f"[EMB] Chroma upsert_batch({len(unique_ids)}) took {t_chroma:.3f}s")
-
-            recomputed += len(to_recompute)
-
-        session.close()
+                texts = [(r.clean_name or "") for r in rows]
+
+                t1 = time.time()
+                encoded_before = cache_stats["encoded"]
+                embeddings = self.encode_cached_array(texts, cache_stats)
+                t_encode = time.time() - t1
+
+                print(
+                    f"[EMB] encode_cached_array({len(texts)}) took {t_encode:.3f}s "
+                    f"({cache_stats['encoded'] - encoded_before} encoded)"
+                )
+
+                write_queue.put((rows, embeddings))
+        except Exception as e:
+            errors.append(e)
+            # освобождаем читателя, если он ждёт места в очереди
+            while reader_thread.is_alive():
+                try:
+                    read_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        finally:
+            write_queue.put(done)
+            reader_thread.join()
+            writer_thread.join()
+
+        if errors:
+            raise errors[0]
+
+        # коллекция собрана с нуля — все метаданные уже по текущей схеме
+        if chroma_empty:
+            chroma.set_metadata_version()
 
         GraphService._cache_graph = None
         GraphService._cache_hash = None
 
         return {
             "total": total,
-            "recomputed": recomputed,
-            "skipped": skipped,
-            "chroma_empty": chroma_empty
+            "recomputed": counters["recomputed"],
+            "skipped": counters["skipped"],
+            "chroma_empty": chroma_empty,
+            "embedding_cache": {
+                **cache_stats,
+                # доля строк, получивших вектор без вызова модели
+                "hit_rate": round(1 - cache_stats["encoded"] / cache_stats["texts"], 4)
+                if cache_stats["texts"] else 0.0,
+            },
         }
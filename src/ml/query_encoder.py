@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import QUERY_CACHE_SIZE, QUERY_BATCH_WAIT_MS, QUERY_BATCH_MAX
+from src.ml.embedding_cache import normalize_text
+from src.ml.embedding_service import EmbeddingService
+
+
+# Кодирование поисковых запросов: LRU-кэш векторов и микробатчинг —
+# одновременные запросы собираются за QUERY_BATCH_WAIT_MS и кодируются одним вызовом модели
+class QueryEncoder:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        embedder: Optional[EmbeddingService] = None,
+        cache_size: int = QUERY_CACHE_SIZE,
+        wait_ms: float = QUERY_BATCH_WAIT_MS,
+        max_batch: int = QUERY_BATCH_MAX,
+    ):
+        self.embedder = embedder or EmbeddingService.instance()
+        self.cache_size = cache_size
+        self.wait = wait_ms / 1000
+        self.max_batch = max(1, max_batch)
+
+        # uncased-модель (all-MiniLM-L6-v2) не различает регистр — запросы
+        # в разном регистре делят одну запись кэша
+        tokenizer = getattr(self.embedder.model, "tokenizer", None)
+        self.lowercase = bool(getattr(tokenizer, "do_lower_case", False))
+
+        # кэш, ожидающие запросы и очередь батчера под одной блокировкой
+        self._cond = threading.Condition()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._queue: List[Tuple[str, Future]] = []
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "coalesced": 0,
+            "batches": 0,
+            "batched_texts": 0,
+            "max_batch_size": 0,
+        }
+
+    @classmethod
+    def instance(cls) -> "QueryEncoder":
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _key(self, text: str) -> str:
+        key = normalize_text(text)
+        return key.lower() if self.lowercase else key
+
+    # вектор запроса: из кэша, из уже идущего кодирования того же текста
+    # или через очередь батчера
+    def encode(self, text: str) -> List[float]:
+        key = self._key(text)
+
+        with self._cond:
+            self.stats["requests"] += 1
+
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return vector.tolist()
+
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.append((key, future))
+                self._start()
+                self._cond.notify()
+            else:
+                self.stats["coalesced"] += 1
+
+        return future.result().tolist()
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+            self._thread.start()
+
+    # батчер: ждёт первый запрос, добирает остальные до конца окна или max_batch
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+
+                deadline = time.monotonic() + self.wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+
+            self._encode(batch)
+
+    def _encode(self, batch: List[Tuple[str, Future]]) -> None:
+        keys = [key for key, _ in batch]
+        try:
+            vectors = self.embedder.encode_batch_array(keys)
+        except Exception as e:
+            with self._cond:
+                for key, _ in batch:
+                    self._pending.pop(key, None)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        # собственная копия строки: view на матрицу батча держал бы её в памяти,
+        # пока жива любая запись кэша
+        vectors = [np.array(row, copy=True) for row in vectors]
+
+        with self._cond:
+            for key, vector in zip(keys, vectors):
+                self._pending.pop(key, None)
+                if self.cache_size > 0:
+                    self._cache[key] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+            self.stats["batches"] += 1
+            self.stats["batched_texts"] += len(batch)
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            stats = dict(self.stats)
+            stats["cache_entries"] = len(self._cache)
+
+        requests = stats["requests"]
+        stats["hit_rate"] = round(stats["cache_hits"] / requests, 4) if requests else 0.0
+        stats["avg_batch_size"] = (
+            round(stats["batched_texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        )
+        return stats
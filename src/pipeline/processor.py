@@ -1,14 +1,29 @@
+import os
+import glob
+import shutil
+import tempfile
+import time
+
 import pandas as pd
 import numpy as np
-from typing import Dict
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Set
 
-from src.data_processing.hierarchy import HierarchyProcessor
-from src.data_processing.feature_extractor import FeatureExtractor
+from src.data_processing.hierarchy import HierarchyProcessor, HierarchyStreamState
+from src.data_processing.feature_extractor import FeatureExtractor, PARSED_COLUMNS
+from src.utils.memory import RssTracker
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# типы колонок исходного CSV — одинаковые для пакетного и потокового режимов:
+# вывод типов по чанкам расходится, а числовые id теряли бы ведущие нули
+CSV_DTYPES = {"material_id": str, "component_id": str, "path": str, "description": str}
+
+NO_VALID_ROWS = "No valid rows in the input after cleaning"
+
 
 # Обработчик для крупных BOM датасетов
 class SimpleBOMProcessor:
@@ -40,8 +55,10 @@ class SimpleBOMProcessor:
         logger.info("Starting processing pipeline (%d rows)", len(df))
 
         df = self._validate_and_clean(df)
+        if df.empty:
+            raise ValueError(NO_VALID_ROWS)
         df = self._parse_descriptions(df)
-        df = self.hierarchy_processor.process(df)
+        df = self.hierarchy_processor.process(df, inplace=True)
         df = self._extract_features(df)
 
         logger.info("Skipping embedding generation (handled by API)")
@@ -49,11 +66,141 @@ class SimpleBOMProcessor:
         self.processed_data = df
         self.stats["final_rows"] = len(df)
 
-        # статистика иерархии
+        self._collect_hierarchy_stats()
+
+        logger.info(
+            "Processing pipeline completed (%d rows) — assemblies: %d, subassemblies: %d, leafs: %d",
+            len(df),
+            self.stats["counts"]["assemblies"],
+            self.stats["counts"]["subassemblies"],
+            self.stats["counts"]["leafs"],
+        )
+        return df
+
+    # потоковый конвейер: CSV читается чанками, глобальное состояние держит только иерархия
+    def process_stream(self, csv_path: str, output_path: str, chunk_size: int = 100_000) -> int:
+        logger.info("Starting streaming pipeline (%s, chunk_size=%d)", csv_path, chunk_size)
+
+        stages = {
+            name: {"rows": 0, "seconds": 0.0}
+            for name in ["clean", "parse", "features", "hierarchy_local", "hierarchy_global", "write"]
+        }
+
+        def timed(name: str, func, df: pd.DataFrame) -> pd.DataFrame:
+            t = time.time()
+            out = func(df)
+            stages[name]["rows"] += len(out)
+            stages[name]["seconds"] += time.time() - t
+            return out
+
+        state = HierarchyStreamState()
+        seen_keys: Set[int] = set()
+        rss = RssTracker()
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        spill_dir = tempfile.mkdtemp(prefix="bom_stream_", dir=os.path.dirname(output_path) or ".")
+
+        try:
+            # первый проход: построчные стадии и накопление состояния иерархии
+            reader = pd.read_csv(
+                csv_path,
+                chunksize=chunk_size,
+                dtype=CSV_DTYPES,
+            )
+
+            for i, chunk in enumerate(reader):
+                t = time.time()
+                chunk = self._drop_seen(chunk, seen_keys)
+                stages["clean"]["seconds"] += time.time() - t
+                # все строки чанка уже встречались раньше
+                if chunk.empty:
+                    continue
+
+                chunk = timed("clean", self._validate_and_clean, chunk)
+                if chunk.empty:
+                    continue
+                chunk = timed("parse", self._parse_descriptions, chunk)
+                chunk = timed("features", self._extract_features, chunk)
+                chunk = timed(
+                    "hierarchy_local",
+                    lambda d: self.hierarchy_processor.process_chunk(d, state),
+                    chunk,
+                )
+
+                chunk.to_parquet(os.path.join(spill_dir, f"part_{i:05d}.parquet"), index=False)
+                rss.sample()
+                logger.info("Streaming: chunk %d done (%d rows total)", i, state.rows)
+
+            # второй проход: глобальные стадии иерархии и запись итогового parquet
+            writer = None
+            schema = None
+            start_id = 1
+            type_counts: Dict[str, int] = {}
+
+            for part in sorted(glob.glob(os.path.join(spill_dir, "part_*.parquet"))):
+                chunk = pd.read_parquet(part)
+                chunk = timed(
+                    "hierarchy_global",
+                    lambda d: self.hierarchy_processor.finalize_chunk(d, state, start_id),
+                    chunk,
+                )
+                start_id += len(chunk)
+
+                for k, v in chunk["record_type"].value_counts().items():
+                    type_counts[k] = type_counts.get(k, 0) + int(v)
+
+                t = time.time()
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if schema is None:
+                    schema = pa.schema([
+                        f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                        for f in table.schema
+                    ]).remove_metadata()
+                    writer = pq.ParquetWriter(output_path, schema)
+                writer.write_table(table.select(schema.names).cast(schema))
+                stages["write"]["rows"] += len(chunk)
+                stages["write"]["seconds"] += time.time() - t
+                rss.sample()
+
+            if writer is not None:
+                writer.close()
+            else:
+                # пустой результат не пишется: иначе импорт заменит таблицу
+                # пустой или возьмёт parquet прошлой загрузки
+                raise ValueError(NO_VALID_ROWS)
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+        for name, s in stages.items():
+            s["rows_per_sec"] = round(s["rows"] / s["seconds"], 1) if s["seconds"] > 0 else None
+            logger.info(
+                "Streaming: stage %s — %d rows in %.3f sec (%s rows/sec)",
+                name, s["rows"], s["seconds"], s["rows_per_sec"],
+            )
+
+        self.hierarchy_processor.stats["record_type_distribution"] = type_counts
+
+        self.stats["final_rows"] = state.rows
+        self._collect_hierarchy_stats()
+        self.stats["stream"] = {
+            "chunk_size": chunk_size,
+            "stages": stages,
+            **rss.stats(),
+        }
+        logger.info(
+            "Streaming pipeline completed (%d rows, RSS %s -> %s MB, peak %s MB)",
+            state.rows,
+            self.stats["stream"]["rss_start_mb"],
+            self.stats["stream"]["rss_end_mb"],
+            self.stats["stream"]["rss_peak_mb"],
+        )
+        return state.rows
+
+    # статистика иерархии и распределение типов узлов
+    def _collect_hierarchy_stats(self) -> None:
         h_stats = self.hierarchy_processor.get_stats()
         self.stats["hierarchy"] = h_stats
 
-        # распределение типов узлов
         dist = h_stats.get("record_type_distribution", {}) or {}
 
         self.stats["counts"] = {
@@ -63,30 +210,43 @@ class SimpleBOMProcessor:
             "total_nodes": sum(dist.values()),
         }
 
-        logger.info(
-            "Processing pipeline completed (%d rows) — assemblies: %d, subassemblies: %d, leafs: %d",
-            len(df),
-            self.stats["counts"]["assemblies"],
-            self.stats["counts"]["subassemblies"],
-            self.stats["counts"]["leafs"],
-        )
-        return df
+    # удаление дубликатов, встреченных в предыдущих чанках; seen_keys пополняется
+    # ключами чанка — поиск и вставка O(1) на строку, без пересортировки всех ключей.
+    # Ключ — 64-битный хэш (material_id, component_id, path): при коллизии хэшей
+    # различные строки будут считаться дубликатом и отброшены; вероятность ~n²/2⁶⁵
+    # (порядка 1e-8 для 700k строк) принята, чтобы не хранить сами строки ключей
+    @staticmethod
+    def _drop_seen(df: pd.DataFrame, seen_keys: Set[int]) -> pd.DataFrame:
+        key_cols = ["material_id", "component_id", "path"]
+        if any(c not in df.columns for c in key_cols):
+            return df
+
+        keys = pd.util.hash_pandas_object(df[key_cols], index=False).tolist()
+        keep = np.fromiter((k not in seen_keys for k in keys), dtype=bool, count=len(keys))
+        seen_keys.update(keys)
+
+        return df[keep]
 
     # проверка и очистка входных данных
     def _validate_and_clean(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Validating and cleaning data")
 
-        df = df.copy()
-
         required = ["material_id", "component_id", "description", "qty", "path"]
         missing = [c for c in required if c not in df.columns]
         if missing:
             raise ValueError(f"Missing required columns: {missing}")
 
-        df = df.drop_duplicates(subset=["material_id", "component_id", "path"])
+        # дубликаты и пустые пути отбрасываются одной маской; явная копия отбора —
+        # единственная копия, дальше конвейер владеет фреймом и меняет его на месте
+        path = df["path"].astype(str).str.strip()
+        keep = ~df.duplicated(subset=["material_id", "component_id", "path"]) & (path != "")
+        df = df.loc[keep].copy()
+        df["path"] = path[keep]
 
-        df["path"] = df["path"].astype(str).str.strip()
-        df = df[df["path"] != ""]
+        # у пустого фрейма split(expand=True) не даёт колонок
+        if df.empty:
+            logger.info("Cleaning completed (0 rows)")
+            return df
 
         parts = df["path"].str.split(".", expand=True)
         df["material_id"] = df["material_id"].fillna(parts[0])
@@ -104,22 +264,11 @@ class SimpleBOMProcessor:
     def _parse_descriptions(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Parsing descriptions")
 
-        df = df.copy()
-
         descriptions = df["description"].astype(str).tolist()
-        components = self.feature_extractor.parse_batch(descriptions)
+        columns = self.feature_extractor.parse_unique(descriptions)
 
-        df["clean_name"] = [c.clean_name for c in components]
-        df["component_type"] = [c.component_type for c in components]
-        df["material"] = [c.material for c in components]
-        df["size"] = [c.size for c in components]
-        df["vendor"] = [c.vendor for c in components]
-        df["standard"] = [c.standard for c in components]
-
-        # новые флаги
-        df["is_assembly"] = [c.is_assembly for c in components]
-        df["is_subassembly"] = [c.is_subassembly for c in components]
-        df["is_leaf"] = [c.is_leaf for c in components]
+        for name in PARSED_COLUMNS:
+            df[name] = columns[name]
 
         logger.info("Description parsing completed")
         return df
@@ -128,8 +277,6 @@ class SimpleBOMProcessor:
     def _extract_features(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Extracting features")
 
-        df = df.copy()
-
         df["embedding_text"] = (
             df["clean_name"].fillna("") + ". " +
             "Type: " + df["component_type"].fillna("") + ". " +
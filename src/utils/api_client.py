@@ -47,8 +47,9 @@ def api_get_stats():
     return {}
 
 
-def api_import_parquet():
-    r = api_call("post", "/import/parquet")
+def api_import_parquet(mode: str = None):
+    params = {"mode": mode} if mode else None
+    r = api_call("post", "/import/parquet", params=params)
     if r and r.status_code == 200:
         return r.json()
     return {"imported_rows": 0}
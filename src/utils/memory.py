@@ -0,0 +1,43 @@
+# src/utils/memory.py
+
+import os
+from typing import Dict, Optional
+
+
+# текущий RSS процесса в МБ (/proc/self/statm); None, если /proc недоступен
+def current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+# RSS за один запуск: замеры в начале, в точках sample() и в конце.
+# ru_maxrss не подходит — это пик за всю жизнь процесса, и в воркере API он
+# показывает худший из прошлых запусков. Пик между замерами не виден, а
+# параллельные задачи того же процесса попадают в замер
+class RssTracker:
+
+    def __init__(self):
+        self.start = current_rss_mb()
+        self.peak = self.start
+
+    def sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        end = current_rss_mb()
+        self.sample()
+        if self.start is None or end is None:
+            return {"rss_start_mb": None, "rss_end_mb": None, "rss_peak_mb": None, "rss_growth_mb": None}
+        return {
+            "rss_start_mb": round(self.start, 1),
+            "rss_end_mb": round(end, 1),
+            "rss_peak_mb": round(self.peak, 1),
+            # прирост пика над RSS в начале запуска
+            "rss_growth_mb": round(self.peak - self.start, 1),
+        }
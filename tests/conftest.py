@@ -0,0 +1,13 @@
+import os
+import shutil
+import tempfile
+
+# кэши и БД по умолчанию лежат в DATA_DIR — тесты не пишут в data/ репозитория
+_DATA_DIR = None
+if "DATA_DIR" not in os.environ:
+    _DATA_DIR = os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bom_tests_")
+
+
+def pytest_unconfigure(config):
+    if _DATA_DIR:
+        shutil.rmtree(_DATA_DIR, ignore_errors=True)
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.core import backfill_chroma_metadata as backfill
+from src.core import chroma_repository
+from src.core.chroma_repository import ChromaRepository, METADATA_SCHEMA_FILE
+from src.core.vector_repository import METADATA_SCHEMA_VERSION
+from src.db.database import Base
+from src.db.models import ComponentDB
+
+
+@pytest.fixture
+def chroma(tmp_path, monkeypatch):
+    monkeypatch.setattr(chroma_repository, "CHROMA_PATH", str(tmp_path / "chroma"))
+    repo = ChromaRepository()
+    monkeypatch.setattr(backfill, "get_vector_repository", lambda: repo)
+    return repo
+
+
+@pytest.fixture
+def components(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bom.sqlite3'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(ComponentDB), [
+            {
+                "unique_id": f"u{i}",
+                "material_id": "MAT",
+                "component_id": f"C{i}",
+                "path": f"MAT.C{i}",
+                "abs_level": 1,
+                "is_leaf": True,
+                "vendor": "SKF" if i % 2 else None,
+                "component_type": "BEARING",
+            }
+            for i in range(25)
+        ])
+    monkeypatch.setattr(backfill, "SessionLocal", sessionmaker(bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def test_backfill_upgrades_schema_1_collection(chroma, components):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((25, 8)).astype(np.float32)
+    ids = [f"u{i}" for i in range(25)]
+    # схема 1: только флаги и updated_at, атрибутов фильтров нет
+    chroma.upsert_batch(ids, vectors, [{"unique_id": uid, "updated_at": "2026-01-01T00:00:00"} for uid in ids])
+    assert chroma.metadata_version() == 1
+
+    stats = backfill.backfill_chroma_metadata(batch_size=10)
+
+    assert stats["scanned"] == 25
+    assert stats["schema_version_before"] == 1
+    assert chroma.metadata_version() == METADATA_SCHEMA_VERSION
+    assert os.path.exists(os.path.join(chroma_repository.CHROMA_PATH, METADATA_SCHEMA_FILE))
+
+    metadatas = chroma.get_metadatas(ids)
+    assert all(m["schema_version"] == METADATA_SCHEMA_VERSION for m in metadatas.values())
+    # updated_at сохраняется — rebuild_embeddings не сочтёт векторы устаревшими
+    assert all(m["updated_at"] == "2026-01-01T00:00:00" for m in metadatas.values())
+    assert metadatas["u1"]["vendor"] == "SKF" and metadatas["u0"]["vendor"] == ""
+
+    # фильтр по поставщику работает на стороне индекса, векторы не изменились
+    result = chroma.query(vectors[1].tolist(), n_results=25, where={"vendor": "SKF"})
+    assert sorted(result["ids"][0]) == sorted(f"u{i}" for i in range(1, 25, 2))
+    assert result["ids"][0][0] == "u1"
+
+
+def test_empty_collection_is_current_schema(chroma):
+    assert chroma.metadata_version() == METADATA_SCHEMA_VERSION
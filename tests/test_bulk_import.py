@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from scripts.benchmarks.bench_import import write_processed_parquet
+from src.db.init_db import BULK_PRAGMAS, import_from_parquet
+
+
+def _engine(path):
+    return create_engine(f"sqlite:///{path}")
+
+
+def _table(engine) -> pd.DataFrame:
+    with engine.connect() as conn:
+        df = pd.read_sql("SELECT * FROM components ORDER BY unique_id", conn)
+    return df.drop(columns=["updated_at"])
+
+
+@pytest.fixture(scope="module")
+def parquet_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("import") / "processed_bom.parquet"
+    write_processed_parquet(2000, str(path))
+    return str(path)
+
+
+def test_bulk_import_matches_orm_import(tmp_path, parquet_path):
+    orm = _engine(tmp_path / "orm.sqlite3")
+    bulk = _engine(tmp_path / "bulk.sqlite3")
+
+    # повторный импорт заменяет строки, а не добавляет их
+    for _ in range(2):
+        orm_rows = import_from_parquet(parquet_path, bulk=False, db_engine=orm, mode="replace")
+        bulk_rows = import_from_parquet(parquet_path, bulk=True, db_engine=bulk, mode="replace")
+
+    assert orm_rows == bulk_rows == len(pd.read_parquet(parquet_path))
+    pd.testing.assert_frame_equal(_table(bulk), _table(orm))
+
+    # индексы пересозданы после загрузки
+    indexes = {i["name"] for i in inspect(bulk).get_indexes("components")}
+    assert indexes == {i["name"] for i in inspect(orm).get_indexes("components")}
+    orm.dispose()
+    bulk.dispose()
+
+
+# pragma загрузки действуют только на время импорта того же соединения
+def test_bulk_import_restores_pragmas(tmp_path, parquet_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.sqlite3'}", poolclass=StaticPool)
+    import_from_parquet(parquet_path, bulk=True, db_engine=engine, mode="replace")
+
+    with engine.connect() as conn:
+        after = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in BULK_PRAGMAS}
+    with _engine(tmp_path / "fresh.sqlite3").connect() as conn:
+        fresh = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in BULK_PRAGMAS}
+
+    assert after == fresh
+    engine.dispose()
+
+
+# статистика импорта доходит до вызывающего; RSS считается от начала этого вызова
+@pytest.mark.parametrize("bulk, mode", [(True, "replace"), (False, "replace"), (True, "incremental")])
+def test_import_reports_stats(tmp_path, parquet_path, bulk, mode):
+    engine = _engine(tmp_path / "bom.sqlite3")
+    stats = {}
+
+    rows = import_from_parquet(parquet_path, bulk=bulk, db_engine=engine, mode=mode, stats=stats)
+
+    assert stats["rows"] == rows == len(pd.read_parquet(parquet_path))
+    assert stats["mode"] == mode and stats["bulk"] is bulk
+    assert stats["rows_per_sec"] > 0
+    assert stats["rss_start_mb"] <= stats["rss_peak_mb"]
+    assert stats["rss_growth_mb"] == round(stats["rss_peak_mb"] - stats["rss_start_mb"], 1)
+    engine.dispose()
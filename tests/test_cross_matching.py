@@ -0,0 +1,223 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.core import cross_matching
+from src.core.cross_matching import (
+    CrossMatchingService,
+    MATCH_COLUMNS,
+    _CandidateTable,
+    _category_limits,
+)
+from src.core.vector_index import VectorIndexRepository
+from src.db.database import Base
+from src.db.models import ComponentDB
+
+DIM = 8
+
+
+# категоризация до перехода на маски numpy: обход отсортированных кандидатов в Python
+def _baseline_categorize(obj, ids, distances, rows, limits, same_level_only):
+    by_uid = {r["unique_id"]: r for r in rows}
+    items = [
+        {**r, "distance": distances[ids.index(r["unique_id"])]}
+        for r in by_uid.values()
+        if r["unique_id"] in ids and r["id"] != obj.id
+    ]
+    items.sort(key=lambda x: x["distance"])
+
+    same_assembly, other_assemblies = [], []
+    for item in items:
+        if same_level_only and item["abs_level"] != obj.abs_level:
+            continue
+        if item["component_id"] == obj.component_id and item["path"] == obj.path:
+            same_assembly.append(item)
+        elif item["component_id"] == obj.component_id:
+            other_assemblies.append(item)
+
+    seen, analogs = set(), []
+    for item in items:
+        if item["clean_name"] != obj.clean_name and item["component_id"] not in seen:
+            seen.add(item["component_id"])
+            analogs.append(item)
+
+    found = {"same_assembly": same_assembly, "other_assemblies": other_assemblies, "analogs": analogs}
+    return {c: [(i["unique_id"], i["distance"]) for i in found[c][:limits[c]]] for c in found}
+
+
+def _rows(rng, n):
+    return [
+        {
+            "id": i,
+            "unique_id": f"u{i}",
+            "component_id": f"C{rng.integers(4)}",
+            "clean_name": [None, "HEX BOLT", "NUT", "WASHER"][rng.integers(4)],
+            "abs_level": int(rng.integers(1, 4)),
+            "path": f"MAT.A{rng.integers(3)}",
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("same_level_only", [False, True])
+@pytest.mark.parametrize("top_k, categories", [(3, None), (10, None), (2, ["analogs"]), (5, ["other_assemblies"])])
+def test_categorize_matches_baseline_loop(seed, same_level_only, top_k, categories):
+    rng = np.random.default_rng(seed)
+    rows = _rows(rng, 60)
+    obj = SimpleNamespace(**rows[0])
+    # ответ индекса: неупорядоченный, с самим компонентом и uid, которых нет в таблице
+    ids = [r["unique_id"] for r in rows] + ["missing1", "missing2"]
+    rng.shuffle(ids)
+    distances = rng.permutation(len(ids)).astype(float) / 10
+    table = _CandidateTable([tuple(r[c] for c in MATCH_COLUMNS) for r in rows[::-1]])
+    limits = _category_limits(top_k, categories)
+
+    found = CrossMatchingService._categorize(obj, ids, list(distances), table, limits, same_level_only)
+
+    result = {c: [(row[1], dist) for row, dist in pairs] for c, pairs in found.items()}
+    assert result == _baseline_categorize(obj, ids, list(distances), rows, limits, same_level_only)
+    assert any(result.values())
+
+
+# None у исходного компонента совпадает с None кандидата, как в ==
+def test_categorize_treats_none_as_value():
+    rows = [
+        {"id": i, "unique_id": f"u{i}", "component_id": cid, "clean_name": name, "abs_level": 1, "path": "MAT"}
+        for i, (cid, name) in enumerate([("C0", None), ("C1", None), ("C2", "NUT"), ("C0", "BOLT")])
+    ]
+    obj = SimpleNamespace(**rows[0])
+    ids = [r["unique_id"] for r in rows]
+    table = _CandidateTable([tuple(r[c] for c in MATCH_COLUMNS) for r in rows])
+
+    found = CrossMatchingService._categorize(obj, ids, [0.0, 0.1, 0.2, 0.3], table, _category_limits(10, None), False)
+
+    assert [row[1] for row, _ in found["analogs"]] == ["u2", "u3"]
+    assert [row[1] for row, _ in found["same_assembly"]] == ["u3"]
+
+
+def test_unknown_category_is_rejected():
+    with pytest.raises(ValueError, match="Unknown categories"):
+        _category_limits(10, ["analogs", "siblings"])
+
+
+# Компоненты для пула: ближе всего к C0/u0 «шум» — другие component_id с тем же
+# наименованием (не дубликаты и не аналоги), дальше дубликаты C0 и аналоги
+def _pool_components(rng):
+    axis = np.eye(DIM, dtype=np.float32)
+    rows = [("C0", "HEX BOLT", "MAT.A", axis[0])]
+    rows += [(f"N{i}", "HEX BOLT", "MAT.B", axis[0] + 0.05 * rng.standard_normal(DIM)) for i in range(60)]
+    rows += [("C0", "HEX BOLT", "MAT.A", axis[0] + axis[1] + 0.1 * rng.standard_normal(DIM)) for _ in range(3)]
+    rows += [("C0", "HEX BOLT", f"MAT.D{i}", axis[0] + axis[1] + 0.1 * rng.standard_normal(DIM)) for i in range(4)]
+    rows += [(f"A{i}", "NUT", "MAT.E", axis[0] + axis[2] + 0.1 * rng.standard_normal(DIM)) for i in range(15)]
+    # второй исходный компонент: дубликат и аналоги рядом, хватает первого пула
+    rows += [("Z0", "WASHER", "MAT.F", axis[5])]
+    rows += [("Z0", "WASHER", "MAT.G", axis[5] + 0.01 * axis[6])]
+    rows += [(f"W{i}", "PIN", "MAT.F", axis[5] + 0.02 * (i + 1) * axis[7]) for i in range(12)]
+    return [
+        {
+            "id": i + 1,
+            "unique_id": f"u{i}",
+            "material_id": "MAT",
+            "component_id": cid,
+            "clean_name": name,
+            "abs_level": 1,
+            "path": path,
+            "embedding_vector": np.asarray(vector, dtype=np.float32),
+        }
+        for i, (cid, name, path, vector) in enumerate(rows)
+    ]
+
+
+@pytest.fixture
+def pool_service(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bom.sqlite3'}")
+    Base.metadata.create_all(bind=engine)
+    rows = _pool_components(np.random.default_rng(0))
+    with engine.begin() as conn:
+        conn.execute(insert(ComponentDB), rows)
+    monkeypatch.setattr(cross_matching, "SessionLocal", sessionmaker(bind=engine))
+
+    index = VectorIndexRepository(str(tmp_path / "index"))
+    index.upsert_batch(
+        [r["unique_id"] for r in rows],
+        np.stack([r["embedding_vector"] for r in rows]),
+        [{} for _ in rows],
+    )
+    # запросы к индексу запоминаются: (число векторов, n_results)
+    queries = []
+    query_batch = index.query_batch
+
+    def record(query_embeddings, n_results, **kwargs):
+        queries.append((len(query_embeddings), n_results))
+        return query_batch(query_embeddings, n_results=n_results, **kwargs)
+
+    monkeypatch.setattr(index, "query_batch", record)
+
+    service = CrossMatchingService.__new__(CrossMatchingService)
+    service.chroma = index
+    service.queries = queries
+    yield service
+    index.db.close()
+    engine.dispose()
+
+
+def _pool_limits(monkeypatch, min_candidates, factor=2, max_candidates=1000):
+    monkeypatch.setattr(cross_matching, "CROSS_MATCHING_MIN_CANDIDATES", min_candidates)
+    monkeypatch.setattr(cross_matching, "CROSS_MATCHING_CANDIDATE_FACTOR", factor)
+    monkeypatch.setattr(cross_matching, "CROSS_MATCHING_MAX_CANDIDATES", max_candidates)
+
+
+def _uids(results):
+    return {cid: {c: [item["unique_id"] for item in items] for c, items in r.items()} for cid, r in results.items()}
+
+
+# первый пул занят шумом — пул растёт только для незаполненного компонента,
+# и результат совпадает с одним запросом по большому пулу
+def test_pool_grows_until_categories_are_filled(pool_service, monkeypatch):
+    sources = [1, 84]
+    _pool_limits(monkeypatch, min_candidates=10)
+    grown = pool_service.find_similar_batch(sources, top_k=5)
+
+    assert pool_service.queries == [(2, 20), (1, 80), (1, 320)]
+    result = _uids(grown)
+    # все дубликаты C0 найдены, хотя в первом пуле их не было
+    assert sorted(result[1]["same_assembly"]) == ["u61", "u62", "u63"]
+    assert sorted(result[1]["other_assemblies"]) == ["u64", "u65", "u66", "u67"]
+    assert len(result[1]["analogs"]) == 10
+    assert result[84] == {"same_assembly": [], "other_assemblies": ["u84"], "analogs": [f"u{i}" for i in range(85, 95)]}
+
+    pool_service.queries.clear()
+    _pool_limits(monkeypatch, min_candidates=1000)
+    single = pool_service.find_similar_batch(sources, top_k=5)
+
+    assert pool_service.queries == [(2, 1000)]
+    assert _uids(single) == result
+    assert single == grown
+
+
+# пул не растёт, когда все дубликаты уже найдены, даже если их меньше top_k
+def test_pool_stops_when_all_duplicates_are_found(pool_service, monkeypatch):
+    _pool_limits(monkeypatch, min_candidates=10)
+
+    result = _uids(pool_service.find_similar_batch([1], top_k=5, categories=["same_assembly"]))
+
+    # пул 10 целиком занят шумом, пока не найдены все три дубликата в той же сборке
+    assert pool_service.queries == [(1, 10), (1, 40), (1, 160)]
+    assert sorted(result[1]["same_assembly"]) == ["u61", "u62", "u63"]
+
+    pool_service.queries.clear()
+    result = _uids(pool_service.find_similar_batch([84], top_k=5, categories=["other_assemblies"]))
+
+    # единственный дубликат найден в первом пуле
+    assert pool_service.queries == [(1, 10)]
+    assert result[84]["other_assemblies"] == ["u84"]
+
+
+def test_duplicate_counts_exclude_the_source(pool_service):
+    sources = [SimpleNamespace(id=1, component_id="C0", path="MAT.A", abs_level=1)]
+
+    assert pool_service._duplicate_counts(sources, same_level_only=False) == {1: (3, 4)}
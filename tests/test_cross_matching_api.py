@@ -0,0 +1,77 @@
+import importlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.cross_matching import CrossMatchingService
+
+
+# сервис без модели и индекса: запоминает аргументы и отвечает пустыми категориями
+class FakeService:
+
+    def __init__(self):
+        self.calls = []
+
+    def find_similar_batch(self, component_ids, top_k=10, same_level_only=False, categories=None):
+        self.calls.append((list(component_ids), top_k, same_level_only, categories))
+        return {cid: {"same_assembly": [], "other_assemblies": [], "analogs": []} for cid in component_ids}
+
+    def find_similar(self, component_id, top_k=10, same_level_only=False, categories=None):
+        return self.find_similar_batch([component_id], top_k, same_level_only, categories)[component_id]
+
+
+# модуль роутера создаёт сервис при импорте — конструктор подменяется до импорта
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr(CrossMatchingService, "__init__", lambda self: None)
+    routes = importlib.import_module("src.api.routes.cross_matching")
+    service = FakeService()
+    monkeypatch.setattr(routes, "service", service)
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    with TestClient(app) as client:
+        client.service = service
+        yield client
+
+
+def test_batch_request_is_passed_to_service(api):
+    response = api.post("/cross-matching/batch", json={
+        "component_ids": [3, 1, 2], "top_k": 5, "categories": ["analogs"],
+    })
+
+    assert response.status_code == 200
+    assert list(response.json()["results"]) == ["3", "1", "2"]
+    assert api.service.calls == [([3, 1, 2], 5, False, ["analogs"])]
+
+
+@pytest.mark.parametrize("payload", [
+    {"component_ids": []},
+    {"component_ids": list(range(201))},
+    {"component_ids": [1], "top_k": 0},
+    {"component_ids": [1], "top_k": 101},
+    {"component_ids": [1], "categories": ["analogs", "siblings"]},
+])
+def test_batch_validation_bounds(api, payload):
+    response = api.post("/cross-matching/batch", json=payload)
+
+    assert response.status_code == 422
+    assert api.service.calls == []
+
+
+def test_batch_accepts_limits(api):
+    ids = list(range(200))
+
+    assert api.post("/cross-matching/batch", json={"component_ids": ids, "top_k": 100}).status_code == 200
+    assert api.post("/cross-matching/batch", json={"component_ids": [1], "top_k": 1}).status_code == 200
+    assert api.service.calls[0][0] == ids
+
+
+def test_single_endpoint_validates_categories(api):
+    ok = api.get("/cross-matching/7", params={"categories": ["same_assembly", "analogs"]})
+    unknown = api.get("/cross-matching/7", params={"categories": ["siblings"]})
+
+    assert ok.status_code == 200
+    assert api.service.calls == [([7], 10, False, ["same_assembly", "analogs"])]
+    assert unknown.status_code == 422
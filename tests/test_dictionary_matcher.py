@@ -0,0 +1,87 @@
+import pytest
+import yaml
+
+from src.data_processing import dictionary_matcher
+from src.data_processing.dictionary_matcher import DictionaryMatcher, load_or_build_automaton
+
+DICTIONARIES = {
+    "COMPONENT_CLEAN": ("component_types", ["BOLT", "HEX BOLT", "HEX", "NUT", "PIN", "WASHER"]),
+    "MATERIAL_CLEAN": ("materials", ["STEEL", "STAINLESS STEEL", "SS", "AL"]),
+    "VENDOR_CLEAN": ("vendors", ["TRICO"]),
+    "STANDARD_CLEAN": ("standards", ["ISO4017", "ISO"]),
+}
+
+
+# маленькие словари во временном каталоге вместо dictionaries/clean
+@pytest.fixture
+def dictionaries(tmp_path, monkeypatch):
+    for name, (key, tokens) in DICTIONARIES.items():
+        path = tmp_path / f"{key}.yaml"
+        path.write_text(yaml.safe_dump({key: tokens}), encoding="utf-8")
+        monkeypatch.setattr(dictionary_matcher, name, str(path))
+    return tmp_path
+
+
+def test_automaton_cache_is_reused_until_dictionaries_change(dictionaries, monkeypatch):
+    path = str(dictionaries / "cache" / "automaton.pkl")
+    build = dictionary_matcher.build_automaton
+    builds = []
+    monkeypatch.setattr(dictionary_matcher, "build_automaton", lambda: builds.append(1) or build())
+
+    load_or_build_automaton(path, use_cache=True)
+    automaton, lists = load_or_build_automaton(path, use_cache=True)
+    assert len(builds) == 1
+    assert "HEX BOLT" in automaton and lists["vendor"] == ["TRICO"]
+
+    # словарь изменился — версия кэша тоже
+    (dictionaries / "vendors.yaml").write_text(yaml.safe_dump({"vendors": ["TRICO", "SKF"]}), encoding="utf-8")
+    automaton, lists = load_or_build_automaton(path, use_cache=True)
+    assert len(builds) == 2
+    assert lists["vendor"] == ["TRICO", "SKF"]
+
+
+def test_corrupt_automaton_cache_is_rebuilt(dictionaries):
+    path = dictionaries / "automaton.pkl"
+    path.write_bytes(b"not a pickle")
+
+    automaton, _ = load_or_build_automaton(str(path), use_cache=True)
+
+    assert "WASHER" in automaton
+    assert load_or_build_automaton(str(path), use_cache=True)[1] == load_or_build_automaton(use_cache=False)[1]
+
+
+def test_shared_matcher_is_rebuilt_only_when_files_change(dictionaries, monkeypatch):
+    monkeypatch.setattr(dictionary_matcher, "_shared_matcher", None)
+
+    first = dictionary_matcher.get_shared_matcher()
+    assert dictionary_matcher.get_shared_matcher() is first
+
+    (dictionaries / "materials.yaml").write_text(yaml.safe_dump({"materials": ["BRASS"]}), encoding="utf-8")
+    assert dictionary_matcher.get_shared_matcher() is not first
+
+
+@pytest.mark.parametrize("text, mode, expected", [
+    # all: любые вхождения, включая части слов
+    (
+        "hex bolt walnut spindle", "all",
+        {"component_type": ["HEX", "HEX BOLT", "BOLT", "NUT", "PIN"], "material": ["AL"]},
+    ),
+    # longest: только целые слова, из пересекающихся — самое длинное
+    ("hex bolt walnut spindle", "longest", {"component_type": ["HEX BOLT"]}),
+    ("STAINLESS STEEL HEX NUT", "longest", {"material": ["STAINLESS STEEL"], "component_type": ["HEX", "NUT"]}),
+    ("ISO4017 BOLT, ISO", "longest", {"standard": ["ISO4017", "ISO"], "component_type": ["BOLT"]}),
+    # граница слова — любой не буквенно-цифровой символ
+    ("SS-WASHER (AL)", "longest", {"material": ["SS", "AL"], "component_type": ["WASHER"]}),
+    ("BOLTS SSTEEL", "longest", {}),
+])
+def test_match_modes(dictionaries, text, mode, expected):
+    matcher = DictionaryMatcher(mode="all")
+
+    result = {label: r.values for label, r in matcher.match_all(text, mode=mode).items() if r.values}
+
+    assert result == expected
+
+
+def test_unknown_match_mode_is_rejected(dictionaries):
+    with pytest.raises(ValueError, match="Unknown dictionary match mode"):
+        DictionaryMatcher(mode="fuzzy")
@@ -0,0 +1,226 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.core import vector_repository
+from src.core.vector_index import VectorIndexRepository
+from src.db import database
+from src.db.database import Base
+from src.db.models import ComponentDB
+from src.ml import embedding_cache, embedding_service
+from src.ml.embedding_cache import EmbeddingCache
+from src.ml.embedding_service import EmbeddingService
+
+DIM = 4
+
+
+# модель без весов: вектор зависит только от текста, вызовы encode запоминаются
+class FakeModel:
+    max_seq_length = 128
+    tokenizer = None
+
+    def __init__(self):
+        self.calls = []
+
+    def get_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, batch_size=None, show_progress_bar=None, convert_to_numpy=True):
+        batch = [texts] if isinstance(texts, str) else list(texts)
+        self.calls.append(batch)
+        out = np.array(
+            [[len(t), sum(map(ord, t)) % 97, t.count(" "), 1.0] for t in batch], dtype=np.float32
+        )
+        return out[0] if isinstance(texts, str) else out
+
+
+def make_service(model=None) -> EmbeddingService:
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.model_name = service.model_id = "fake"
+    service.backend = "torch"
+    service.model = model or FakeModel()
+    service.cache = EmbeddingCache(service.model_id)
+    return service
+
+
+# отдельная БД вместо data/bom.sqlite3; все SQL-запросы к ней запоминаются
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bom.sqlite3'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, future=True)
+    monkeypatch.setattr(database, "SessionLocal", session)
+    monkeypatch.setattr(embedding_cache, "SessionLocal", session)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append((args[2], args[3])))
+    engine.statements = statements
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def vectors(tmp_path, monkeypatch):
+    repo = VectorIndexRepository(str(tmp_path / "index"))
+    monkeypatch.setattr(vector_repository, "get_vector_repository", lambda: repo)
+    yield repo
+    repo.db.close()
+
+
+def _insert_components(engine, names):
+    with engine.begin() as conn:
+        conn.execute(insert(ComponentDB), [
+            {
+                "unique_id": f"u{i}",
+                "material_id": "MAT",
+                "component_id": f"C{i}",
+                "path": f"MAT.C{i}",
+                "clean_name": name,
+            }
+            for i, name in enumerate(names)
+        ])
+
+
+def test_rebuild_reads_by_keyset_and_skips_fresh_rows(db, vectors):
+    names = [f"HEX BOLT M{i % 9}" for i in range(50)]
+    _insert_components(db, names)
+    service = make_service()
+
+    stats = service.rebuild_embeddings(batch_size=7)
+
+    assert stats["total"] == stats["recomputed"] == 50
+    assert vectors.count() == 50
+    reads = [(s, p) for s, p in db.statements if s.startswith("SELECT components.id, components.unique_id")]
+    # позиция — по последнему id; диалект SQLite всегда пишет OFFSET, но он нулевой
+    assert all("WHERE components.id > ?" in s and p[-1] == 0 for s, p in reads)
+    # 8 батчей и последний пустой запрос
+    assert [p[0] for _, p in reads] == [*range(0, 50, 7), 50]
+    with db.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM components WHERE embedding_vector IS NULL").scalar() == 0
+
+    # векторы и метаданные актуальны — повторный запуск ничего не пересчитывает
+    again = service.rebuild_embeddings(batch_size=7)
+    assert again["recomputed"] == 0 and again["skipped"] == 50
+
+
+def test_cached_encoding_encodes_each_normalized_text_once(db):
+    model = FakeModel()
+    service = make_service(model)
+    texts = ["HEX BOLT", "HEX  BOLT ", "NUT", "", None, "HEX BOLT"]
+    stats = {}
+
+    first = service.encode_cached_array(texts, stats)
+    second = service.encode_cached_array(["NUT", "WASHER", "HEX BOLT"], stats)
+
+    # повтор и пробелы не кодируются заново, второй вызов берёт известные тексты из кэша
+    assert sorted(t for call in model.calls for t in call) == ["", "HEX BOLT", "NUT", "WASHER"]
+    assert stats == {"texts": 9, "unique_texts": 6, "cache_hits": 2, "encoded": 4}
+    np.testing.assert_array_equal(first, service.encode_batch_array(["HEX BOLT", "HEX BOLT", "NUT", "", "", "HEX BOLT"]))
+    np.testing.assert_array_equal(second[[0, 2]], first[[2, 0]])
+
+
+# load_model передаёт SentenceTransformer параметры выбранного бэкенда
+def test_backend_selection(monkeypatch):
+    created = []
+    monkeypatch.setattr(embedding_service, "SentenceTransformer", lambda *args, **kwargs: created.append(kwargs) or kwargs)
+
+    embedding_service.load_model("all-MiniLM-L6-v2", "/tmp/st", "torch")
+    embedding_service.load_model("all-MiniLM-L6-v2", "/tmp/st", "onnx", onnx_file="onnx/model_qint8_avx512.onnx")
+
+    assert created[0] == {"cache_folder": "/tmp/st"}
+    assert created[1]["backend"] == "onnx"
+    assert created[1]["model_kwargs"] == {
+        "file_name": "onnx/model_qint8_avx512.onnx", "provider": "CPUExecutionProvider",
+    }
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        embedding_service.load_model("all-MiniLM-L6-v2", "/tmp/st", "openvino")
+
+
+def test_onnx_backend_requires_recent_sentence_transformers(monkeypatch):
+    def old_constructor(model_name, cache_folder=None):
+        return None
+
+    monkeypatch.setattr(embedding_service, "SentenceTransformer", old_constructor)
+
+    with pytest.raises(RuntimeError, match="sentence-transformers>=3.2"):
+        embedding_service.load_model("all-MiniLM-L6-v2", "/tmp/st", "onnx")
+
+
+# векторы разных бэкендов и файлов квантования не делят записи кэша
+def test_model_id_separates_backends():
+    ids = {
+        embedding_service.model_id("all-MiniLM-L6-v2", "torch"),
+        embedding_service.model_id("all-MiniLM-L6-v2", "onnx", "onnx/model.onnx"),
+        embedding_service.model_id("all-MiniLM-L6-v2", "onnx", "onnx/model_qint8_avx512.onnx"),
+    }
+
+    assert len(ids) == 3
+    assert embedding_service.model_id("all-MiniLM-L6-v2", "torch") == "all-MiniLM-L6-v2"
+
+
+def test_array_apis_return_float32_matrices():
+    service = make_service()
+    texts = ["HEX BOLT M8", "NUT", "", "WASHER 8MM FLAT"]
+
+    matrix = service.encode_batch_array(texts)
+    empty = service.encode_batch_array([])
+
+    assert matrix.shape == (4, DIM) and matrix.dtype == np.float32 and matrix.flags.c_contiguous
+    assert empty.shape == (0, DIM)
+    assert service.encode_batch(texts) == matrix.tolist()
+    assert service.encode_array("NUT").dtype == np.float32
+    assert service.encode("NUT") == matrix[1].tolist()
+
+
+# матрица батча доходит до репозитория векторов без поэлементных списков
+def test_rebuild_passes_matrices_to_vector_repository(db, vectors, monkeypatch):
+    _insert_components(db, ["HEX BOLT", "NUT", "HEX BOLT"])
+    upsert = vectors.upsert_batch
+    received = []
+
+    def record(ids, embeddings, metadatas):
+        received.append(embeddings)
+        upsert(ids, embeddings, metadatas)
+
+    monkeypatch.setattr(vectors, "upsert_batch", record)
+
+    make_service().rebuild_embeddings(batch_size=10)
+
+    assert len(received) == 1
+    assert isinstance(received[0], np.ndarray) and received[0].shape == (3, DIM)
+    with db.connect() as conn:
+        stored = conn.exec_driver_sql("SELECT embedding_vector FROM components ORDER BY id").scalars().all()
+    np.testing.assert_array_equal(np.frombuffer(b"".join(stored), dtype=np.float32).reshape(3, DIM), received[0])
+
+
+@pytest.mark.parametrize("budget, max_batch", [(64, 32), (200, 8), (1, 4), (10_000, 1000)])
+def test_length_batches_respect_token_budget(budget, max_batch):
+    lengths = np.sort(np.random.default_rng(0).integers(1, 60, 500))
+
+    batches = embedding_service.length_batches(lengths, budget, max_batch)
+
+    # батчи покрывают все тексты подряд, без пропусков
+    assert batches[0][0] == 0 and batches[-1][1] == len(lengths)
+    assert all(a[1] == b[0] for a, b in zip(batches, batches[1:]))
+    for start, end in batches:
+        assert 1 <= end - start <= max_batch
+        # бюджет превышает только одиночный слишком длинный текст
+        assert end - start == 1 or (end - start) * lengths[end - 1] <= budget
+        # батч не обрывается раньше, чем нужно
+        if end < len(lengths) and end - start < max_batch:
+            assert (end - start + 1) * lengths[end] > budget
+
+
+# сортировка по длине не меняет порядок строк результата
+def test_length_sorted_encoding_keeps_input_order():
+    model = FakeModel()
+    service = make_service(model)
+    texts = [("X" * n) for n in np.random.default_rng(1).integers(1, 40, 100)]
+
+    matrix = service.encode_batch_array(texts, token_budget=120, max_batch=16)
+
+    np.testing.assert_array_equal(matrix, np.stack([service.encode_array(t) for t in texts]))
+    batches = model.calls[:-len(texts)]
+    assert all(len(b) * max(map(len, b)) <= 120 or len(b) == 1 for b in batches)
+    assert all(len(b) <= 16 for b in batches)
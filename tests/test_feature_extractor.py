@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+from src.data_processing import feature_extractor
+from src.data_processing.feature_extractor import FeatureExtractor, PARSED_COLUMNS
+from src.data_processing.parse_cache import ParseCache
+
+
+@pytest.fixture(scope="module")
+def descriptions():
+    return [str(d) for d in load_descriptions()[:3000]]
+
+
+@pytest.fixture
+def pool_shutdown():
+    yield
+    feature_extractor.shutdown_pool()
+
+
+def test_parallel_parsing_matches_single_process(descriptions, monkeypatch, pool_shutdown):
+    monkeypatch.setattr(feature_extractor, "PARSE_PARALLEL_MIN_ROWS", 0)
+    serial = FeatureExtractor()
+    parallel = FeatureExtractor()
+
+    expected = serial.parse_columns(descriptions)
+    result = parallel.parse_batch_parallel(descriptions, workers=2)
+
+    assert result == expected
+    # счётчики воркеров суммируются в родительском процессе
+    assert parallel.stats == serial.stats
+
+
+# смена числа воркеров и shutdown_pool дожидаются остановки процессов пула
+def test_pool_processes_are_stopped(pool_shutdown):
+    first = feature_extractor._get_pool(1)
+    first.submit(int).result()
+    first_procs = list(first._processes.values())
+
+    second = feature_extractor._get_pool(2)
+    assert second is not first and feature_extractor._get_pool(2) is second
+    assert not any(p.is_alive() for p in first_procs)
+
+    second.submit(int).result()
+    second_procs = list(second._processes.values())
+    feature_extractor.shutdown_pool()
+    assert feature_extractor._pool is None
+    assert not any(p.is_alive() for p in second_procs)
+
+
+def test_small_batch_stays_in_process(descriptions, monkeypatch):
+    monkeypatch.setattr(feature_extractor, "_get_pool", lambda workers: pytest.fail("pool started"))
+
+    result = FeatureExtractor().parse_batch_parallel(descriptions[:100], workers=4)
+
+    assert len(result["clean_name"]) == 100
+
+
+def test_parse_cache_hits_misses_and_version(tmp_path):
+    path = str(tmp_path / "parse_cache.sqlite3")
+    cache = ParseCache("v1", ("clean_name", "is_leaf"), path)
+    cache.put_many(["BOLT M8", "NUT M8"], {"clean_name": ["BOLT M8", "NUT M8"], "is_leaf": [True, True]})
+
+    assert cache.get_many(["BOLT M8", "WASHER"]) == {"BOLT M8": ("BOLT M8", 1)}
+    # другая версия словарей/парсера не видит старых записей
+    assert ParseCache("v2", ("clean_name", "is_leaf"), path).get_many(["BOLT M8"]) == {}
+
+
+# каждый вызов закрывает своё соединение, а не ждёт сборщика мусора
+def test_parse_cache_closes_connections(tmp_path, monkeypatch):
+    opened = []
+    connect = ParseCache._connect
+    monkeypatch.setattr(ParseCache, "_connect", lambda self: opened.append(connect(self)) or opened[-1])
+    cache = ParseCache("v1", ("clean_name",), str(tmp_path / "parse_cache.sqlite3"))
+
+    cache.put_many(["BOLT M8"], {"clean_name": ["BOLT M8"]})
+    assert cache.get_many(["BOLT M8"]) == {"BOLT M8": ("BOLT M8",)}
+
+    assert len(opened) == 3
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            conn.execute("SELECT 1")
+
+
+def test_parse_unique_reuses_cache_until_version_changes(descriptions, tmp_path, monkeypatch):
+    path = str(tmp_path / "parse_cache.sqlite3")
+    monkeypatch.setattr(feature_extractor, "ParseCache", lambda version, columns: ParseCache(version, columns, path))
+    extractor = FeatureExtractor()
+    parsed = []
+    parse = extractor.parse_batch_parallel
+    monkeypatch.setattr(extractor, "parse_batch_parallel", lambda d: parsed.append(len(d)) or parse(d))
+    rows = descriptions[:500] * 2
+
+    first = extractor.parse_unique(rows, use_cache=True)
+    second = extractor.parse_unique(rows, use_cache=True)
+    monkeypatch.setattr(feature_extractor, "PARSER_VERSION", "test")
+    third = extractor.parse_unique(rows, use_cache=True)
+
+    unique = len({FeatureExtractor._normalize_description(d) for d in rows})
+    assert parsed == [unique, 0, unique]
+    for c in PARSED_COLUMNS:
+        assert first[c].tolist() == second[c].tolist() == third[c].tolist()
+
+
+
+# колонки совпадают с построчным ParsedComponent, включая разреженные уверенности
+def test_columns_match_parsed_components(descriptions):
+    rows = descriptions[:1000] + ["", "  hex bolt,  m8 ", "HEX BOLT. M8"]
+    components = FeatureExtractor().parse_batch(rows)
+
+    columns = FeatureExtractor().parse_columns(rows, with_confidence=True)
+    unique = FeatureExtractor().parse_unique(rows, use_cache=False)
+
+    for c in PARSED_COLUMNS:
+        expected = [getattr(p, c) for p in components]
+        assert columns[c] == expected
+        assert unique[c].tolist() == expected
+
+    conf = columns["confidence"]
+    restored = [{} for _ in rows]
+    for row, key, value in zip(conf["row"], conf["key"], conf["value"]):
+        restored[row][key] = value
+    assert restored == [p.confidence_scores for p in components]
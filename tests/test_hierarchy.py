@@ -0,0 +1,107 @@
+import hashlib
+import random
+
+import pandas as pd
+import pytest
+
+from scripts.benchmarks.synthetic_bom import make_bom
+from src.data_processing.hierarchy import HierarchyProcessor
+
+# все символы, которые str.strip считает пробелами (NBSP, U+2009, U+3000, ...)
+SPACES = [c for c in map(chr, range(0x110000)) if c.isspace()]
+
+
+# прежняя построчная нормализация путей (до векторизации _fix_paths)
+def _baseline_fix_paths(paths: pd.Series) -> pd.Series:
+    paths = paths.fillna("").astype(str)
+    paths = paths.str.strip(" .")
+
+    for _ in range(3):
+        paths = paths.str.replace(r"\.\.", ".", regex=True)
+
+    def normalize_path(p: str) -> str:
+        parts = [part.strip() for part in p.split(".") if part.strip()]
+        return ".".join(parts)
+
+    return paths.apply(normalize_path)
+
+
+def _fix_paths(paths: pd.Series) -> pd.Series:
+    return HierarchyProcessor()._fix_paths(pd.DataFrame({"path": paths.copy()}))["path"]
+
+
+def test_fix_paths_matches_baseline_with_unicode_spaces():
+    rng = random.Random(0)
+    alphabet = ["MAT1", "C0001", "HEX BOLT", "A\xa0B", ".", ". ", " "] + SPACES
+    paths = pd.Series(
+        ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8))) for _ in range(20000)]
+        + ["A.\xa0.B", "　MAT.C1 ", "MAT . C1 . ", "\x85.A", None],
+        dtype=object,
+    )
+
+    assert _fix_paths(paths).tolist() == _baseline_fix_paths(paths).tolist()
+
+
+def test_fix_paths_keeps_non_space_characters():
+    chars = [c for c in map(chr, range(1, 0x3100)) if not c.isspace() and c != "."]
+    paths = pd.Series([f"A.{c}.B" for c in chars] + [f"{c}.{c}" for c in chars], dtype=object)
+
+    assert _fix_paths(paths).tolist() == _baseline_fix_paths(paths).tolist()
+
+
+def test_unique_id_and_level_ignore_unicode_spaces():
+    bom = pd.DataFrame({
+        "material_id": ["MAT", "MAT", "MAT"],
+        "component_id": ["MAT", "S1", "C1"],
+        "description": ["ASSY", "SUB", "BOLT"],
+        "qty": [1.0, 1.0, 2.0],
+        "path": ["MAT", "MAT.\xa0.S1", "MAT .S1.　C1\xa0"],
+    })
+    clean = bom.assign(path=["MAT", "MAT.S1", "MAT.S1.C1"])
+
+    result = HierarchyProcessor().process(bom)
+    expected = HierarchyProcessor().process(clean)
+
+    assert result["unique_id"].tolist() == expected["unique_id"].tolist()
+    assert result["abs_level"].tolist() == [0, 1, 2]
+
+
+# прежняя построчная генерация unique_id (до векторизации _create_unique_ids)
+def _baseline_unique_ids(df: pd.DataFrame) -> pd.Series:
+    def make_uid(row):
+        path_hash = hashlib.sha1(str(row["path"]).encode("utf-8")).hexdigest()
+        return f"{row['material_id']}_{row['component_id']}_{path_hash}"
+
+    return df.apply(make_uid, axis=1)
+
+
+def test_sha1_unique_ids_match_baseline():
+    df = make_bom(3000, seed=4)
+    df.loc[df.index[:2], "path"] = ["MAT.\xa0Ü.C1", ""]
+
+    result = HierarchyProcessor._create_unique_ids(df, "sha1")
+
+    assert result.tolist() == _baseline_unique_ids(df).tolist()
+    assert result.index.equals(df.index)
+
+
+@pytest.mark.parametrize("hasher, width", [("fast64", 16), ("fast128", 32)])
+def test_fast_hashers_keep_unique_id_identity(hasher, width):
+    df = make_bom(3000, seed=5)
+    df["path"] = df["path"].astype(str)
+
+    result = HierarchyProcessor._create_unique_ids(df, hasher)
+    baseline = _baseline_unique_ids(df)
+    hashes = result.str.rsplit("_", n=1).str[-1]
+
+    # те же строки совпадают и различаются, что и с sha1
+    assert hashes.str.fullmatch(f"[0-9a-f]{{{width}}}").all()
+    assert pd.factorize(result)[0].tolist() == pd.factorize(baseline)[0].tolist()
+    assert (result.str.rsplit("_", n=1).str[0] == baseline.str.rsplit("_", n=1).str[0]).all()
+    # хэш зависит только от пути, не от чанка
+    assert HierarchyProcessor._create_unique_ids(df.iloc[::-1], hasher).tolist() == result.iloc[::-1].tolist()
+
+
+def test_unknown_hasher_is_rejected():
+    with pytest.raises(ValueError, match="Unknown unique_id hasher"):
+        HierarchyProcessor(hasher="md5")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.core import hybrid_search
+from src.core.hybrid_search import HybridSearchService
+from src.core.vector_index import VectorIndexRepository
+from src.db.database import Base
+from src.db.models import ComponentDB
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32)).astype(np.float32)
+    labels = rng.integers(0, len(centers), 4000)
+    vectors = centers[labels] + 0.1 * rng.standard_normal((len(labels), 32), dtype=np.float32)
+    ids = [f"u{i}" for i in range(len(vectors))]
+    # каждый десятый — нужный поставщик; компоненты повторяются парами
+    vendors = ["RARE" if i % 10 == 0 else "COMMON" for i in range(len(vectors))]
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'bom.sqlite3'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(ComponentDB), [
+            {
+                "unique_id": uid,
+                "material_id": "MAT",
+                "component_id": f"C{i // 20}" if vendor == "RARE" else f"X{i}",
+                "path": f"MAT.{i}",
+                "vendor": vendor,
+            }
+            for i, (uid, vendor) in enumerate(zip(ids, vendors))
+        ])
+
+    repo = VectorIndexRepository(str(tmp_path / "index"), nprobe=2)
+    repo.upsert_batch(ids, vectors, [{"vendor": v} for v in vendors])
+    repo.build_ivf(nlist=20)
+
+    monkeypatch.setattr(hybrid_search, "get_vector_repository", lambda: repo)
+    svc = HybridSearchService()
+    monkeypatch.setattr(svc, "_get_session", sessionmaker(bind=engine))
+    yield svc, vectors
+    repo.db.close()
+    engine.dispose()
+
+
+def test_filtered_search_on_ivf_index_returns_top_k(service):
+    svc, vectors = service
+    stats = {}
+
+    df = svc.search(vectors[0].tolist(), n_results=150, filters={"vendor": "RARE"}, stats=stats)
+
+    assert len(df) == 150
+    assert df["component_id"].is_unique
+    assert (df["vendor"] == "RARE").all()
+    assert df["score"].is_monotonic_increasing
@@ -0,0 +1,150 @@
+import logging
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from scripts.benchmarks.synthetic_bom import make_bom
+from src.db import init_db
+from src.db.init_db import DERIVED_COLUMNS, bulk_import_parquet, incremental_import_parquet
+from src.pipeline.processor import SimpleBOMProcessor
+
+
+def _processed(bom: pd.DataFrame, path) -> pd.DataFrame:
+    logging.disable(logging.INFO)
+    try:
+        df = SimpleBOMProcessor().process_pipeline(bom.copy())
+    finally:
+        logging.disable(logging.NOTSET)
+    df.to_parquet(path, index=False)
+    return df
+
+
+# строки, у которых изменилось что-то кроме id и вычисляемых колонок
+def _content_changed(old: pd.DataFrame, new: pd.DataFrame, columns) -> set:
+    merged = old.merge(new, on="unique_id", suffixes=("_old", "_new"))
+    changed = pd.Series(False, index=merged.index)
+    for c in columns:
+        a, b = merged[f"{c}_old"], merged[f"{c}_new"]
+        changed |= (a != b) & ~(a.isna() & b.isna())
+    return set(merged.loc[changed, "unique_id"])
+
+
+# граф в терминах unique_id: ребро parent_id -> id (как в GraphService) и путь по id
+def _graph(engine) -> tuple:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT id, unique_id, path, parent_id FROM components").all()
+    uid = {str(r.id): r.unique_id for r in rows}
+    edges = {(uid.get(r.parent_id), r.unique_id) for r in rows if r.parent_id is not None}
+    paths = {r.unique_id: tuple(uid.get(s) for s in (r.path or "").split(".") if s) for r in rows}
+    return edges, paths
+
+
+def _engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    init_db.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(init_db, "_delete_chroma_vectors", lambda ids: len(ids))
+    engine = _engine(tmp_path / "bom.sqlite3")
+    yield engine
+    engine.dispose()
+
+
+# удаление строк из середины файла сдвигает temp_id всех следующих строк
+def _shifted_bom(bom: pd.DataFrame) -> pd.DataFrame:
+    mid = len(bom) // 2
+    bom = bom.drop(bom.index[mid:mid + 50]).reset_index(drop=True)
+    bom.loc[bom.index[-5:], "description"] = "CHANGED DESCRIPTION"
+    return bom
+
+
+def test_rows_removed_mid_file_do_not_touch_shifted_rows(tmp_path, db_engine):
+    bom = make_bom(5000, seed=1)
+    old = _processed(bom, tmp_path / "v1.parquet")
+    bulk_import_parquet(str(tmp_path / "v1.parquet"), db_engine)
+
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE components SET updated_at = '2000-01-01 00:00:00'")
+
+    new = _processed(_shifted_bom(bom), tmp_path / "v2.parquet")
+
+    stats = incremental_import_parquet(str(tmp_path / "v2.parquet"), db_engine)
+
+    columns = [c for c in new.columns if c in init_db.ComponentDB.__table__.columns]
+    compare = [c for c in columns if c not in ("id", "unique_id", *DERIVED_COLUMNS)]
+    expected = _content_changed(old, new, compare)
+    kept = set(old["unique_id"]) & set(new["unique_id"])
+
+    assert 0 < len(expected) < len(kept) // 10
+    assert stats["updated"] == len(expected)
+    assert stats["unchanged"] == len(kept) - len(expected)
+    assert stats["deleted"] == len(set(old["unique_id"]) - set(new["unique_id"]))
+
+    with db_engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT unique_id, updated_at FROM components").all()
+    bumped = {r.unique_id for r in rows if r.updated_at != "2000-01-01 00:00:00"}
+    assert bumped == expected | (set(new["unique_id"]) - set(old["unique_id"]))
+
+
+def test_incremental_graph_matches_replace_import(tmp_path, db_engine):
+    bom = make_bom(5000, seed=1)
+    _processed(bom, tmp_path / "v1.parquet")
+    bulk_import_parquet(str(tmp_path / "v1.parquet"), db_engine)
+
+    # новые строки в начале файла и удалённые в середине
+    extra = make_bom(300, seed=7)
+    extra["material_id"] = "MATNEW"
+    extra["path"] = "MATNEW." + extra["path"].str.split(".", n=1).str[-1]
+    changed = pd.concat([extra, _shifted_bom(bom)], ignore_index=True)
+    _processed(changed, tmp_path / "v2.parquet")
+
+    stats = incremental_import_parquet(str(tmp_path / "v2.parquet"), db_engine)
+
+    replace_engine = _engine(tmp_path / "replace.sqlite3")
+    bulk_import_parquet(str(tmp_path / "v2.parquet"), replace_engine)
+
+    edges, paths = _graph(db_engine)
+    expected_edges, expected_paths = _graph(replace_engine)
+    replace_engine.dispose()
+
+    assert stats["inserted"] > 0 and stats["deleted"] > 0
+    assert len(expected_edges) > 1000
+    assert edges == expected_edges
+    assert paths == expected_paths
+
+
+def test_reimport_of_same_file_changes_nothing(tmp_path, db_engine):
+    path = tmp_path / "bom.parquet"
+    _processed(make_bom(2000, seed=3), path)
+    bulk_import_parquet(str(path), db_engine)
+
+    stats = incremental_import_parquet(str(path), db_engine)
+
+    assert stats["updated"] == stats["inserted"] == stats["deleted"] == stats["refreshed"] == 0
+    assert stats["unchanged"] == stats["rows"]
+
+
+# карта temp_id -> id ищется по индексу, а не перебором на каждую строку
+def test_parent_remap_uses_temp_id_index(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'bom.sqlite3'}")
+    init_db.Base.metadata.create_all(bind=db_engine)
+
+    with db_engine.connect() as conn:
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE components_incoming AS "
+            "SELECT unique_id, parent_id, 0 AS temp_id FROM components WHERE 0"
+        )
+        init_db._remap_hierarchy(conn, [])
+        plan = " ".join(
+            str(r[-1]) for r in conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT m.id FROM components_ids AS m "
+                "WHERE m.temp_id = CAST('7' AS INTEGER)"
+            )
+        )
+    db_engine.dispose()
+
+    assert "ix_components_ids_temp_id" in plan
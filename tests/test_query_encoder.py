@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.ml.query_encoder import QueryEncoder
+
+
+# вектор — длина текста; каждый вызов модели запоминает свой батч
+class FakeEmbedder:
+    def __init__(self, lowercase: bool = True):
+        self.model = SimpleNamespace(tokenizer=SimpleNamespace(do_lower_case=lowercase))
+        self.calls = []
+
+    def encode_batch_array(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), i] for i, t in enumerate(texts)], dtype=np.float32)
+
+
+def test_cache_hits_share_one_entry_per_normalized_text():
+    embedder = FakeEmbedder()
+    encoder = QueryEncoder(embedder, cache_size=2, wait_ms=0)
+
+    assert encoder.encode("Hex  Bolt") == [8.0, 0.0]
+    assert encoder.encode("hex bolt") == [8.0, 0.0]
+    encoder.encode("nut")
+    encoder.encode("washer")
+    # "hex bolt" вытеснен из кэша размером 2
+    encoder.encode("hex bolt")
+
+    metrics = encoder.metrics()
+    assert len(embedder.calls) == 4
+    assert metrics["cache_hits"] == 1
+    assert metrics["cache_entries"] == 2
+
+
+def test_concurrent_requests_are_batched_and_coalesced():
+    embedder = FakeEmbedder()
+    encoder = QueryEncoder(embedder, wait_ms=50, max_batch=16)
+    texts = [f"bolt m{i}" for i in range(8)] * 2
+    results = [None] * len(texts)
+
+    def run(i):
+        results[i] = encoder.encode(texts[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(len(c) for c in embedder.calls) == 8
+    assert len(embedder.calls) < 8
+    assert results[:8] == results[8:]
+    assert all(r[0] == len(t) for r, t in zip(results, texts))
+    metrics = encoder.metrics()
+    assert metrics["batched_texts"] + metrics["coalesced"] + metrics["cache_hits"] == len(texts)
+
+
+# записи кэша — собственные массивы, а не view на матрицу батча
+def test_cache_entries_do_not_keep_the_batch_matrix():
+    encoder = QueryEncoder(FakeEmbedder(), wait_ms=0)
+
+    encoder._encode([("a", Future()), ("bb", Future())])
+
+    for vector in encoder._cache.values():
+        assert vector.base is None
+        assert vector.flags.c_contiguous
+
+
+def test_model_error_reaches_every_waiter():
+    embedder = FakeEmbedder()
+    embedder.encode_batch_array = lambda texts: (_ for _ in ()).throw(RuntimeError("model down"))
+    encoder = QueryEncoder(embedder, wait_ms=0)
+    future = Future()
+
+    encoder._encode([("a", future)])
+
+    assert isinstance(future.exception(), RuntimeError)
+    assert not encoder._pending and not encoder._cache
+
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from scripts.benchmarks.synthetic_bom import load_descriptions
+from src.data_processing.regex_matcher import FEATURE_GROUPS, MASTER_REGEX, RegexMatcher
+
+_CONFIDENCE = {
+    "size_triplet": 1.0,
+    "size_pair": 0.95,
+    "size_range": 0.9,
+    "size_suffix": 0.85,
+    "size_single": 0.8,
+    "grade": 0.9,
+    "finish": 0.8,
+    "thread": 0.85,
+}
+
+_STANDARDS = [
+    re.compile(p, re.IGNORECASE)
+    for p in [
+        r"^ASTM[A-Z0-9\-]*$", r"^ASME[A-Z0-9\-]*$", r"^API[A-Z0-9\-]*$", r"^ISO[A-Z0-9\-]*$",
+        r"^DIN[A-Z0-9\-]*$", r"^EN[A-Z0-9\-]*$", r"^NPTF?$", r"^UNC$", r"^UNF$", r"^UNRC$",
+        r"^RTJ$", r"^RF\d*$", r"^FF\d*$", r"^SCH\d+$",
+    ]
+]
+
+
+# прежний match_all: groupdict на каждое совпадение и отдельный проход по токенам
+def _baseline_match_all(text: str) -> dict:
+    t = " ".join(str(text).upper().split())
+    found = {g: {} for g in FEATURE_GROUPS}
+
+    for m in MASTER_REGEX.finditer(t):
+        for name, value in m.groupdict().items():
+            if value:
+                group = "size" if name.startswith("size_") else name
+                found[group][value.upper()] = max(found[group].get(value.upper(), 0.0), _CONFIDENCE[name])
+                break
+
+    for token in t.split():
+        if any(p.match(token) for p in _STANDARDS):
+            found["strict_standard"][token.upper()] = 0.9
+
+    return {g: (list(v), v) for g, v in found.items()}
+
+
+def _as_tuples(result) -> dict:
+    return {g: (r.values, r.confidences) for g, r in result.items()}
+
+
+def test_single_pass_matches_baseline():
+    matcher = RegexMatcher()
+    texts = [str(d) for d in load_descriptions()[:5000]] + [
+        "HEX BOLT M8X1.25 x 20 A2-70 ZINC ISO4017",
+        "flange rf150 sch40 astm-a105 npt 1/4-20 unc",
+        "2 X 3 X 4 PLATE 10.9 GRADE 8 GALVANIZED",
+        "",
+    ]
+
+    for text in texts:
+        assert _as_tuples(matcher.match_all(text)) == _baseline_match_all(text), text
+
+
+@pytest.mark.parametrize("groups", [("size",), ("size", "strict_standard"), ("strict_standard",), ("thread", "grade")])
+def test_selected_groups_match_full_result(groups):
+    matcher = RegexMatcher()
+    text = "HEX BOLT M8X1.25 x 20 A2-70 ZINC ISO4017 UNC"
+
+    full = matcher.match_all(text)
+    result = matcher.match_all(text, groups)
+
+    assert list(result) == list(groups)
+    assert all(result[g] == full[g] for g in groups)
@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from src.config import SQLITE_CACHE_BUDGET_KB
+from src.db import database
+from src.db.database import create_sqlite_engine
+
+
+def _pragmas(engine, names):
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+@pytest.mark.parametrize("readers", [0, 3, 8])
+def test_performance_profile_splits_cache_budget_across_pool(tmp_path, readers):
+    engine = create_sqlite_engine(str(tmp_path / "bom.sqlite3"), profile="performance", readers=readers)
+    try:
+        pragmas = _pragmas(engine, ["journal_mode", "synchronous", "temp_store", "cache_size"])
+        pool_size = engine.pool.size()
+
+        assert pool_size == readers + 1
+        assert pragmas["journal_mode"] == "wal"
+        assert pragmas["synchronous"] == 1
+        assert pragmas["temp_store"] == 2
+        # отрицательный cache_size — КБ на соединение; весь пул укладывается в бюджет
+        assert -pragmas["cache_size"] * pool_size <= SQLITE_CACHE_BUDGET_KB
+        assert -pragmas["cache_size"] == SQLITE_CACHE_BUDGET_KB // pool_size
+    finally:
+        engine.dispose()
+
+
+def test_default_profile_keeps_sqlite_defaults(tmp_path):
+    engine = create_sqlite_engine(str(tmp_path / "bom.sqlite3"), profile="default", readers=2)
+    try:
+        assert _pragmas(engine, ["journal_mode"])["journal_mode"] == "delete"
+    finally:
+        engine.dispose()
+
+
+def test_unknown_profile_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unknown SQLite profile"):
+        create_sqlite_engine(str(tmp_path / "bom.sqlite3"), profile="turbo")
+
+
+def _table_engine(tmp_path, profile="default", **kwargs):
+    path = str(tmp_path / "bom.sqlite3")
+    engine = create_sqlite_engine(path, profile=profile, readers=2, **kwargs)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+    return engine, path
+
+
+# второй писатель ждёт блокировку процесса, а не SQLITE_BUSY: с busy_timeout = 0
+# без очереди его запись сразу падает
+@pytest.mark.parametrize("serialize", [True, False])
+def test_second_writer_waits_for_first(tmp_path, serialize):
+    engine, _ = _table_engine(tmp_path, serialize_writes=serialize)
+    wrote, events, errors = threading.Event(), [], []
+
+    def second_writer():
+        wrote.wait()
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA busy_timeout = 0")
+                conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+                events.append("second insert")
+                conn.commit()
+        except OperationalError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+        wrote.set()
+        thread.join(0.3)
+        events.append("first commit")
+        conn.commit()
+    thread.join()
+
+    if serialize:
+        assert events == ["first commit", "second insert"] and not errors
+    else:
+        assert "database is locked" in str(errors[0])
+    engine.dispose()
+
+
+# читатели WAL не ждут писателя
+def test_readers_do_not_take_writer_lock(tmp_path):
+    engine, path = _table_engine(tmp_path, profile="performance")
+    with engine.connect() as writer:
+        writer.exec_driver_sql("INSERT INTO t VALUES (1)")
+        assert database._writer_lock(path).locked()
+        with engine.connect() as reader:
+            assert reader.exec_driver_sql("SELECT COUNT(*) FROM t").scalar() == 0
+        writer.commit()
+    engine.dispose()
+
+
+# незавершённая транзакция отпускает блокировку при rollback и возврате в пул
+def test_writer_lock_released_without_commit(tmp_path):
+    engine, path = _table_engine(tmp_path)
+    lock = database._writer_lock(path)
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+        conn.rollback()
+        assert not lock.locked()
+        conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+    assert not lock.locked()
+
+    # сессия закрыта без commit
+    with sessionmaker(bind=engine)() as session:
+        session.execute(text("DELETE FROM t"))
+        assert lock.locked()
+    assert not lock.locked()
+    engine.dispose()
+
+
+# запись во временные таблицы не занимает очередь писателя
+def test_writer_lock_can_be_skipped_for_temp_tables(tmp_path):
+    engine, path = _table_engine(tmp_path)
+    lock = database._writer_lock(path)
+
+    with engine.connect() as conn:
+        conn.execution_options(writer_lock=False)
+        conn.exec_driver_sql("CREATE TEMP TABLE incoming (x INTEGER)")
+        conn.exec_driver_sql("INSERT INTO incoming VALUES (1)")
+        assert not lock.locked()
+        conn.execution_options(writer_lock=True)
+        conn.exec_driver_sql("INSERT INTO t SELECT x FROM incoming")
+        assert lock.locked()
+        conn.commit()
+    assert not lock.locked()
+    engine.dispose()
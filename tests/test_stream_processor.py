@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.benchmarks.synthetic_bom import make_bom
+from src.core import process_service
+from src.core.task_manager import TaskManager
+from src.data_processing import hierarchy
+from src.pipeline.processor import CSV_DTYPES, NO_VALID_ROWS, SimpleBOMProcessor
+from src.utils.memory import RssTracker
+
+
+# потоковый и пакетный режимы на одном CSV; parquet читается обратно, как при импорте
+def _both_modes(csv_path, tmp_path, chunk_size=100):
+    stream_path = tmp_path / "out" / "stream.parquet"
+    rows = SimpleBOMProcessor().process_stream(str(csv_path), str(stream_path), chunk_size=chunk_size)
+
+    batch_path = tmp_path / "batch.parquet"
+    SimpleBOMProcessor().process_pipeline(pd.read_csv(csv_path, dtype=CSV_DTYPES)).to_parquet(batch_path, index=False)
+
+    return rows, pd.read_parquet(stream_path), pd.read_parquet(batch_path)
+
+
+def _assert_same(rows, stream, batch):
+    assert rows == len(batch) > 0
+    # порядок колонок отличается: в потоке признаки считаются до иерархии
+    pd.testing.assert_frame_equal(stream, batch, check_like=True)
+
+
+def test_stream_skips_chunk_of_duplicates(tmp_path):
+    bom = make_bom(300, seed=1)
+    csv_path = tmp_path / "bom.csv"
+    # последний чанк целиком повторяет строки первого
+    pd.concat([bom, bom.head(100)], ignore_index=True).to_csv(csv_path, index=False)
+
+    _assert_same(*_both_modes(csv_path, tmp_path))
+
+
+def test_stream_skips_chunk_without_paths(tmp_path):
+    bom = make_bom(200, seed=2)
+    csv_path = tmp_path / "bom.csv"
+    pd.concat([bom, bom.head(100).assign(path=" ")], ignore_index=True).to_csv(csv_path, index=False)
+
+    _assert_same(*_both_modes(csv_path, tmp_path))
+
+
+def test_numeric_ids_are_read_the_same_way(tmp_path):
+    bom = make_bom(300, seed=3)
+    # id из цифр с ведущими нулями: вывод типов превратил бы их в числа
+    codes = {v: f"{i:06d}" for i, v in enumerate(pd.unique(bom[["material_id", "component_id"]].to_numpy().ravel()))}
+    bom["material_id"] = bom["material_id"].map(codes)
+    bom["component_id"] = bom["component_id"].map(codes)
+    bom["path"] = bom["path"].map(lambda p: ".".join(codes[s] for s in p.split(".")))
+    csv_path = tmp_path / "bom.csv"
+    bom.to_csv(csv_path, index=False)
+
+    rows, stream, batch = _both_modes(csv_path, tmp_path)
+
+    _assert_same(rows, stream, batch)
+    assert stream["component_id"].str.len().eq(6).all()
+
+
+# карта component_id -> temp_id строится один раз, а не на каждом чанке второго прохода
+def test_stream_builds_temp_lookup_once(tmp_path, monkeypatch):
+    calls = []
+    build = hierarchy._temp_lookup
+    monkeypatch.setattr(hierarchy, "_temp_lookup", lambda lookup: calls.append(len(lookup)) or build(lookup))
+    csv_path = tmp_path / "bom.csv"
+    make_bom(1000, seed=5).to_csv(csv_path, index=False)
+
+    _assert_same(*_both_modes(csv_path, tmp_path, chunk_size=100))
+    # один вызов на поток и один на пакетный режим
+    assert len(calls) == 2
+
+
+def test_all_filtered_input_fails_in_both_modes(tmp_path):
+    csv_path = tmp_path / "bom.csv"
+    make_bom(200, seed=4).assign(path=" ").to_csv(csv_path, index=False)
+    out_path = tmp_path / "out" / "stream.parquet"
+
+    with pytest.raises(ValueError, match=NO_VALID_ROWS):
+        SimpleBOMProcessor().process_stream(str(csv_path), str(out_path), chunk_size=100)
+    with pytest.raises(ValueError, match=NO_VALID_ROWS):
+        SimpleBOMProcessor().process_pipeline(pd.read_csv(csv_path, dtype=CSV_DTYPES))
+
+    assert not out_path.exists()
+
+
+def test_validate_and_clean_empty_frame():
+    df = make_bom(10).head(0)
+
+    assert SimpleBOMProcessor()._validate_and_clean(df).empty
+
+
+# очистка отбирает строки в собственную копию и не трогает входной фрейм
+def test_validate_and_clean_owns_its_result():
+    bom = make_bom(50, seed=6)
+    raw = pd.concat([bom, bom.head(5), bom.head(3).assign(path=" ")], ignore_index=True)
+    raw["path"] = raw["path"] + " "
+    before = raw.copy()
+
+    clean = SimpleBOMProcessor()._validate_and_clean(raw)
+    clean["qty"] = -1.0
+
+    pd.testing.assert_frame_equal(raw, before)
+    expected = bom.drop_duplicates(["material_id", "component_id", "path"])
+    assert clean["path"].tolist() == expected["path"].tolist()
+
+
+# статистика стадий и RSS этого запуска доходят до статуса задачи
+def test_stream_stats_reach_task_status(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(process_service, "STREAM_PROCESSING", True)
+    monkeypatch.setattr(process_service, "PROCESS_CHUNK_SIZE", 100)
+    monkeypatch.setattr(process_service, "import_from_parquet", lambda stats: stats.update(rows=0) or 0)
+    csv_path = tmp_path / "bom.csv"
+    make_bom(300, seed=7).to_csv(csv_path, index=False)
+    TaskManager.create("stream-stats")
+
+    process_service.run_processing("stream-stats", str(csv_path))
+
+    task = TaskManager.get("stream-stats")
+    stream = task["stats"]["stream"]
+    assert task["status"] == "done"
+    assert task["stats"]["import"] == {"rows": 0}
+    rows = len(pd.read_parquet(tmp_path / "data" / "processed" / "processed_bom.parquet"))
+    assert stream["stages"]["write"]["rows"] == rows > 0
+    assert all(s["rows_per_sec"] for s in stream["stages"].values())
+    assert stream["rss_start_mb"] <= stream["rss_peak_mb"]
+    assert stream["rss_growth_mb"] == round(stream["rss_peak_mb"] - stream["rss_start_mb"], 1)
+
+
+# RSS меряется от начала запуска, а не от пика за жизнь процесса
+def test_rss_tracker_measures_this_run():
+    ballast = np.ones(64 * 2 ** 20 // 8)
+    del ballast
+    tracker = RssTracker()
+    block = np.ones(32 * 2 ** 20 // 8)
+    tracker.sample()
+    stats = tracker.stats()
+    del block
+
+    assert 30 <= stats["rss_growth_mb"] < 64
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select
+
+from src.db.migrate_embeddings import migrate_embeddings
+from src.db.types import VectorBlob
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bom.sqlite3'}")
+    yield engine
+    engine.dispose()
+
+
+def _vectors_table(dtype: str) -> Table:
+    return Table(
+        "components", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("embedding_vector", VectorBlob(dtype), nullable=True),
+    )
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 0), ("float16", 1e-3)])
+def test_round_trip_keeps_values_and_size(engine, dtype, tolerance):
+    table = _vectors_table(dtype)
+    table.create(engine)
+    rng = np.random.default_rng(0)
+    vector = rng.uniform(-1, 1, 384).astype(np.float32)
+
+    with engine.begin() as conn:
+        conn.execute(insert(table), [
+            {"id": 1, "embedding_vector": vector},
+            {"id": 2, "embedding_vector": vector.tolist()},
+            {"id": 3, "embedding_vector": None},
+        ])
+        raw = conn.exec_driver_sql("SELECT length(embedding_vector) FROM components WHERE id = 1").scalar()
+        stored = dict(conn.execute(select(table.c.id, table.c.embedding_vector)).all())
+
+    assert raw == 384 * np.dtype(dtype).itemsize
+    assert stored[3] is None
+    for key in (1, 2):
+        assert stored[key].dtype == np.dtype(dtype)
+        np.testing.assert_allclose(stored[key], vector, atol=tolerance)
+
+
+def test_legacy_json_is_read_and_migrated(engine):
+    table = _vectors_table("float16")
+    table.create(engine)
+    vector = [0.25, -0.5, 1.0]
+    with engine.begin() as conn:
+        # строка в старом JSON-формате и BLOB float32 до смены dtype
+        conn.exec_driver_sql(
+            "INSERT INTO components (id, embedding_vector) VALUES (1, ?)", (json.dumps(vector),)
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO components (id, embedding_vector) VALUES (2, ?)",
+            (np.asarray(vector, dtype=np.float32).tobytes(),),
+        )
+
+    with engine.connect() as conn:
+        assert conn.execute(select(table.c.embedding_vector).where(table.c.id == 1)).scalar().tolist() == vector
+
+    stats = migrate_embeddings(engine, dtype="float16", from_dtype="float32")
+
+    with engine.connect() as conn:
+        types = conn.exec_driver_sql("SELECT typeof(embedding_vector), length(embedding_vector) FROM components").all()
+        values = conn.execute(select(table.c.embedding_vector)).scalars().all()
+    assert stats["migrated"] == 2
+    assert types == [("blob", 6), ("blob", 6)]
+    assert all(v.tolist() == vector for v in values)
+
+
+def test_unsupported_dtype_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported vector dtype"):
+        VectorBlob("float64")
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from src.core.vector_index import VectorIndexRepository
+
+
+@pytest.fixture
+def index(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32)).astype(np.float32)
+    labels = rng.integers(0, len(centers), 4000)
+    vectors = centers[labels] + 0.1 * rng.standard_normal((len(labels), 32), dtype=np.float32)
+
+    repo = VectorIndexRepository(str(tmp_path / "index"), nprobe=2)
+    # редкое значение фильтра разбросано по всем кластерам
+    repo.upsert_batch(
+        [f"v{i}" for i in range(len(vectors))],
+        vectors,
+        [{"vendor": "RARE" if i % 40 == 0 else "COMMON"} for i in range(len(vectors))],
+    )
+    repo.build_ivf(nlist=20)
+    yield repo, vectors
+    repo.db.close()
+
+
+def test_filtered_ivf_query_returns_n_results(index):
+    repo, vectors = index
+    where = {"vendor": "RARE"}
+
+    result = repo.query(vectors[1], n_results=50, where=where)
+    exact = repo.query(vectors[1], n_results=50, where=where, nprobe=0)
+
+    assert len(result["ids"][0]) == 50
+    assert result["ids"][0] == exact["ids"][0]
+
+
+def test_short_filtered_result_contains_every_match(index):
+    repo, vectors = index
+
+    result = repo.query(vectors[1], n_results=500, where={"vendor": "RARE"})
+
+    assert sorted(result["ids"][0]) == sorted(f"v{i}" for i in range(0, len(vectors), 40))
+
+
+def test_unfiltered_ivf_query_stays_approximate(index):
+    repo, vectors = index
+
+    result = repo.query(vectors[1], n_results=10)
+
+    assert len(result["ids"][0]) == 10
+    assert result["ids"][0][0] == "v1"
+
+
+# состояние после переоткрытия индекса совпадает с состоянием в памяти
+def test_reopened_index_restores_rows_and_filters(index):
+    repo, vectors = index
+    repo.delete([f"v{i}" for i in range(0, 400, 3)])
+    repo.upsert(["extra"], vectors[:1], [{"vendor": "NEW", "category": "BOLT"}])
+
+    reopened = VectorIndexRepository(repo.path, nprobe=2)
+    try:
+        assert reopened.count() == repo.count()
+        assert sorted(reopened._free) == sorted(repo._free)
+        for name in ("_alive", "_uids", "_lists"):
+            assert np.array_equal(getattr(reopened, name)[:repo._count], getattr(repo, name)[:repo._count])
+        for where in ({"vendor": "RARE"}, {"vendor": "NEW"}, {"category": "BOLT"}):
+            assert reopened.query(vectors[5], n_results=20, where=where) == repo.query(vectors[5], n_results=20, where=where)
+    finally:
+        reopened.db.close()